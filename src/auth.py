@@ -1,15 +1,17 @@
-from datetime import datetime, timedelta
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+import hashlib
+import hmac
+import secrets
+import uuid
 
 from . import models, database, config
 
-settings = config.get_settings()
-
 # Configuración de Hashing (Bcrypt)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -30,6 +32,7 @@ def get_password_hash(password: str) -> str:
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Genera un JWT firmado con los datos del usuario."""
+    settings = config.get_settings()
     to_encode = data.copy()
     
     if expires_delta:
@@ -37,13 +40,125 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    # Agregamos la fecha de expiración al payload
-    to_encode.update({"exp": expire})
+    # Agregamos la fecha de expiración al payload (y la de emisión, para
+    # poder revocar los tokens emitidos antes de /auth/logout-all)
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     
     # Firmamos el token con nuestra SECRET_KEY
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def user_claims(user: models.Usuario) -> dict:
+    """Datos del usuario que viajan en el access token."""
+    return {
+        "sub": user.correo_usuario,             # Subject (Identificador principal)
+        "id_user": user.id_usuario,             # ID numérico
+        "org_id": user.id_organizacion_usuario, # Para multi-tenant
+        "rol": user.rol_usuario.value           # Para control de permisos (RBAC)
+    }
+
+# --- REFRESH TOKENS (Rotativos) ---
+# El login verifica bcrypt una vez por dispositivo; después, /auth/refresh
+# cambia el refresh token por un access token nuevo sin tocar bcrypt. En la
+# BD se guarda un HMAC-SHA256 del token (rápido: el token es aleatorio de
+# 256 bits, no una contraseña que adivinar).
+
+def _refresh_hash_key() -> bytes:
+    settings = config.get_settings()
+    if settings.REFRESH_TOKEN_HASH_KEY:
+        return settings.REFRESH_TOKEN_HASH_KEY.encode()
+    # Derivada: la llave del HMAC no sirve para firmar JWT
+    return hmac.new(settings.SECRET_KEY.encode(), b"refresh-token-hash", hashlib.sha256).digest()
+
+def hash_refresh_token(token: str) -> str:
+    return hmac.new(_refresh_hash_key(), token.encode(), hashlib.sha256).hexdigest()
+
+def issue_refresh_token(db: Session, user_id: int, familia: Optional[str] = None) -> str:
+    """Agrega un refresh token a la sesión (no confirma) y lo devuelve en claro."""
+    settings = config.get_settings()
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    db.add(models.RefreshToken(
+        id_usuario_refresh=user_id,
+        hash_refresh=hash_refresh_token(token),
+        familia_refresh=familia or uuid.uuid4().hex,
+        fecha_creacion_refresh=now,
+        fecha_expira_refresh=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+def create_token_pair(db: Session, user: models.Usuario, familia: Optional[str] = None) -> dict:
+    """Access token + refresh token (schemas.Token). No confirma."""
+    settings = config.get_settings()
+    return {
+        "access_token": create_access_token(
+            data=user_claims(user),
+            expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        ),
+        "token_type": "bearer",
+        "refresh_token": issue_refresh_token(db, user.id_usuario, familia),
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+def _invalid_refresh() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido, vencido o revocado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def revoke_refresh_family(db: Session, familia: str) -> int:
+    """Revoca todos los refresh tokens de la familia (un dispositivo). No confirma."""
+    R = models.RefreshToken
+    return db.query(R).filter(R.familia_refresh == familia, R.fecha_revocado_refresh.is_(None)).update(
+        {R.fecha_revocado_refresh: datetime.utcnow()}, synchronize_session=False
+    )
+
+def find_refresh_token(db: Session, token: str) -> Optional[models.RefreshToken]:
+    R = models.RefreshToken
+    return db.query(R).options(joinedload(R.usuario)).filter(R.hash_refresh == hash_refresh_token(token)).first()
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[models.Usuario, str]:
+    """
+    Marca el refresh token como usado y emite el siguiente de su familia.
+    Si ya se había usado, alguien más lo tiene (o es un reintento): se
+    revoca la familia y el dispositivo vuelve a iniciar sesión.
+    Devuelve (usuario, familia). No confirma salvo al revocar.
+    """
+    R = models.RefreshToken
+    now = datetime.utcnow()
+    row = find_refresh_token(db, token)
+    if row is None or row.fecha_revocado_refresh is not None or row.fecha_expira_refresh <= now:
+        raise _invalid_refresh()
+    marcado = row.fecha_uso_refresh is None and db.query(R).filter(
+        R.id_refresh == row.id_refresh, R.fecha_uso_refresh.is_(None)
+    ).update({R.fecha_uso_refresh: now}, synchronize_session=False)
+    if not marcado:
+        revoke_refresh_family(db, row.familia_refresh)
+        db.commit()
+        raise _invalid_refresh()
+    return row.usuario, row.familia_refresh
+
+def revoke_all_user_tokens(db: Session, user: models.Usuario) -> None:
+    """
+    Revoca todos los refresh tokens del usuario y los access tokens ya
+    emitidos (por fecha de emisión, redondeada al segundo siguiente porque
+    `iat` va en segundos). No confirma.
+    """
+    R = models.RefreshToken
+    now = datetime.utcnow()
+    user.fecha_revocacion_tokens_usuario = now.replace(microsecond=0) + timedelta(seconds=1)
+    db.query(R).filter(R.id_usuario_refresh == user.id_usuario, R.fecha_revocado_refresh.is_(None)).update(
+        {R.fecha_revocado_refresh: now}, synchronize_session=False
+    )
+
+def prune_refresh_tokens(db: Session) -> int:
+    """Borra los refresh tokens vencidos (usados, revocados o no). Confirma."""
+    R = models.RefreshToken
+    deleted = db.query(R).filter(R.fecha_expira_refresh < datetime.utcnow()).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
 # --- DEPENDENCIA DE PROTECCIÓN (EL GUARDIÁN) ---
 
 async def get_current_user(
@@ -63,6 +178,7 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    settings = config.get_settings()
     try:
         # Decodificar token
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -76,6 +192,11 @@ async def get_current_user(
     user = db.query(models.Usuario).filter(models.Usuario.correo_usuario == email).first()
     if user is None:
         raise credentials_exception
+
+    # Lista de revocación por usuario: tokens emitidos antes de /auth/logout-all
+    revocado = user.fecha_revocacion_tokens_usuario
+    if revocado is not None and payload.get("iat", 0) < revocado.replace(tzinfo=timezone.utc).timestamp():
+        raise credentials_exception
         
     return user
 
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import List, Optional
 import os
 
 # --- CORRECCIÓN DE RUTA (ESTRUCTURA PLANA) ---
@@ -16,16 +17,166 @@ class Settings(BaseSettings):
 
     # --- 1. BASE DE DATOS ---
     DATABASE_URL: str
+    # Pool de conexiones (ver services/metrics.py para su telemetría)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0     # Segundos esperando una conexión libre
+    DB_POOL_RECYCLE: int = 1800       # Segundos antes de reciclar (-1 = nunca)
+    DB_POOL_PRE_PING: bool = True
+    # Conexiones que el arranque abre por adelantado (0 = sin pre-calentar)
+    DB_POOL_WARM_CONNECTIONS: int = 2
+    # Réplicas de solo lectura, separadas por coma (vacío = todo al primario).
+    # Las peticiones GET/HEAD leen de ellas (ver services/replicas.py).
+    DATABASE_REPLICA_URLS: str = ""
+    # Segundos que un cliente lee del primario después de escribir
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0
+    DB_STICKY_CLIENTS_MAX: int = 10000
+    # Errores de conexión seguidos que expulsan una réplica, y por cuánto tiempo
+    DB_REPLICA_MAX_FAILURES: int = 3
+    DB_REPLICA_EJECTION_SECONDS: float = 30.0
 
     # --- 2. SEGURIDAD ---
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Refresh tokens rotativos (/auth/refresh): vigencia desde el último uso
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # Llave del HMAC con que se guardan (vacío = derivada de SECRET_KEY)
+    REFRESH_TOKEN_HASH_KEY: str = ""
 
     # --- 3. ALMACENAMIENTO ---
     AZURE_CONNECTION_STRING: str
     AZURE_CONTAINER_NAME: str
 
+    # --- 3b. OBSERVABILIDAD ---
+    # /internal/* exige el header X-Metrics-Token con este valor (sin él, responde 404)
+    METRICS_TOKEN: Optional[str] = None
+    INSTRUMENTATION_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_SAMPLE_RATE: float = 1.0   # Fracción de consultas lentas que se guardan
+    SLOW_QUERY_LOG_SIZE: int = 200
+    # Registra (log + métrica) los endpoints que exceden su @query_budget.
+    # Guarda el texto de cada sentencia: solo para desarrollo y pruebas
+    QUERY_BUDGET_CHECK: bool = False
+
+    # --- 3c. LÍMITE DE PETICIONES (Endpoints públicos) ---
+    # Formato 'peticiones/segundos' por dispositivo (header X-Device-Id)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PUBLIC_TICKETS: str = "10/60"
+    RATE_LIMIT_PUBLIC_EVIDENCE: str = "20/60"
+    RATE_LIMIT_PUBLIC_CHATBOT: str = "30/60"
+    # El bucket por IP admite N veces lo del dispositivo (redes compartidas)
+    RATE_LIMIT_IP_MULTIPLIER: float = 5.0
+    RATE_LIMIT_MAX_BUCKETS: int = 100000
+
+    # --- 4. DASHBOARD ---
+    # Tiempo máximo (segundos) que /dashboard/home espera a cada sección
+    # antes de responder sin ella (respuesta parcial).
+    DASHBOARD_SECTION_TIMEOUT_SECONDS: float = 3.0
+
+    # --- 5. CACHÉ DE CONSULTAS (Dashboard) ---
+    QUERY_CACHE_ENABLED: bool = True
+    QUERY_CACHE_MAX_ENTRIES: int = 2048
+    # Acota el desfase entre workers (la invalidación es por proceso)
+    QUERY_CACHE_TTL_SECONDS: float = 60.0
+
+    # --- 6. IMPORTACIÓN MASIVA DE GASTOS ---
+    GASTOS_IMPORT_CHUNK_SIZE: int = 500
+    # Máximo de errores detallados en la respuesta (el resto solo se cuenta)
+    GASTOS_IMPORT_MAX_ERRORS: int = 1000
+
+    # --- 7. CATÁLOGOS PÚBLICOS ---
+    ZONAS_CATALOGO_TTL_SECONDS: float = 300.0
+
+    # --- 8. TAREAS EN SEGUNDO PLANO (Outbox) ---
+    TASKS_ENABLED: bool = True
+    TASK_WORKERS: int = 4
+    TASK_QUEUE_SIZE: int = 1000
+    # Cada cuánto se buscan en la BD tareas vencidas (reintentos, otros workers)
+    TASK_POLL_SECONDS: float = 2.0
+    TASK_POLL_BATCH: int = 100
+    TASK_MAX_ATTEMPTS: int = 5
+    TASK_BACKOFF_BASE_SECONDS: float = 2.0
+    TASK_BACKOFF_MAX_SECONDS: float = 300.0
+    # Una tarea EN_PROCESO sin terminar tras este plazo se vuelve a tomar
+    TASK_LEASE_SECONDS: float = 120.0
+    TASK_SHUTDOWN_SECONDS: float = 10.0
+
+    # --- 9. BITÁCORA DE TICKETS ---
+    # Los eventos se escriben en lotes fuera de la petición
+    EVENT_LOG_BATCH_SIZE: int = 200
+    EVENT_LOG_FLUSH_SECONDS: float = 1.0
+    # Máximo de eventos en memoria si la BD no acepta escrituras
+    EVENT_LOG_BUFFER_MAX: int = 10000
+
+    # --- 10. DETECCIÓN DE DUPLICADOS ---
+    DEDUP_ENABLED: bool = True
+    # Distancia máxima entre reportes del mismo incidente (también fija la malla)
+    DEDUP_RADIUS_METERS: float = 300.0
+    DEDUP_WINDOW_HOURS: float = 24.0
+    # Similitud de Jaccard estimada (MinHash) mínima entre descripciones
+    DEDUP_SIMILARITY_THRESHOLD: float = 0.35
+
+    # --- 11. ARCHIVO HISTÓRICO ---
+    # Tickets RESUELTO/CERRADO con más de estos días de cerrados salen de TICKETS
+    ARCHIVE_AFTER_DAYS: int = 365
+    # Tickets por transacción (cada lote bloquea solo sus filas y confirma)
+    ARCHIVE_BATCH_SIZE: int = 500
+    ARCHIVE_PAUSE_SECONDS: float = 0.1
+    # Solo MySQL: particiona TICKETS_ARCHIVO por mes de creación
+    ARCHIVE_MYSQL_PARTITIONING: bool = False
+    ARCHIVE_PARTITION_MONTHS_AHEAD: int = 3
+
+    # --- 12. COMPRESIÓN DE RESPUESTAS ---
+    COMPRESSION_ENABLED: bool = True
+    # Respuestas más chicas no se comprimen (el encabezado cuesta más de lo que ahorra)
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    # br solo si está instalado el paquete Brotli (calidad 0-11)
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # --- 13. SUBIDAS DIRECTAS AL ALMACENAMIENTO (Evidencias) ---
+    # "azure": URL con SAS al contenedor; "local": archivos en LOCAL_STORAGE_DIR
+    # con URL firmada hacia la propia API (solo desarrollo)
+    STORAGE_BACKEND: str = "azure"
+    LOCAL_STORAGE_DIR: str = "./uploads"
+    # Prefijo absoluto para las URLs locales (vacío = rutas relativas a la API)
+    LOCAL_STORAGE_PUBLIC_URL: str = ""
+    # Vigencia de la URL de subida; el aviso de término se acepta hasta el doble
+    UPLOAD_URL_TTL_SECONDS: int = 600
+    UPLOAD_MAX_BYTES: int = 25 * 1024 * 1024
+    # Subidas reanudables por partes (videos): tamaño máximo del archivo,
+    # de cada PATCH (lo que se pierde como máximo si se corta) y vigencia
+    UPLOAD_RESUMABLE_MAX_BYTES: int = 500 * 1024 * 1024
+    UPLOAD_CHUNK_MAX_BYTES: int = 4 * 1024 * 1024
+    UPLOAD_RESUMABLE_TTL_SECONDS: int = 24 * 3600
+
+    # --- 14. SINCRONIZACIÓN MÓVIL (/public/sync) ---
+    # Los cambios más recientes que esto se entregan en la siguiente
+    # sincronización: cubre transacciones aún sin confirmar (debe superar
+    # la duración de una transacción de escritura)
+    SYNC_GRACE_SECONDS: float = 5.0
+    SYNC_MAX_CHANGES: int = 1000
+    # Tokens más viejos reciben la lista completa (ver src.tools.sync_prune)
+    SYNC_LOG_RETENTION_DAYS: int = 30
+
+    # --- 15. MAPA PÚBLICO DE INCIDENTES (/public/mapa) ---
+    # Ventanas en días, separadas por coma: un snapshot por cada una
+    HEATMAP_WINDOWS_DAYS: str = "7,30,365"
+    # Snapshots que se conservan por ventana (ver src.tools.mapa_snapshots)
+    HEATMAP_SNAPSHOTS_KEEP: int = 48
+    # Vigencia del índice (qué snapshot es el último), en la API y en caché HTTP
+    HEATMAP_INDEX_TTL_SECONDS: int = 60
+    HEATMAP_SNAPSHOT_CACHE_ENTRIES: int = 32
+
+    @property
+    def replica_urls(self) -> List[str]:
+        return [url.strip() for url in self.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
+    @property
+    def heatmap_windows(self) -> List[int]:
+        return sorted({int(days) for days in self.HEATMAP_WINDOWS_DAYS.split(",") if days.strip()})
+
     # Configuración Pydantic V2
     model_config = SettingsConfigDict(
         env_file=ENV_FILE_PATH,     # Ruta absoluta calculada
@@ -1,25 +1,142 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from functools import lru_cache
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from .config import get_settings
-
-settings = get_settings()
-
-# check_same_thread=False solo es necesario para SQLite, para MySQL lo quitamos
-engine = create_engine(
-    settings.DATABASE_URL, 
-    pool_pre_ping=True, # Vital para evitar desconexiones en MySQL
-    pool_size=10,
-    max_overflow=20
+from .services.metrics import PRIMARY_POOL, TimedQueuePool, instrument_pool
+from .services.instrumentation import instrument_engine
+from .services.replicas import (
+    METODOS_LECTURA, STICKY_COOKIE, ReplicaSet, StickyClients, client_key
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# La sesión se liga al engine en get_engine(): importar este módulo
+# no lee configuración ni abre conexiones.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
-# Dependencia para inyectar la sesión en los endpoints
-def get_db():
-    db = SessionLocal()
+def _create_engine(database_url: str, pool_name: str) -> Engine:
+    """
+    Engine con el pool y la instrumentación configurados (primario o réplica).
+    `pool_name` separa sus métricas de pool de las de los demás engines.
+    """
+    settings = get_settings()
+    url = make_url(database_url)
+
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # SQLite en memoria vive en una sola conexión: no admite QueuePool
+        engine = create_engine(url, pool_logging_name=pool_name)
+    else:
+        # check_same_thread=False solo es necesario para SQLite, para MySQL lo quitamos
+        engine = create_engine(
+            url,
+            poolclass=TimedQueuePool,
+            pool_logging_name=pool_name,
+            pool_pre_ping=settings.DB_POOL_PRE_PING, # Vital para evitar desconexiones en MySQL
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE
+        )
+    instrument_pool(engine, pool_name)
+    if settings.INSTRUMENTATION_ENABLED:
+        instrument_engine(engine)
+    return engine
+
+@lru_cache()
+def get_engine() -> Engine:
+    """Crea (una sola vez) el engine del primario y liga SessionLocal a él."""
+    engine = _create_engine(get_settings().DATABASE_URL, PRIMARY_POOL)
+    SessionLocal.configure(bind=engine)
+    return engine
+
+@lru_cache()
+def get_replica_set() -> Optional[ReplicaSet]:
+    """Réplicas de DATABASE_REPLICA_URLS, o None si no hay ninguna configurada."""
+    settings = get_settings()
+    if not settings.replica_urls:
+        return None
+    return ReplicaSet(
+        [_create_engine(url, f"replica-{i}") for i, url in enumerate(settings.replica_urls)],
+        max_failures=settings.DB_REPLICA_MAX_FAILURES,
+        ejection_seconds=settings.DB_REPLICA_EJECTION_SECONDS,
+    )
+
+@lru_cache()
+def get_sticky_clients() -> StickyClients:
+    settings = get_settings()
+    return StickyClients(settings.DB_READ_YOUR_WRITES_SECONDS, settings.DB_STICKY_CLIENTS_MAX)
+
+def named_pools() -> dict:
+    """{nombre: pool} del primario y de cada réplica (para las métricas)."""
+    engines = [get_engine()]
+    replicas = get_replica_set()
+    if replicas is not None:
+        engines += replicas.engines
+    return {engine.pool.logging_name or PRIMARY_POOL: engine.pool for engine in engines}
+
+def engine_for_request(request: Request) -> Engine:
+    """
+    Engine para la petición: las lecturas (GET/HEAD) van a una réplica sana,
+    salvo que el cliente haya escrito hace menos de DB_READ_YOUR_WRITES_SECONDS.
+    Todo lo demás (y cualquier caso sin réplica disponible) va al primario.
+    """
+    primary = get_engine()
+    replicas = get_replica_set()
+    if replicas is None or request.method not in METODOS_LECTURA:
+        return primary
+    key = client_key(request.headers, request.client)
+    if get_sticky_clients().is_sticky(key, request.cookies.get(STICKY_COOKIE)):
+        return primary
+    return replicas.choose() or primary
+
+def warm_pool(connections: int) -> int:
+    """
+    Abre `connections` conexiones a la vez y las devuelve al pool, para que
+    las primeras peticiones no paguen el costo de conexión.
+    """
+    engine = get_engine()
+    # Más allá de pool_size serían conexiones de overflow, que se descartan al cerrar
+    if hasattr(engine.pool, "size"):
+        connections = min(connections, engine.pool.size())
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(engine.connect())
+    finally:
+        for conn in opened:
+            conn.close()
+    return len(opened)
+
+def __getattr__(name):
+    # Compatibilidad: `database.engine` sigue funcionando, pero de forma perezosa
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def open_session(engine: Engine) -> Session:
+    """
+    Sesión ligada a `engine`. Si es una réplica y no logra conectar, el fallo
+    se cuenta para su expulsión y la sesión se abre contra el primario.
+    """
+    primary = get_engine()
+    db = SessionLocal(bind=engine)
+    if engine is not primary:
+        try:
+            db.connection()  # Checkout anticipado (la consulta lo haría de todos modos)
+        except exc.DBAPIError:
+            db.close()
+            db = SessionLocal(bind=primary)
+    return db
+
+# Dependencia para inyectar la sesión en los endpoints.
+# Los endpoints GET no deben escribir: con réplicas configuradas, su sesión
+# apunta a una réplica de solo lectura.
+def get_db(request: Request):
+    db = open_session(engine_for_request(request))
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
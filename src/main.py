@@ -1,33 +1,147 @@
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import logging
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import auth, public, dashboard, operations
-from .database import engine
-from . import models
-
-# Crear tablas si no existen (útil para desarrollo rápido)
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title="ERP Resiliencia Ambiental API",
-    version="1.0.0"
-)
-
-# Configuración CORS (Indispensable para Flutter)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"], 
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Incluir los Routers
-app.include_router(auth.router)
-app.include_router(public.router) # Endpoints abiertos (Chatbot, Reportes)
-app.include_router(dashboard.router) # Endpoints protegidos (BSC)
-app.include_router(operations.router) # Endpoints protegidos (Tickets)
-
-@app.get("/")
-def root():
-    return {"message": "API Online - ERP Resiliencia"}
\ No newline at end of file
+from .routers import auth, public, dashboard, operations, internal
+from . import database, config
+from .services.catalogos import get_zona_catalogo
+from .services.instrumentation import InstrumentationMiddleware
+from .services.replicas import ReadYourWritesMiddleware
+from .services.tasks import get_task_queue
+from .services.eventos import get_event_writer
+from .services.rate_limit import RateLimitMiddleware, get_rate_limiter
+from .services.encoding import CompressionMiddleware, get_compression_stats
+
+logger = logging.getLogger(__name__)
+
+# El esquema ya NO se crea al importar: se aplica con `python -m src.migrate`
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Inicialización del worker (una vez, antes de aceptar tráfico):
+    1. Crea el engine.
+    2. Pre-calienta DB_POOL_WARM_CONNECTIONS conexiones del pool.
+    3. Carga el catálogo de zonas en memoria.
+    4. Arranca la cola de tareas en segundo plano (services/tasks.py) y el
+       escritor en lotes de la bitácora de tickets (services/eventos.py).
+    Los tiempos de cada paso quedan en app.state.startup_timings.
+    """
+    settings = config.get_settings()
+    timings = {"imports_ms": _IMPORT_MS}
+    start = time.perf_counter()
+
+    step = time.perf_counter()
+    database.get_engine()
+    timings["engine_ms"] = (time.perf_counter() - step) * 1000
+
+    step = time.perf_counter()
+    warmed = database.warm_pool(settings.DB_POOL_WARM_CONNECTIONS)
+    timings["warm_pool_ms"] = (time.perf_counter() - step) * 1000
+
+    step = time.perf_counter()
+    db = database.SessionLocal()
+    try:
+        zonas = get_zona_catalogo().load(db)
+    finally:
+        db.close()
+    timings["zonas_ms"] = (time.perf_counter() - step) * 1000
+
+    if settings.TASKS_ENABLED:
+        await get_task_queue().start()
+    await get_event_writer().start()
+
+    timings["lifespan_ms"] = (time.perf_counter() - start) * 1000
+    app.state.startup_timings = {k: round(v, 2) for k, v in timings.items()}
+    logger.info(
+        "Arranque listo (%d conexiones, %d zonas): %s",
+        warmed, len(zonas), app.state.startup_timings
+    )
+
+    yield
+
+    if settings.TASKS_ENABLED:
+        await get_task_queue().stop(settings.TASK_SHUTDOWN_SECONDS)
+    await get_event_writer().stop()
+    database.get_engine().dispose()
+    if database.get_replica_set() is not None:
+        database.get_replica_set().dispose()
+
+def create_app() -> FastAPI:
+    """
+    Construye la app y su pila de middlewares. La configuración se lee aquí
+    (no al importar el módulo) de config.get_settings(), la misma que usan
+    el lifespan y los servicios.
+    """
+    settings = config.get_settings()
+    app = FastAPI(
+        title="ERP Resiliencia Ambiental API",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+
+    # Límite de peticiones en /public (antes que CORS para que el 429 lleve sus headers)
+    if settings.RATE_LIMIT_ENABLED:
+        app.add_middleware(RateLimitMiddleware, limiter=get_rate_limiter())
+
+    # Configuración CORS (Indispensable para Flutter)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Siguiente-Cursor", "Retry-After", "Location", "Upload-Offset", "Upload-Length"],
+    )
+
+    # Lectura de lo propio: con réplicas, quien escribe lee del primario un rato
+    if settings.replica_urls:
+        app.add_middleware(ReadYourWritesMiddleware, sticky=database.get_sticky_clients())
+
+    # Compresión br/gzip negociada (por fuera de CORS y del límite de peticiones)
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            stats=get_compression_stats(),
+            minimum_size=settings.COMPRESSION_MIN_BYTES,
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        )
+
+    # Instrumentación (latencia por ruta, SQL por petición). Se agrega al final
+    # para que sea el middleware más externo y mida la petición completa.
+    if settings.INSTRUMENTATION_ENABLED:
+        app.add_middleware(InstrumentationMiddleware)
+
+    # Incluir los Routers
+    app.include_router(auth.router)
+    app.include_router(public.router) # Endpoints abiertos (Chatbot, Reportes)
+    app.include_router(dashboard.router) # Endpoints protegidos (BSC)
+    app.include_router(operations.router) # Endpoints protegidos (Tickets)
+    app.include_router(internal.router) # Métricas internas (pool, caché)
+
+    @app.get("/")
+    def root():
+        return {"message": "API Online - ERP Resiliencia"}
+
+    return app
+
+@lru_cache()
+def get_app() -> FastAPI:
+    return create_app()
+
+def __getattr__(name: str):
+    # `uvicorn src.main:app` y `from src.main import app` construyen la app
+    # al pedirla (una vez por proceso), no al importar el módulo
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_IMPORT_MS = (time.perf_counter() - _IMPORT_START) * 1000
@@ -0,0 +1,78 @@
+"""
+Migración explícita del esquema (reemplaza el create_all al importar main.py).
+
+Uso:
+    python -m src.migrate
+
+- Crea las tablas que no existan (con sus índices).
+- Agrega a tablas existentes las columnas nuevas de models.py (deben ser
+  nullable o tener server_default; las FK de esas columnas no se agregan).
+- Crea los índices declarados en models.py que falten en tablas existentes
+  (create_all no los agrega por sí solo).
+- Crea el índice de texto completo de tickets (FULLTEXT en MySQL, FTS5 en
+  SQLite; ver services/busqueda.py).
+"""
+import logging
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+
+from . import models
+from .database import get_engine
+from .services.busqueda import ensure_search_index
+
+logger = logging.getLogger(__name__)
+
+def _add_missing_columns(engine: Engine) -> list:
+    inspector = inspect(engine)
+    added = []
+    for table in models.Base.metadata.sorted_tables:
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(
+                    f"{table.name}.{column.name} es NOT NULL sin server_default: requiere migración manual"
+                )
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+def _create_missing_indexes(engine: Engine) -> list:
+    inspector = inspect(engine)
+    created = []
+    for table in models.Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+    return created
+
+def run_migrations(engine: Engine = None) -> dict:
+    """Aplica el esquema de models.py sobre la BD. Es idempotente."""
+    engine = engine or get_engine()
+    start = time.perf_counter()
+
+    models.Base.metadata.create_all(bind=engine)
+    added_columns = _add_missing_columns(engine)
+    created_indexes = _create_missing_indexes(engine)
+    search_index = ensure_search_index(engine)
+    if search_index:
+        created_indexes.append(search_index)
+
+    return {
+        "columnas_agregadas": added_columns,
+        "indices_creados": created_indexes,
+        "duracion_ms": round((time.perf_counter() - start) * 1000, 2)
+    }
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    result = run_migrations()
+    logger.info("Migración completada: %s", result)
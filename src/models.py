@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date, Numeric, Text, Enum, Table
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Date, Numeric, Text, Enum, Table, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -87,6 +87,27 @@ class FuenteDato(str, enum.Enum):
     EXTERNO = "EXTERNO"
     MANUAL = "MANUAL"
 
+class EstadoTarea(str, enum.Enum):
+    PENDIENTE = "PENDIENTE"
+    EN_PROCESO = "EN_PROCESO"
+    COMPLETADA = "COMPLETADA"
+    FALLIDA = "FALLIDA"
+
+class TipoEventoTicket(str, enum.Enum):
+    CREADO = "CREADO"
+    ASIGNADO = "ASIGNADO"
+    TRANSFERIDO = "TRANSFERIDO"
+    CAMBIO_ESTADO = "CAMBIO_ESTADO"
+    CAMBIO_PRIORIDAD = "CAMBIO_PRIORIDAD"
+
+class EntidadSync(str, enum.Enum):
+    ZONA = "ZONA"
+    TICKET = "TICKET"
+
+class OperacionSync(str, enum.Enum):
+    GUARDADO = "GUARDADO"    # Creado o modificado
+    ELIMINADO = "ELIMINADO"  # Borrado o archivado
+
 # ==========================================
 # 2. TABLA INTERMEDIA (Muchos a Muchos)
 # ==========================================
@@ -144,6 +165,8 @@ class Usuario(Base):
     contraseña_usuario = Column("CONTRASEÑA_USUARIO", String(255), nullable=False)
     rol_usuario = Column("ROL_USUARIO", Enum(RolUsuario), default=RolUsuario.OPERADOR)
     fecha_creacion_usuario = Column("FECHA_CREACION_USUARIO", DateTime(timezone=True), server_default=func.now())
+    # Access tokens emitidos antes de esta fecha ya no valen (/auth/logout-all)
+    fecha_revocacion_tokens_usuario = Column("FECHA_REVOCACION_TOKENS_USUARIO", DateTime, nullable=True)
 
     organizacion = relationship("Organizacion", back_populates="usuarios")
 
@@ -210,6 +233,11 @@ class Gasto(Base):
 
     proyecto = relationship("Proyecto", back_populates="gastos")
 
+    # Series de gasto por proyecto (burn-down): agrupa y ordena por (proyecto, fecha)
+    __table_args__ = (
+        Index("IX_GASTOS_PROYECTO_FECHA", "ID_PROYECTO_GASTO", "FECHA_GASTO"),
+    )
+
 class Ticket(Base):
     __tablename__ = "TICKETS"
 
@@ -233,11 +261,21 @@ class Ticket(Base):
     fecha_creacion_ticket = Column("FECHA_CREACION_TICKET", DateTime(timezone=True), server_default=func.now())
     fecha_cierre_ticket = Column("FECHA_CIERRE_TICKET", DateTime(timezone=True), nullable=True)
 
+    # Reporte original del que este es un duplicado (ver services/duplicados.py)
+    id_ticket_padre = Column("ID_TICKET_PADRE", Integer, ForeignKey("TICKETS.ID_TICKET", ondelete="SET NULL"), nullable=True)
+
     organizacion = relationship("Organizacion", back_populates="tickets")
     proyecto = relationship("Proyecto", back_populates="tickets")
     zona = relationship("Zona", back_populates="tickets")
     evidencias = relationship("Evidencia", back_populates="ticket", cascade="all, delete-orphan")
 
+    # Bandeja por organización/estado, paginada por ID_TICKET.
+    # El índice de texto completo se crea en src.migrate (depende del motor).
+    __table_args__ = (
+        Index("IX_TICKETS_ORG_ESTADO", "ID_ORGANIZACION_TICKET", "ESTADO_TICKET"),
+        Index("IX_TICKETS_PADRE", "ID_TICKET_PADRE"),
+    )
+
 class Evidencia(Base):
     __tablename__ = "EVIDENCIAS"
 
@@ -260,4 +298,288 @@ class Medicion(Base):
     fecha_registro_medicion = Column("FECHA_REGISTRO_MEDICION", Date, server_default=func.current_date())
     notas_medicion = Column("NOTAS_MEDICION", Text, nullable=True)
 
-    organizacion = relationship("Organizacion", back_populates="mediciones")
\ No newline at end of file
+    organizacion = relationship("Organizacion", back_populates="mediciones")
+
+# ==========================================
+# 4. TAREAS EN SEGUNDO PLANO (Outbox)
+# ==========================================
+
+class TareaOutbox(Base):
+    """
+    Tarea pendiente de procesar fuera de la petición (ver services/tasks.py).
+    Se inserta en la misma transacción que el dato que la origina, así que
+    existe si y solo si ese dato se confirmó.
+    """
+    __tablename__ = "TAREAS_OUTBOX"
+
+    id_tarea = Column("ID_TAREA", Integer, primary_key=True, autoincrement=True)
+    tipo_tarea = Column("TIPO_TAREA", String(50), nullable=False)
+    payload_tarea = Column("PAYLOAD_TAREA", Text, nullable=False)  # JSON
+    estado_tarea = Column("ESTADO_TAREA", Enum(EstadoTarea), nullable=False, default=EstadoTarea.PENDIENTE)
+    intentos_tarea = Column("INTENTOS_TAREA", Integer, nullable=False, default=0)
+    # Fechas en UTC asignadas desde Python (se comparan contra el reloj del worker)
+    proximo_intento_tarea = Column("PROXIMO_INTENTO_TAREA", DateTime, nullable=False)
+    bloqueada_hasta_tarea = Column("BLOQUEADA_HASTA_TAREA", DateTime, nullable=True)
+    ultimo_error_tarea = Column("ULTIMO_ERROR_TAREA", Text, nullable=True)
+    fecha_creacion_tarea = Column("FECHA_CREACION_TAREA", DateTime(timezone=True), server_default=func.now())
+    fecha_completada_tarea = Column("FECHA_COMPLETADA_TAREA", DateTime, nullable=True)
+
+    # El sondeo busca tareas vencidas por (estado, próximo intento)
+    __table_args__ = (
+        Index("IX_TAREAS_ESTADO_PROXIMO", "ESTADO_TAREA", "PROXIMO_INTENTO_TAREA"),
+    )
+
+# ==========================================
+# 5. BITÁCORA DE TICKETS (Solo inserción)
+# ==========================================
+
+class EventoTicket(Base):
+    """
+    Historial de un ticket: cada cambio agrega una fila, nunca se actualiza
+    ni se borra. Se escribe en lotes (ver services/eventos.py).
+    """
+    __tablename__ = "EVENTOS_TICKETS"
+
+    id_evento = Column("ID_EVENTO", Integer, primary_key=True, autoincrement=True)
+    # Sin FK: el historial se conserva aunque el ticket se archive o elimine
+    id_ticket_evento = Column("ID_TICKET_EVENTO", Integer, nullable=False)
+    # Organización que originó el evento (en una transferencia, la de origen)
+    id_organizacion_evento = Column("ID_ORGANIZACION_EVENTO", Integer, nullable=False)
+    id_usuario_evento = Column("ID_USUARIO_EVENTO", Integer, nullable=True)  # None = ciudadano
+    tipo_evento = Column("TIPO_EVENTO", Enum(TipoEventoTicket), nullable=False)
+    estado_anterior_evento = Column("ESTADO_ANTERIOR_EVENTO", Enum(EstadoTicket), nullable=True)
+    estado_nuevo_evento = Column("ESTADO_NUEVO_EVENTO", Enum(EstadoTicket), nullable=True)
+    detalle_evento = Column("DETALLE_EVENTO", Text, nullable=True)  # JSON (proyecto, destino, notas...)
+    # Momento del cambio (UTC), no el de la escritura del lote
+    fecha_evento = Column("FECHA_EVENTO", DateTime, nullable=False)
+
+    # Línea de tiempo por ticket y por organización (paginada por ID_EVENTO)
+    __table_args__ = (
+        Index("IX_EVENTOS_TICKET", "ID_TICKET_EVENTO", "ID_EVENTO"),
+        Index("IX_EVENTOS_ORGANIZACION", "ID_ORGANIZACION_EVENTO", "ID_EVENTO"),
+    )
+
+# ==========================================
+# 6. HUELLAS PARA DETECCIÓN DE DUPLICADOS
+# ==========================================
+
+class HuellaTicket(Base):
+    """
+    Índice espacio-temporal de tickets: celda de la malla (lat/lon), periodo
+    de tiempo y firma MinHash de la descripción. Se llena al procesar cada
+    ticket nuevo (services/duplicados.py).
+    """
+    __tablename__ = "HUELLAS_TICKETS"
+
+    id_ticket_huella = Column("ID_TICKET_HUELLA", Integer, ForeignKey("TICKETS.ID_TICKET", ondelete="CASCADE"), primary_key=True)
+    tipo_incidente_huella = Column("TIPO_INCIDENTE_HUELLA", Enum(TipoIncidente), nullable=False)
+    celda_lat_huella = Column("CELDA_LAT_HUELLA", Integer, nullable=False)
+    celda_lon_huella = Column("CELDA_LON_HUELLA", Integer, nullable=False)
+    periodo_huella = Column("PERIODO_HUELLA", Integer, nullable=False)
+    # Copias para filtrar sin unir con TICKETS
+    lat_huella = Column("LAT_HUELLA", Numeric(9, 6), nullable=False)
+    lon_huella = Column("LON_HUELLA", Numeric(9, 6), nullable=False)
+    fecha_huella = Column("FECHA_HUELLA", DateTime, nullable=False)
+    firma_minhash_huella = Column("FIRMA_MINHASH_HUELLA", Text, nullable=True)  # None = sin texto
+
+    # La búsqueda de candidatos solo lee las celdas vecinas de un tipo y periodo
+    __table_args__ = (
+        Index(
+            "IX_HUELLAS_CELDA",
+            "TIPO_INCIDENTE_HUELLA", "CELDA_LAT_HUELLA", "CELDA_LON_HUELLA", "PERIODO_HUELLA"
+        ),
+    )
+
+# ==========================================
+# 7. HISTOGRAMAS DE TIEMPO DE RESOLUCIÓN (SLA)
+# ==========================================
+
+class HistogramaResolucion(Base):
+    """
+    Conteo de tickets cerrados por cubeta de tiempo de resolución, por
+    organización, zona y tipo de incidente. Se incrementa al cerrar un ticket
+    y se decrementa si se reabre (services/sla.py); los percentiles se
+    calculan sumando estas filas, sin leer los tickets.
+    """
+    __tablename__ = "HISTOGRAMAS_RESOLUCION"
+
+    id_organizacion_histograma = Column("ID_ORGANIZACION_HISTOGRAMA", Integer, primary_key=True)
+    id_zona_histograma = Column("ID_ZONA_HISTOGRAMA", Integer, primary_key=True)  # 0 = sin zona
+    tipo_incidente_histograma = Column("TIPO_INCIDENTE_HISTOGRAMA", Enum(TipoIncidente), primary_key=True)
+    # Índice en sla.BUCKET_BOUNDS_HOURS
+    cubeta_histograma = Column("CUBETA_HISTOGRAMA", Integer, primary_key=True)
+    conteo_histograma = Column("CONTEO_HISTOGRAMA", Integer, nullable=False, default=0)
+
+# ==========================================
+# 8. ARCHIVO HISTÓRICO (Tickets cerrados antiguos)
+# ==========================================
+
+class TicketArchivado(Base):
+    """
+    Tickets cerrados que salieron de TICKETS (services/archivo.py). Mismas
+    columnas y atributos que Ticket, para que los esquemas de respuesta
+    sirvan igual; sin FK, para que el archivo no dependa de la tabla caliente.
+    En MySQL puede particionarse por mes de FECHA_CREACION_TICKET (por eso
+    la fecha forma parte de la PK y es NOT NULL).
+    """
+    __tablename__ = "TICKETS_ARCHIVO"
+
+    archivado = True  # Marca para las respuestas (Ticket no la tiene)
+
+    id_ticket = Column("ID_TICKET", Integer, primary_key=True, autoincrement=False)
+    id_organizacion_ticket = Column("ID_ORGANIZACION_TICKET", Integer, nullable=False)
+    id_proyecto_ticket = Column("ID_PROYECTO_TICKET", Integer, nullable=True)
+    id_zona_ticket = Column("ID_ZONA_TICKET", Integer, nullable=True)
+    id_usuario_reporte_ticket = Column("ID_USUARIO_REPORTE_TICKET", String(100), nullable=False)
+    descripcion_ticket = Column("DESCRIPCION_TICKET", Text, nullable=True)
+    des_hechos_lugar_ticket = Column("DES_HECHOS_LUGAR_TICKET", Text, nullable=True)
+    tipo_incidente_ticket = Column("TIPO_INCIDENTE_TICKET", Enum(TipoIncidente), nullable=False)
+    estado_ticket = Column("ESTADO_TICKET", Enum(EstadoTicket), nullable=True)
+    prioridad_ticket = Column("PRIORIDAD_TICKET", Enum(Prioridad), nullable=True)
+    ubicacion_lat_ticket = Column("UBICACION_LAT_TICKET", Numeric(9, 6), nullable=True)
+    ubicacion_lon_ticket = Column("UBICACION_LON_TICKET", Numeric(9, 6), nullable=True)
+    fecha_creacion_ticket = Column("FECHA_CREACION_TICKET", DateTime(timezone=True), primary_key=True)
+    fecha_cierre_ticket = Column("FECHA_CIERRE_TICKET", DateTime(timezone=True), nullable=True)
+    id_ticket_padre = Column("ID_TICKET_PADRE", Integer, nullable=True)
+    fecha_archivado_ticket = Column("FECHA_ARCHIVADO_TICKET", DateTime, nullable=False)
+
+    # Consultas de historial: por organización y por dispositivo del ciudadano
+    __table_args__ = (
+        Index("IX_TICKETS_ARCHIVO_ORG", "ID_ORGANIZACION_TICKET", "ID_TICKET"),
+        Index("IX_TICKETS_ARCHIVO_USUARIO", "ID_USUARIO_REPORTE_TICKET"),
+    )
+
+class EvidenciaArchivada(Base):
+    """Evidencias de los tickets archivados (mismas columnas que Evidencia)."""
+    __tablename__ = "EVIDENCIAS_ARCHIVO"
+
+    id_evidencia = Column("ID_EVIDENCIA", Integer, primary_key=True, autoincrement=False)
+    id_ticket_evidencia = Column("ID_TICKET_EVIDENCIA", Integer, nullable=False)
+    url_evidencia = Column("URL_EVIDENCIA", String(255), nullable=False)
+    tipo_archivo_evidencia = Column("TIPO_ARCHIVO_EVIDENCIA", Enum(TipoArchivo), nullable=True)
+    fecha_carga_evidencia = Column("FECHA_CARGA_EVIDENCIA", DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("IX_EVIDENCIAS_ARCHIVO_TICKET", "ID_TICKET_EVIDENCIA"),
+    )
+
+# ==========================================
+# 9. SUBIDAS REANUDABLES (Evidencias grandes)
+# ==========================================
+
+class SubidaEvidencia(Base):
+    """
+    Sesión de subida por partes (services/storage.py). OFFSET_SUBIDA son los
+    bytes ya guardados en el almacenamiento: el cliente que pierde la
+    conexión pregunta el offset y continúa desde ahí.
+    """
+    __tablename__ = "SUBIDAS_EVIDENCIA"
+
+    id_subida = Column("ID_SUBIDA", String(32), primary_key=True)  # uuid4 hex
+    id_ticket_subida = Column("ID_TICKET_SUBIDA", Integer, ForeignKey("TICKETS.ID_TICKET", ondelete="CASCADE"), nullable=False)
+    dispositivo_subida = Column("DISPOSITIVO_SUBIDA", String(100), nullable=False)
+    blob_subida = Column("BLOB_SUBIDA", String(255), nullable=False)
+    content_type_subida = Column("CONTENT_TYPE_SUBIDA", String(50), nullable=False)
+    tamano_subida = Column("TAMANO_SUBIDA", BigInteger, nullable=False)
+    offset_subida = Column("OFFSET_SUBIDA", BigInteger, nullable=False, default=0)
+    # Se llena al completar (sin FK: la evidencia puede archivarse)
+    id_evidencia_subida = Column("ID_EVIDENCIA_SUBIDA", Integer, nullable=True)
+    fecha_creacion_subida = Column("FECHA_CREACION_SUBIDA", DateTime(timezone=True), server_default=func.now())
+    fecha_expira_subida = Column("FECHA_EXPIRA_SUBIDA", DateTime, nullable=False)
+
+    # Limpieza de sesiones vencidas
+    __table_args__ = (
+        Index("IX_SUBIDAS_EVIDENCIA_EXPIRA", "FECHA_EXPIRA_SUBIDA"),
+    )
+
+# ==========================================
+# 10. SECUENCIA DE CAMBIOS (Sincronización móvil)
+# ==========================================
+
+class CambioSync(Base):
+    """
+    Una fila por zona o ticket escrito (services/sync.py). ID_CAMBIO es la
+    secuencia: el cliente guarda el último que recibió y pide lo posterior.
+    """
+    __tablename__ = "CAMBIOS_SYNC"
+
+    id_cambio = Column("ID_CAMBIO", Integer, primary_key=True, autoincrement=True)
+    entidad_cambio = Column("ENTIDAD_CAMBIO", Enum(EntidadSync), nullable=False)
+    id_entidad_cambio = Column("ID_ENTIDAD_CAMBIO", Integer, nullable=False)
+    # Dispositivo que reportó el ticket; "*" = cambio visible para todos (zonas)
+    dispositivo_cambio = Column("DISPOSITIVO_CAMBIO", String(100), nullable=False)
+    operacion_cambio = Column("OPERACION_CAMBIO", Enum(OperacionSync), nullable=False)
+    fecha_cambio = Column("FECHA_CAMBIO", DateTime, nullable=False)
+
+    # Cambios de un dispositivo (y los globales) a partir de un ID
+    __table_args__ = (
+        Index("IX_CAMBIOS_SYNC_DISPOSITIVO", "DISPOSITIVO_CAMBIO", "ID_CAMBIO"),
+    )
+
+# ==========================================
+# 11. SESIONES (Refresh tokens)
+# ==========================================
+
+class RefreshToken(Base):
+    """
+    Refresh tokens emitidos (auth.py). Se guarda el HMAC-SHA256 del token,
+    nunca el token. Cada uso lo rota: se marca FECHA_USO y se emite otro de
+    la misma familia (una familia = un inicio de sesión en un dispositivo).
+    Presentar uno ya usado revoca la familia completa.
+    """
+    __tablename__ = "REFRESH_TOKENS"
+
+    id_refresh = Column("ID_REFRESH", Integer, primary_key=True, autoincrement=True)
+    id_usuario_refresh = Column("ID_USUARIO_REFRESH", Integer, ForeignKey("USUARIOS.ID_USUARIO", ondelete="CASCADE"), nullable=False)
+    hash_refresh = Column("HASH_REFRESH", String(64), unique=True, nullable=False)
+    familia_refresh = Column("FAMILIA_REFRESH", String(32), nullable=False)
+    fecha_creacion_refresh = Column("FECHA_CREACION_REFRESH", DateTime, nullable=False)
+    fecha_expira_refresh = Column("FECHA_EXPIRA_REFRESH", DateTime, nullable=False)
+    fecha_uso_refresh = Column("FECHA_USO_REFRESH", DateTime, nullable=True)        # Ya rotado
+    fecha_revocado_refresh = Column("FECHA_REVOCADO_REFRESH", DateTime, nullable=True)
+
+    usuario = relationship("Usuario")
+
+    # Revocar por familia o por usuario; depurar vencidos
+    __table_args__ = (
+        Index("IX_REFRESH_TOKENS_FAMILIA", "FAMILIA_REFRESH"),
+        Index("IX_REFRESH_TOKENS_USUARIO", "ID_USUARIO_REFRESH"),
+        Index("IX_REFRESH_TOKENS_EXPIRA", "FECHA_EXPIRA_REFRESH"),
+    )
+
+# ==========================================
+# 12. MAPA PÚBLICO (Conteos diarios y snapshots)
+# ==========================================
+
+class ConteoIncidenteDia(Base):
+    """
+    Tickets reportados por día de creación (UTC), zona y tipo de incidente,
+    y cuántos de ellos están cerrados. Se actualiza al crear un ticket y al
+    cerrarlo o reabrirlo (services/mapa.py); los snapshots del mapa público
+    se generan sumando estas filas, sin leer los tickets.
+    """
+    __tablename__ = "CONTEOS_INCIDENTES_DIA"
+
+    fecha_conteo = Column("FECHA_CONTEO", Date, primary_key=True)
+    id_zona_conteo = Column("ID_ZONA_CONTEO", Integer, primary_key=True)  # 0 = sin zona
+    tipo_incidente_conteo = Column("TIPO_INCIDENTE_CONTEO", Enum(TipoIncidente), primary_key=True)
+    total_conteo = Column("TOTAL_CONTEO", Integer, nullable=False, default=0)
+    cerrados_conteo = Column("CERRADOS_CONTEO", Integer, nullable=False, default=0)
+
+class SnapshotMapa(Base):
+    """
+    JSON del mapa público de una ventana de días, ya serializado. Nunca se
+    modifica: si los conteos cambian se agrega otro (con su propio ID y URL).
+    """
+    __tablename__ = "SNAPSHOTS_MAPA"
+
+    id_snapshot = Column("ID_SNAPSHOT", Integer, primary_key=True, autoincrement=True)
+    ventana_snapshot = Column("VENTANA_SNAPSHOT", Integer, nullable=False)   # Días
+    hash_snapshot = Column("HASH_SNAPSHOT", String(64), nullable=False)      # SHA-256 del contenido (ETag)
+    contenido_snapshot = Column("CONTENIDO_SNAPSHOT", Text(2 ** 24 - 1), nullable=False)
+    fecha_snapshot = Column("FECHA_SNAPSHOT", DateTime, nullable=False)
+
+    # Último snapshot de cada ventana
+    __table_args__ = (
+        Index("IX_SNAPSHOTS_MAPA_VENTANA", "VENTANA_SNAPSHOT", "ID_SNAPSHOT"),
+    )
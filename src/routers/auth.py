@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from datetime import timedelta
 
-from .. import database, schemas, models, auth, config
+from .. import database, schemas, models, auth
+from ..services.instrumentation import query_budget
 
 router = APIRouter(
     prefix="/auth",
@@ -11,6 +11,7 @@ router = APIRouter(
 )
 
 @router.post("/login", response_model=schemas.Token) 
+@query_budget(2)
 # Nota: Debes agregar la clase Token en tus schemas.py o usar un dict simple
 def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
@@ -25,6 +26,9 @@ def login_for_access_token(
     Retorna:
     - **access_token**: El JWT que debes guardar en Flutter (SecureStorage).
     - **token_type**: "bearer"
+    - **refresh_token**: Para renovar el access_token en /auth/refresh sin
+      volver a pedir la contraseña (guardarlo también en SecureStorage).
+    - **expires_in**: Segundos de vigencia del access_token.
     """
     
     # 1. Buscar usuario por correo (form_data.username se mapea a correo_usuario)
@@ -40,24 +44,52 @@ def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # 3. Calcular tiempo de expiración
-    settings = config.get_settings()
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    # 4. Crear el Token JWT incluyendo datos útiles en el payload
-    access_token = auth.create_access_token(
-        data={
-            "sub": user.correo_usuario,           # Subject (Identificador principal)
-            "id_user": user.id_usuario,           # ID numérico
-            "org_id": user.id_organizacion_usuario, # Para multi-tenant
-            "rol": user.rol_usuario.value         # Para control de permisos (RBAC)
-        },
-        expires_delta=access_token_expires
-    )
+    # 3. Crear el access token JWT y el refresh token (nueva familia = nuevo dispositivo)
+    tokens = auth.create_token_pair(db, user)
+    db.commit()
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return tokens
+
+@router.post("/refresh", response_model=schemas.Token)
+@query_budget(3)
+def refresh_access_token(solicitud: schemas.RefreshTokenRequest, db: Session = Depends(database.get_db)):
+    """
+    Cambia un refresh token por un access token nuevo y el siguiente
+    refresh token (el anterior deja de servir). Sin bcrypt.
+    Presentar un refresh token ya usado revoca la sesión de ese dispositivo.
+    """
+    user, familia = auth.rotate_refresh_token(db, solicitud.refresh_token)
+    tokens = auth.create_token_pair(db, user, familia)
+    db.commit()
+    return tokens
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(2)
+def logout(solicitud: schemas.RefreshTokenRequest, db: Session = Depends(database.get_db)):
+    """
+    Cierra la sesión del dispositivo: revoca su familia de refresh tokens.
+    El access token vigente caduca solo (ACCESS_TOKEN_EXPIRE_MINUTES).
+    """
+    row = auth.find_refresh_token(db, solicitud.refresh_token)
+    if row is not None:
+        auth.revoke_refresh_family(db, row.familia_refresh)
+        db.commit()
+
+@router.post("/logout-all", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(3)
+def logout_all_devices(
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Cierra todas las sesiones del usuario: revoca sus refresh tokens y los
+    access tokens ya emitidos (incluido el de esta petición).
+    """
+    auth.revoke_all_user_tokens(db, current_user)
+    db.commit()
 
 @router.post("/register/admin", response_model=schemas.UsuarioResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(4)
 def create_new_user_by_admin(
     new_user_data: schemas.UsuarioCreate, 
     db: Session = Depends(database.get_db),
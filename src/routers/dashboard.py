@@ -1,9 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List
+from collections import defaultdict
+from datetime import timedelta
+import asyncio
+import logging
+import time
 
-from .. import database, schemas, models, auth
+from .. import database, schemas, models, auth, config
+from ..services import sla
+from ..services.cache import get_query_cache
+from ..services.instrumentation import query_budget
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/dashboard",
@@ -13,6 +23,7 @@ router = APIRouter(
 # --- 1. ESTRATEGIA (BALANCED SCORECARD) ---
 
 @router.get("/bsc/objetivos", response_model=List[schemas.ObjetivoResponse])
+@query_budget(2)
 def get_strategic_objectives(
     db: Session = Depends(database.get_db),
     current_user: models.Usuario = Depends(auth.get_current_user)
@@ -21,12 +32,20 @@ def get_strategic_objectives(
     Obtiene el tablero de objetivos estratégicos con su semáforo actual.
     Filtra SOLO los objetivos de la organización del usuario logueado.
     """
-    objetivos = db.query(models.Objetivo).filter(
-        models.Objetivo.id_organizacion_objetivo == current_user.id_organizacion_usuario
-    ).all()
-    return objetivos
+    return query_objetivos(db, current_user.id_organizacion_usuario)
+
+def query_objetivos(db: Session, org_id: int) -> List[dict]:
+    """Objetivos estratégicos de una organización (cacheado)."""
+    def compute():
+        objetivos = db.query(models.Objetivo).filter(
+            models.Objetivo.id_organizacion_objetivo == org_id
+        ).all()
+        return [schemas.ObjetivoResponse.model_validate(o).model_dump() for o in objetivos]
+
+    return get_query_cache().get_or_compute(org_id, "bsc_objetivos", ("OBJETIVOS",), compute)
 
 @router.post("/bsc/objetivos", response_model=schemas.ObjetivoResponse)
+@query_budget(3)
 def create_objective(
     objetivo: schemas.ObjetivoBase,
     db: Session = Depends(database.get_db),
@@ -54,6 +73,7 @@ def create_objective(
     return new_obj
 
 @router.patch("/bsc/objetivos/{id_objetivo}", response_model=schemas.ObjetivoResponse)
+@query_budget(4)
 def update_objective_progress(
     id_objetivo: int,
     update_data: schemas.ObjetivoUpdate,
@@ -93,7 +113,8 @@ def calculate_semaphore(avance, meta):
     """Lógica simple para determinar el color del semáforo."""
     if meta == 0: 
         return models.ColorSemaforo.ROJO
-    percentage = (avance / meta) * 100
+    # float(): al actualizar, uno llega como float y el otro como Decimal (BD)
+    percentage = (float(avance) / float(meta)) * 100
     
     if percentage < 40:
         return models.ColorSemaforo.ROJO
@@ -105,6 +126,7 @@ def calculate_semaphore(avance, meta):
 # --- 2. FINANZAS (PRESUPUESTO) ---
 
 @router.get("/finanzas/resumen")
+@query_budget(4)
 def get_financial_summary(
     db: Session = Depends(database.get_db),
     current_user: models.Usuario = Depends(auth.get_current_user)
@@ -115,8 +137,16 @@ def get_financial_summary(
     - Total Asignado a Proyectos (Presupuesto Comprometido)
     - Total Gastado Real (Gastos registrados)
     """
-    org_id = current_user.id_organizacion_usuario
+    return query_resumen_financiero(db, current_user.id_organizacion_usuario)
+
+def query_resumen_financiero(db: Session, org_id: int) -> dict:
+    """Agregados financieros de una organización (cacheado)."""
+    return get_query_cache().get_or_compute(
+        org_id, "finanzas_resumen", ("TRANSACCIONES", "PROYECTOS", "GASTOS"),
+        lambda: _compute_resumen_financiero(db, org_id)
+    )
 
+def _compute_resumen_financiero(db: Session, org_id: int) -> dict:
     # A. Sumar todas las transacciones (Ingresos - Egresos Globales)
     total_billetera = db.query(func.sum(models.Transaccion.monto_transaccion))\
         .filter(models.Transaccion.id_organizacion_transaccion == org_id).scalar() or 0.0
@@ -139,6 +169,7 @@ def get_financial_summary(
     }
 
 @router.post("/finanzas/transacciones")
+@query_budget(2)
 def add_transaction(
     transaccion: schemas.TransaccionCreate,
     db: Session = Depends(database.get_db),
@@ -161,6 +192,7 @@ def add_transaction(
 # --- 3. OPERACIÓN (PROYECTOS) ---
 
 @router.get("/proyectos", response_model=List[schemas.ProyectoResponse])
+@query_budget(2)
 def get_projects(
     db: Session = Depends(database.get_db),
     current_user: models.Usuario = Depends(auth.get_current_user)
@@ -168,12 +200,92 @@ def get_projects(
     """
     Lista los proyectos operativos de la organización.
     """
-    proyectos = db.query(models.Proyecto).filter(
-        models.Proyecto.id_organizacion_proyecto == current_user.id_organizacion_usuario
-    ).all()
-    return proyectos
+    return query_proyectos(db, current_user.id_organizacion_usuario)
+
+def query_proyectos(db: Session, org_id: int) -> List[dict]:
+    """Proyectos operativos de una organización (cacheado)."""
+    def compute():
+        proyectos = db.query(models.Proyecto).filter(
+            models.Proyecto.id_organizacion_proyecto == org_id
+        ).all()
+        return [schemas.ProyectoResponse.model_validate(p).model_dump() for p in proyectos]
+
+    return get_query_cache().get_or_compute(org_id, "proyectos", ("PROYECTOS",), compute)
+
+@router.get("/proyectos/burndown", response_model=List[schemas.BurnDownProyecto])
+@query_budget(3)
+def get_projects_burndown(
+    periodo: schemas.PeriodoBurnDown = schemas.PeriodoBurnDown.MES,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Serie de gasto acumulado vs. presupuesto por proyecto (burn-down),
+    agrupada por SEMANA o MES y desglosada por categoría de gasto.
+    Todos los proyectos de la organización salen de una sola agregación.
+    """
+    org_id = current_user.id_organizacion_usuario
+    return get_query_cache().get_or_compute(
+        org_id, "proyectos_burndown", ("PROYECTOS", "GASTOS"),
+        lambda: _compute_burndown(db, org_id, periodo),
+        params=(periodo.value,)
+    )
+
+def _period_start(fecha, periodo: schemas.PeriodoBurnDown):
+    if periodo == schemas.PeriodoBurnDown.SEMANA:
+        return fecha - timedelta(days=fecha.weekday())
+    return fecha.replace(day=1)
+
+def _compute_burndown(db: Session, org_id: int, periodo: schemas.PeriodoBurnDown) -> List[dict]:
+    # Una sola agregación por (proyecto, día, categoría); usa el índice
+    # IX_GASTOS_PROYECTO_FECHA. Los días se pliegan a semanas/meses aquí para
+    # no depender de funciones de fecha propias de cada motor.
+    rows = db.query(
+        models.Gasto.id_proyecto_gasto,
+        models.Gasto.fecha_gasto,
+        models.Gasto.categoria_gasto,
+        func.sum(models.Gasto.monto_gasto)
+    ).join(models.Proyecto)\
+        .filter(models.Proyecto.id_organizacion_proyecto == org_id)\
+        .group_by(models.Gasto.id_proyecto_gasto, models.Gasto.fecha_gasto, models.Gasto.categoria_gasto)\
+        .all()
+
+    # {id_proyecto: {inicio_periodo: {categoria: monto}}}
+    buckets = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+    for project_id, fecha, categoria, monto in rows:
+        if fecha is None:
+            continue
+        categoria = categoria.value if categoria is not None else models.CategoriaGasto.OTROS.value
+        buckets[project_id][_period_start(fecha, periodo)][categoria] += float(monto or 0)
+
+    result = []
+    for proyecto in query_proyectos(db, org_id):
+        presupuesto = float(proyecto["presupuesto_proyecto"] or 0)
+        acumulado = 0.0
+        serie = []
+        for inicio, por_categoria in sorted(buckets.get(proyecto["id_proyecto"], {}).items()):
+            gastado = sum(por_categoria.values())
+            acumulado += gastado
+            serie.append({
+                "periodo": inicio,
+                "gastado": gastado,
+                "acumulado": acumulado,
+                "restante": presupuesto - acumulado,
+                "por_categoria": dict(por_categoria)
+            })
+        result.append({
+            "id_proyecto": proyecto["id_proyecto"],
+            "nombre_proyecto": proyecto["nombre_proyecto"],
+            "presupuesto_proyecto": presupuesto,
+            "fecha_inicio_proyecto": proyecto["fecha_inicio_proyecto"],
+            "fecha_fin_proyecto": proyecto["fecha_fin_proyecto"],
+            "total_gastado": acumulado,
+            "serie": serie
+        })
+    return result
 
 @router.post("/proyectos", response_model=schemas.ProyectoResponse)
+@query_budget(4)
 def create_project(
     proyecto: schemas.ProyectoCreate,
     db: Session = Depends(database.get_db),
@@ -211,6 +323,7 @@ def create_project(
 # --- 4. IMPACTO (CLIENTES) ---
 
 @router.get("/impacto/metricas")
+@query_budget(4)
 def get_impact_metrics(
     db: Session = Depends(database.get_db),
     current_user: models.Usuario = Depends(auth.get_current_user)
@@ -218,8 +331,16 @@ def get_impact_metrics(
     """
     Retorna contadores rápidos para el Dashboard de Impacto.
     """
-    org_id = current_user.id_organizacion_usuario
-    
+    return query_metricas_impacto(db, current_user.id_organizacion_usuario)
+
+def query_metricas_impacto(db: Session, org_id: int) -> dict:
+    """Contadores de tickets y satisfacción de una organización (cacheado)."""
+    return get_query_cache().get_or_compute(
+        org_id, "impacto_metricas", ("TICKETS", "MEDICIONES"),
+        lambda: _compute_metricas_impacto(db, org_id)
+    )
+
+def _compute_metricas_impacto(db: Session, org_id: int) -> dict:
     # Contar tickets por estado
     tickets_resueltos = db.query(models.Ticket).filter(
         models.Ticket.id_organizacion_ticket == org_id,
@@ -245,4 +366,90 @@ def get_impact_metrics(
         "tickets_resueltos": tickets_resueltos,
         "tickets_activos": tickets_abiertos,
         "satisfaccion_ciudadana": satisfaccion
-    }
\ No newline at end of file
+    }
+
+# --- 4b. SLA (TIEMPOS DE RESOLUCIÓN) ---
+
+@router.get("/sla", response_model=schemas.SlaResponse)
+@query_budget(3)
+def get_sla_metrics(
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Percentiles (p50/p90/p99) del tiempo de resolución y antigüedad de los
+    tickets abiertos, en total, por zona y por tipo de incidente.
+    Los percentiles salen de histogramas que se mantienen al cerrar cada
+    ticket (no se ordenan tickets en cada petición).
+    """
+    org_id = current_user.id_organizacion_usuario
+    return get_query_cache().get_or_compute(
+        org_id, "sla", ("TICKETS", "HISTOGRAMAS_RESOLUCION"),
+        lambda: sla.sla_report(db, org_id)
+    )
+
+# --- 5. HOME (VISTA COMPUESTA) ---
+
+# Cada sección del Home: (nombre, consulta). Las consultas ya devuelven
+# datos planos, así que no dependen de la sesión una vez cerrada.
+HOME_SECTIONS = [
+    ("objetivos", query_objetivos),
+    ("finanzas", query_resumen_financiero),
+    ("impacto", query_metricas_impacto),
+    ("proyectos", query_proyectos),
+]
+
+def _run_home_section(query, org_id: int, engine):
+    """Ejecuta una sección en su propia sesión (conexión independiente del pool)."""
+    db = database.open_session(engine)
+    try:
+        return query(db, org_id)
+    finally:
+        db.close()
+
+@router.get("/home", response_model=schemas.DashboardHomeResponse)
+@query_budget(9)
+async def get_dashboard_home(
+    request: Request,
+    current_user: models.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Devuelve en una sola llamada las cuatro secciones del Home
+    (objetivos, finanzas, impacto y proyectos).
+
+    - El token se valida una sola vez.
+    - Las secciones se consultan en paralelo, cada una con su propia conexión.
+    - Si una sección excede DASHBOARD_SECTION_TIMEOUT_SECONDS o falla, se
+      responde sin ella y se reporta en `secciones_incompletas`.
+    """
+    settings = config.get_settings()
+    org_id = current_user.id_organizacion_usuario
+    # Las cuatro secciones leen del mismo engine (réplica o primario)
+    engine = database.engine_for_request(request)
+
+    async def timed(name, query):
+        start = time.perf_counter()
+        try:
+            # asyncio.to_thread (y no el threadpool de AnyIO) para que el
+            # timeout libere la respuesta aunque el hilo siga ejecutando.
+            value = await asyncio.wait_for(
+                asyncio.to_thread(_run_home_section, query, org_id, engine),
+                timeout=settings.DASHBOARD_SECTION_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Sección '%s' del Home excedió el timeout", name)
+            value = None
+        except Exception:
+            logger.exception("Error calculando la sección '%s' del Home", name)
+            value = None
+        return name, value, (time.perf_counter() - start) * 1000
+
+    results = await asyncio.gather(*(timed(*section) for section in HOME_SECTIONS))
+
+    response = {"secciones_incompletas": [], "tiempos_ms": {}}
+    for name, value, elapsed_ms in results:
+        response[name] = value
+        response["tiempos_ms"][name] = round(elapsed_ms, 2)
+        if value is None:
+            response["secciones_incompletas"].append(name)
+    return response
@@ -0,0 +1,81 @@
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+
+from .. import database, config
+from ..services.cache import get_query_cache
+from ..services.metrics import get_pool_metrics
+from ..services.instrumentation import get_instrumentation
+from ..services.rate_limit import get_rate_limiter
+from ..services.tasks import get_task_queue
+from ..services.eventos import get_event_writer
+from ..services.encoding import get_compression_stats
+
+def verify_metrics_token(x_metrics_token: Optional[str] = Header(None)):
+    """
+    Exige el header X-Metrics-Token igual a METRICS_TOKEN. Sin METRICS_TOKEN
+    configurado /internal/* no existe (404): expone SQL y estado interno.
+    """
+    expected = config.get_settings().METRICS_TOKEN
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_metrics_token or not hmac.compare_digest(x_metrics_token, expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token de métricas inválido")
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["Interno (Observabilidad)"],
+    include_in_schema=False,
+    dependencies=[Depends(verify_metrics_token)]
+)
+
+@router.get("/metrics")
+def get_internal_metrics(request: Request):
+    """
+    Telemetría del proceso:
+    - pool: por pool (primario, replica-N): conexiones en uso, overflow,
+      espera por checkout y vida de conexiones.
+    - query_cache: aciertos/fallos de la caché del dashboard.
+    - replicas: salud y lecturas por réplica (si hay réplicas configuradas).
+    - tasks: cola de tareas en segundo plano (encoladas, reintentos, fallidas).
+    - event_log: escritor en lotes de la bitácora de tickets.
+    - rate_limit: peticiones permitidas/rechazadas por ruta pública.
+    - compression: respuestas comprimidas y bytes antes/después por codificación.
+    - startup: tiempos de arranque del worker.
+    """
+    replicas = database.get_replica_set()
+    return {
+        "pool": {name: get_pool_metrics(name).snapshot(pool) for name, pool in database.named_pools().items()},
+        "replicas": replicas.snapshot() if replicas is not None else None,
+        "query_cache": get_query_cache().stats(),
+        "rate_limit": get_rate_limiter().stats(),
+        "tasks": get_task_queue().stats(),
+        "event_log": get_event_writer().stats(),
+        "compression": get_compression_stats().snapshot(),
+        "startup": getattr(request.app.state, "startup_timings", {})
+    }
+
+@router.get("/metrics/prometheus", response_class=PlainTextResponse)
+def get_prometheus_metrics():
+    """
+    Métricas en formato de texto Prometheus: latencia y SQL por ruta,
+    duración de consultas, pool de conexiones, caché de consultas y cola de tareas.
+    """
+    text = get_instrumentation().render_prometheus(database.named_pools())
+    text += "\n".join(get_task_queue().render_prometheus()) + "\n"
+    return PlainTextResponse(
+        text,
+        media_type="text/plain; version=0.0.4"
+    )
+
+@router.get("/slow-queries")
+def get_slow_queries():
+    """Muestra del log de consultas lentas (parámetros redactados)."""
+    return list(get_instrumentation().slow_queries)
+
+@router.get("/query-budgets")
+def get_query_budget_violations():
+    """Últimas peticiones que excedieron el presupuesto de consultas de su endpoint."""
+    return list(get_instrumentation().budget_violations)
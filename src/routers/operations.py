@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, UploadFile, File
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List, Optional
+from datetime import date
+import codecs
+import csv
 
-from .. import database, schemas, models, auth
+from .. import database, schemas, models, auth, config
+from ..services import archivo, busqueda, duplicados, encoding, mapa, pagination, sla
+from ..services.instrumentation import query_budget
+from ..services.eventos import record_ticket_event
 
 router = APIRouter(
     prefix="/operations",
@@ -12,15 +20,28 @@ router = APIRouter(
 # --- 1. BANDEJA DE ENTRADA (TICKETS) ---
 
 @router.get("/tickets/inbox", response_model=List[schemas.TicketResponse])
+@query_budget(2)
 def get_tickets_inbox(
+    request: Request,
+    response: Response,
     estado: Optional[models.EstadoTicket] = None,
     zona_id: Optional[int] = None,
+    incluir_duplicados: bool = True,
+    limite: Optional[int] = Query(None, ge=1, le=pagination.MAX_LIMIT),
+    cursor: Optional[str] = None,
     db: Session = Depends(database.get_db),
     current_user: models.Usuario = Depends(auth.get_current_user)
 ):
     """
     Obtiene los tickets asignados a la organización del usuario.
-    Permite filtrar por Estado (ej. solo 'RECIBIDO') o Zona.
+    Permite filtrar por Estado (ej. solo 'RECIBIDO') o Zona, y ocultar los
+    duplicados (`incluir_duplicados=false`) para ver un ticket por incidente.
+
+    Paginación por cursor (opcional): con `limite`, la respuesta trae a lo
+    más `limite` tickets (más recientes primero) y el header
+    `X-Siguiente-Cursor` para pedir la siguiente página con `cursor`.
+    Sin `limite` se devuelve la bandeja completa, como antes.
+    Acepta formato columnar (ver services/encoding.py).
     """
     query = db.query(models.Ticket).filter(
         models.Ticket.id_organizacion_ticket == current_user.id_organizacion_usuario
@@ -31,34 +52,154 @@ def get_tickets_inbox(
     
     if zona_id:
         query = query.filter(models.Ticket.id_zona_ticket == zona_id)
-        
-    # Ordenar por fecha (más recientes primero)
-    tickets = query.order_by(models.Ticket.fecha_creacion_ticket.desc()).all()
-    return tickets
+
+    if not incluir_duplicados:
+        query = query.filter(models.Ticket.id_ticket_padre.is_(None))
+
+    if limite is None and cursor is None:
+        # Ordenar por fecha (más recientes primero)
+        tickets = query.order_by(models.Ticket.fecha_creacion_ticket.desc()).all()
+        return encoding.list_response(request, tickets, schemas.TicketResponse)
+
+    # Keyset por ID_TICKET (orden de llegada): no recorre las páginas previas
+    limite = limite or pagination.DEFAULT_LIMIT
+    after = pagination.decode_cursor(cursor, 1)
+    if after:
+        query = query.filter(models.Ticket.id_ticket < after[0])
+    rows = query.order_by(models.Ticket.id_ticket.desc()).limit(limite + 1).all()
+    tickets, siguiente = pagination.page(rows, limite, lambda t: pagination.encode_cursor(t.id_ticket))
+    headers = {pagination.NEXT_CURSOR_HEADER: siguiente} if siguiente else None
+    if headers:
+        response.headers.update(headers)
+    return encoding.list_response(request, tickets, schemas.TicketResponse, headers)
+
+@router.get("/tickets/search", response_model=schemas.TicketsBusquedaPagina)
+@query_budget(2)
+def search_tickets(
+    q: str = Query(..., min_length=2, max_length=200),
+    limite: int = Query(pagination.DEFAULT_LIMIT, ge=1, le=pagination.MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Búsqueda de texto completo en la descripción y los hechos del lugar de
+    los tickets de mi organización, ordenada por relevancia.
+    Ignora mayúsculas y acentos ("contaminacion" encuentra "Contaminación").
+    Paginado por cursor: pasa `siguiente_cursor` para la página siguiente.
+    """
+    result = busqueda.search_tickets(db, current_user.id_organizacion_usuario, q, limite, cursor)
+    return {
+        "tickets": [
+            {**schemas.TicketResponse.model_validate(ticket).model_dump(), "relevancia": float(relevancia)}
+            for ticket, relevancia in result["tickets"]
+        ],
+        "siguiente_cursor": result["siguiente_cursor"],
+    }
+
+# Detalle completo: zona y proyecto en el mismo SELECT (LEFT JOIN, son
+# muchos-a-uno) y las evidencias de todos los tickets en un solo SELECT ... IN.
+# El costo no depende de cuántos tickets se pidan.
+
+def _hydrated_tickets(db: Session, org_id: int):
+    return db.query(models.Ticket).options(
+        joinedload(models.Ticket.zona),
+        joinedload(models.Ticket.proyecto),
+        selectinload(models.Ticket.evidencias)
+    ).filter(models.Ticket.id_organizacion_ticket == org_id)
+
+@router.get("/tickets/lote", response_model=List[schemas.TicketDetalleResponse])
+@query_budget(3)
+def get_tickets_batch(
+    ids: List[int] = Query(..., description="IDs de ticket (repetir el parámetro: ?ids=1&ids=2)"),
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Varios tickets con detalle completo (zona, proyecto y evidencias) en
+    una petición, en el orden pedido. Reemplaza llamar a /tickets/{id} por
+    cada fila. Se omiten los IDs inexistentes, de otra organización o
+    archivados. Máximo pagination.MAX_LIMIT IDs.
+    """
+    if len(ids) > pagination.MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Máximo {pagination.MAX_LIMIT} tickets por petición")
+    tickets = _hydrated_tickets(db, current_user.id_organizacion_usuario).filter(
+        models.Ticket.id_ticket.in_(set(ids))
+    ).all()
+    by_id = {ticket.id_ticket: ticket for ticket in tickets}
+    return [by_id[ticket_id] for ticket_id in dict.fromkeys(ids) if ticket_id in by_id]
 
 @router.get("/tickets/{ticket_id}", response_model=schemas.TicketResponse)
+@query_budget(3)
 def get_ticket_detail(
     ticket_id: int,
+    historial: bool = False,
     db: Session = Depends(database.get_db),
     current_user: models.Usuario = Depends(auth.get_current_user)
 ):
     """
     Ver detalle de un ticket específico.
     Seguridad: Solo si pertenece a mi organización.
+    Con `historial=true` también busca en los tickets archivados.
+    Con zona, proyecto y evidencias: /tickets/{id}/detalle (o /tickets/lote).
     """
     ticket = db.query(models.Ticket).filter(
         models.Ticket.id_ticket == ticket_id,
         models.Ticket.id_organizacion_ticket == current_user.id_organizacion_usuario
     ).first()
+    if not ticket and historial:
+        ticket = archivo.get_archived_ticket(db, ticket_id, current_user.id_organizacion_usuario)
     
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket no encontrado o no tienes permiso")
         
     return ticket
 
+@router.get("/tickets/{ticket_id}/detalle", response_model=schemas.TicketDetalleResponse)
+@query_budget(3)
+def get_ticket_full_detail(
+    ticket_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Detalle completo de un ticket: además de sus datos, la zona, el
+    proyecto asignado y las evidencias (sin llamadas adicionales).
+    """
+    ticket = _hydrated_tickets(db, current_user.id_organizacion_usuario).filter(
+        models.Ticket.id_ticket == ticket_id
+    ).first()
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket no encontrado o no tienes permiso")
+    return ticket
+
+@router.get("/tickets/{ticket_id}/duplicados", response_model=List[schemas.TicketResponse])
+@query_budget(3)
+def get_ticket_duplicates(
+    ticket_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Reportes detectados como duplicados de este ticket (mismo incidente),
+    del más antiguo al más reciente. Solo los de mi organización.
+    """
+    ticket_exists = db.query(models.Ticket.id_ticket).filter(
+        models.Ticket.id_ticket == ticket_id,
+        models.Ticket.id_organizacion_ticket == current_user.id_organizacion_usuario
+    ).first()
+    if not ticket_exists:
+        raise HTTPException(status_code=404, detail="Ticket no encontrado o no tienes permiso")
+
+    return db.query(models.Ticket).filter(
+        models.Ticket.id_ticket_padre == ticket_id,
+        models.Ticket.id_organizacion_ticket == current_user.id_organizacion_usuario
+    ).order_by(models.Ticket.id_ticket).all()
+
 # --- 2. GESTIÓN Y ASIGNACIÓN ---
 
 @router.patch("/tickets/{ticket_id}/assign", response_model=schemas.TicketResponse)
+@query_budget(8)
 def assign_ticket_to_project(
     ticket_id: int,
     update_data: schemas.TicketUpdateInternal,
@@ -78,6 +219,9 @@ def assign_ticket_to_project(
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket no encontrado")
 
+    estado_anterior = ticket.estado_ticket
+    prioridad_anterior = ticket.prioridad_ticket
+
     # 2. Validar Proyecto (Debe ser de la misma Org)
     if update_data.id_proyecto_ticket:
         project = db.query(models.Proyecto).filter(
@@ -95,12 +239,33 @@ def assign_ticket_to_project(
         ticket.prioridad_ticket = update_data.prioridad_ticket
     if update_data.estado_ticket:
         ticket.estado_ticket = update_data.estado_ticket
+    # Fecha de cierre, histograma de tiempos de resolución (SLA) y conteos del mapa público
+    sla.track_state_change(db, ticket, estado_anterior)
+    mapa.track_state_change(db, ticket, estado_anterior)
+
+    # 4. Bitácora (se escribe en lote después del commit)
+    org_id = current_user.id_organizacion_usuario
+    if update_data.id_proyecto_ticket:
+        record_ticket_event(
+            db, ticket, models.TipoEventoTicket.ASIGNADO, org_id, current_user.id_usuario,
+            estado_anterior, {"id_proyecto": update_data.id_proyecto_ticket}
+        )
+    elif ticket.estado_ticket != estado_anterior:
+        record_ticket_event(
+            db, ticket, models.TipoEventoTicket.CAMBIO_ESTADO, org_id, current_user.id_usuario, estado_anterior
+        )
+    if ticket.prioridad_ticket != prioridad_anterior:
+        record_ticket_event(
+            db, ticket, models.TipoEventoTicket.CAMBIO_PRIORIDAD, org_id, current_user.id_usuario,
+            estado_anterior, {"anterior": prioridad_anterior, "nueva": ticket.prioridad_ticket}
+        )
 
     db.commit()
     db.refresh(ticket)
     return ticket
 
 @router.patch("/tickets/{ticket_id}/transfer", response_model=schemas.TicketResponse)
+@query_budget(10)
 def transfer_ticket_organization(
     ticket_id: int,
     transfer_data: schemas.TicketTransfer,
@@ -129,22 +294,89 @@ def transfer_ticket_organization(
         raise HTTPException(status_code=404, detail="Organización destino no existe")
 
     # 3. Realizar la transferencia
+    estado_anterior = ticket.estado_ticket
+    detalle = {
+        "origen": ticket.id_organizacion_ticket,
+        "destino": transfer_data.nuevo_id_organizacion,
+        "id_proyecto_anterior": ticket.id_proyecto_ticket,
+        "notas": transfer_data.notas,
+    }
+    # Reseteamos estado (antes de cambiar de dueño: si estaba cerrado, se
+    # descuenta del histograma de SLA de la organización de origen)
+    ticket.estado_ticket = models.EstadoTicket.RECIBIDO
+    sla.track_state_change(db, ticket, estado_anterior)
+    mapa.track_state_change(db, ticket, estado_anterior)
+    # Los duplicados no cruzan organizaciones: sale de su grupo antes de cambiar de dueño
+    duplicados.detach_for_transfer(db, ticket)
     # Cambiamos el dueño del ticket
     ticket.id_organizacion_ticket = transfer_data.nuevo_id_organizacion
     # Quitamos el proyecto asignado (porque el proyecto ID 5 de la Org A no existe en la Org B)
     ticket.id_proyecto_ticket = None 
-    # Reseteamos estado
-    ticket.estado_ticket = models.EstadoTicket.RECIBIDO
-    
-    # (Opcional) Podrías guardar un log de "transfer_data.notas" en una tabla de auditoría
     
+    # Bitácora: el evento queda a nombre de la organización de origen
+    record_ticket_event(
+        db, ticket, models.TipoEventoTicket.TRANSFERIDO,
+        current_user.id_organizacion_usuario, current_user.id_usuario, estado_anterior, detalle
+    )
+
     db.commit()
     db.refresh(ticket)
     return ticket
 
+# --- 2b. BITÁCORA (Líneas de tiempo) ---
+
+@router.get("/tickets/{ticket_id}/eventos", response_model=List[schemas.EventoTicketResponse])
+@query_budget(3)
+def get_ticket_timeline(
+    ticket_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Historial completo de un ticket de mi organización (del más antiguo al
+    más reciente), incluidos los cambios hechos por organizaciones anteriores.
+    """
+    ticket_exists = db.query(models.Ticket.id_ticket).filter(
+        models.Ticket.id_ticket == ticket_id,
+        models.Ticket.id_organizacion_ticket == current_user.id_organizacion_usuario
+    ).first()
+    if not ticket_exists:
+        raise HTTPException(status_code=404, detail="Ticket no encontrado o no tienes permiso")
+
+    return db.query(models.EventoTicket).filter(
+        models.EventoTicket.id_ticket_evento == ticket_id
+    ).order_by(models.EventoTicket.id_evento).all()
+
+@router.get("/eventos", response_model=schemas.EventosPagina)
+@query_budget(2)
+def get_organization_timeline(
+    tipo: Optional[models.TipoEventoTicket] = None,
+    limite: int = Query(pagination.DEFAULT_LIMIT, ge=1, le=pagination.MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Eventos originados por mi organización, del más reciente al más antiguo.
+    Paginado por cursor: pasa `siguiente_cursor` para la página siguiente.
+    """
+    query = db.query(models.EventoTicket).filter(
+        models.EventoTicket.id_organizacion_evento == current_user.id_organizacion_usuario
+    )
+    if tipo:
+        query = query.filter(models.EventoTicket.tipo_evento == tipo)
+    after = pagination.decode_cursor(cursor, 1)
+    if after:
+        query = query.filter(models.EventoTicket.id_evento < after[0])
+
+    rows = query.order_by(models.EventoTicket.id_evento.desc()).limit(limite + 1).all()
+    eventos, siguiente = pagination.page(rows, limite, lambda e: pagination.encode_cursor(e.id_evento))
+    return {"eventos": eventos, "siguiente_cursor": siguiente}
+
 # --- 3. GASTOS OPERATIVOS ---
 
 @router.post("/gastos", status_code=status.HTTP_201_CREATED)
+@query_budget(4)
 def register_expense(
     gasto: schemas.GastoCreate,
     db: Session = Depends(database.get_db),
@@ -178,9 +410,117 @@ def register_expense(
     
     return {"message": "Gasto registrado correctamente", "id_gasto": new_expense.id_gasto}
 
+GASTOS_CSV_COLUMNAS = {"id_proyecto_gasto", "monto_gasto", "concepto_gasto", "categoria_gasto"}
+
+@router.post("/gastos/importar", response_model=schemas.GastoImportResultado)
+@query_budget(3)
+def import_expenses_csv(
+    file: UploadFile = File(...),
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(auth.get_current_user)
+):
+    """
+    Importación masiva de gastos desde un CSV (cierre de mes).
+
+    Columnas: id_proyecto_gasto, monto_gasto, concepto_gasto, categoria_gasto
+    y opcionalmente evidencia_url_gasto, fecha_gasto (AAAA-MM-DD).
+
+    - El archivo se lee como flujo, fila por fila (no se carga completo).
+    - La propiedad de los proyectos se valida con UNA sola consulta.
+    - Las filas válidas se insertan en bloques (GASTOS_IMPORT_CHUNK_SIZE).
+    - Las filas inválidas se reportan en `errores` sin rechazar el archivo.
+    """
+    settings = config.get_settings()
+
+    if not (file.filename or "").lower().endswith(".csv"):
+        raise HTTPException(status_code=400, detail="El archivo debe ser .csv")
+
+    # 1. Proyectos de mi organización (una consulta para todo el archivo)
+    own_projects = {
+        project_id for (project_id,) in db.query(models.Proyecto.id_proyecto).filter(
+            models.Proyecto.id_organizacion_proyecto == current_user.id_organizacion_usuario
+        )
+    }
+
+    # 2. Lectura en streaming (utf-8-sig tolera el BOM que agrega Excel)
+    reader = csv.DictReader(codecs.iterdecode(file.file, "utf-8-sig"))
+
+    processed = 0
+    inserted = 0
+    failed = 0
+    errores = []
+    chunk = []
+    # Filas sin fecha: hoy (lo que pondría el default CURRENT_DATE del servidor)
+    hoy = date.today()
+
+    def add_error(line: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errores) < settings.GASTOS_IMPORT_MAX_ERRORS:
+            errores.append({"fila": line, "error": message})
+
+    def flush_chunk():
+        nonlocal inserted, chunk
+        if chunk:
+            # render_nulls: el ORM omite las claves None y partiría el bloque por filas
+            db.execute(insert(models.Gasto).execution_options(render_nulls=True), chunk)
+            inserted += len(chunk)
+            chunk = []
+
+    try:
+        missing = GASTOS_CSV_COLUMNAS - set(reader.fieldnames or [])
+        if missing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Faltan columnas en el CSV: {sorted(missing)}"
+            )
+
+        for row in reader:
+            processed += 1
+            line = reader.line_num
+
+            # 3. Validar tipos y categoría (CategoriaGasto) con el schema
+            try:
+                gasto = schemas.GastoImportRow.model_validate(
+                    {k: v for k, v in row.items() if k is not None and v not in ("", None)}
+                )
+            except ValidationError as e:
+                add_error(line, "; ".join(
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+                ))
+                continue
+
+            # 4. Validar propiedad del proyecto
+            if gasto.id_proyecto_gasto not in own_projects:
+                add_error(line, "Proyecto no válido o acceso denegado")
+                continue
+
+            # Mismas columnas en todas las filas: un solo INSERT multi-fila por bloque
+            values = gasto.model_dump()
+            if values["fecha_gasto"] is None:
+                values["fecha_gasto"] = hoy
+            chunk.append(values)
+            if len(chunk) >= settings.GASTOS_IMPORT_CHUNK_SIZE:
+                flush_chunk()
+
+        flush_chunk()
+    except (csv.Error, UnicodeDecodeError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"CSV mal formado: {e}")
+
+    db.commit()
+
+    return {
+        "filas_procesadas": processed,
+        "gastos_registrados": inserted,
+        "filas_con_error": failed,
+        "errores": errores
+    }
+
 # --- 4. AYUDA PARA REASIGNACIÓN (ZONAS) ---
 
 @router.get("/cobertura/sugerencias/{zona_id}")
+@query_budget(3)
 def get_organizations_by_zone(
     zona_id: int,
     db: Session = Depends(database.get_db),
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status, UploadFile, File
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import asyncio
+import os
 
-from .. import database, schemas, models
+from .. import database, schemas, models, config
 
+from ..services import archivo, encoding, mapa, storage, sync
 from ..services.storage import upload_image_to_azure
+from ..services.catalogos import get_zona_catalogo
+from ..services.instrumentation import query_budget
+from ..services.tasks import enqueue_task
+from ..services.eventos import record_ticket_event
 
 router = APIRouter(
     prefix="/public",
@@ -14,17 +23,20 @@ router = APIRouter(
 # --- 1. CATÁLOGOS ---
 
 @router.get("/zonas", response_model=List[schemas.ZonaResponse])
-def get_zonas(db: Session = Depends(database.get_db)):
+@query_budget(1)
+def get_zonas(request: Request, db: Session = Depends(database.get_db)):
     """
     Obtiene la lista de municipios (Zonas) disponibles.
     Uso: Llenar el Dropdown en la App Flutter.
+    Acepta formato columnar (ver services/encoding.py).
     """
-    zonas = db.query(models.Zona).all()
-    return zonas
+    # Se sirve desde el catálogo en memoria (cargado al arrancar)
+    return encoding.list_response(request, get_zona_catalogo().get(db), schemas.ZonaResponse)
 
 # --- GESTIÓN DE MULTIMEDIA ---
 
 @router.post("/evidence/upload", status_code=status.HTTP_201_CREATED)
+@query_budget(0)
 async def upload_evidence_file(file: UploadFile = File(...)):
     """
     Endpoint dedicado para subir imágenes/videos a Azure Blob Storage.
@@ -50,9 +62,347 @@ async def upload_evidence_file(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Subida directa: la API solo firma la URL y registra la evidencia al terminar.
+# Flujo para Flutter:
+# 1. POST /evidence/upload-url con el ticket, content-type y tamaño.
+# 2. PUT del archivo a `url_subida` con los `headers` indicados.
+# 3. POST /evidence/complete con `token_subida` -> Evidencia registrada.
+
+def _device_ticket(db: Session, id_ticket: int, device: str) -> models.Ticket:
+    """El ticket debe existir y haber sido creado por ese dispositivo."""
+    ticket = db.query(models.Ticket).filter(
+        models.Ticket.id_ticket == id_ticket,
+        models.Ticket.id_usuario_reporte_ticket == device
+    ).first()
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket no encontrado")
+    return ticket
+
+def _new_evidence(db: Session, id_ticket: int, url: str, content_type: str) -> models.Evidencia:
+    evidencia = models.Evidencia(
+        id_ticket_evidencia=id_ticket,
+        url_evidencia=url,
+        tipo_archivo_evidencia=storage.ALLOWED_UPLOAD_TYPES[content_type][1],
+        fecha_carga_evidencia=datetime.now(timezone.utc).replace(tzinfo=None),
+    )
+    db.add(evidencia)
+    return evidencia
+
+@router.post("/evidence/upload-url", response_model=schemas.UrlSubidaResponse)
+@query_budget(1)
+def request_evidence_upload_url(
+    solicitud: schemas.SolicitudSubidaEvidencia,
+    db: Session = Depends(database.get_db)
+):
+    """
+    Emite una URL de escritura de corta vigencia (UPLOAD_URL_TTL_SECONDS)
+    para UN archivo del ticket, restringida al content-type y tamaño
+    declarados. En Azure es una SAS de solo creación (sin write) sobre un
+    blob nuevo: una vez subido no se puede reemplazar, así que lo que
+    verifica /evidence/complete queda fijo.
+    """
+    if solicitud.content_type not in storage.ALLOWED_UPLOAD_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo de archivo no permitido. Tipos válidos: {list(storage.ALLOWED_UPLOAD_TYPES)}"
+        )
+    max_bytes = config.get_settings().UPLOAD_MAX_BYTES
+    if not 0 < solicitud.tamano_bytes <= max_bytes:
+        raise HTTPException(status_code=413, detail=f"El archivo debe pesar entre 1 byte y {max_bytes} bytes")
+    _device_ticket(db, solicitud.id_ticket, solicitud.id_usuario_reporte_ticket)
+
+    backend = storage.get_storage_backend()
+    blob_name = storage.new_blob_name(solicitud.id_ticket, solicitud.content_type)
+    expires = storage.upload_expiry()
+    url, headers = backend.presign_put(blob_name, solicitud.content_type, solicitud.tamano_bytes, expires)
+    return {
+        "url_subida": url,
+        "headers": headers,
+        "url_evidencia": backend.public_url(blob_name),
+        "token_subida": storage.create_upload_token(
+            blob_name, solicitud.id_ticket, solicitud.id_usuario_reporte_ticket,
+            solicitud.content_type, solicitud.tamano_bytes, expires
+        ),
+        "expira": expires,
+    }
+
+@router.post("/evidence/complete", response_model=schemas.EvidenciaResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(4)
+def complete_evidence_upload(aviso: schemas.SubidaCompletada, db: Session = Depends(database.get_db)):
+    """
+    Aviso de término de una subida directa: verifica que el objeto exista y
+    coincida con lo autorizado (tamaño y content-type) y registra la
+    Evidencia. Es idempotente: repetir el aviso devuelve la misma evidencia.
+    """
+    claims = storage.decode_upload_token(aviso.token_subida)
+    if claims is None:
+        raise HTTPException(status_code=400, detail="Token de subida inválido o vencido")
+    ticket = _device_ticket(db, claims["id_ticket"], claims["dev"])
+
+    backend = storage.get_storage_backend()
+    url = backend.public_url(claims["blob"])
+    existente = db.query(models.Evidencia).filter(
+        models.Evidencia.id_ticket_evidencia == ticket.id_ticket,
+        models.Evidencia.url_evidencia == url
+    ).first()
+    if existente:
+        return existente
+
+    info = backend.stat(claims["blob"])
+    if info is None:
+        raise HTTPException(status_code=409, detail="El archivo todavía no se ha subido")
+    size, content_type = info
+    if not 0 < size <= claims["max"] or content_type != claims["ct"]:
+        # No se conserva nada que no se haya autorizado
+        backend.delete(claims["blob"])
+        raise HTTPException(status_code=400, detail="El archivo no coincide con el tamaño o tipo autorizado")
+
+    evidencia = _new_evidence(db, ticket.id_ticket, url, content_type)
+    db.commit()
+    db.refresh(evidencia)
+    return evidencia
+
+@router.put("/evidence/local/{blob_name:path}", status_code=status.HTTP_201_CREATED)
+@query_budget(0)
+async def put_local_evidence(
+    blob_name: str,
+    request: Request,
+    exp: int,
+    ct: str,
+    max_bytes: int = Query(..., alias="max"),
+    sig: str = Query(...)
+):
+    """
+    Destino de las URLs firmadas del almacenamiento local (STORAGE_BACKEND=local).
+    Solo para desarrollo: en Azure el archivo nunca pasa por la API.
+    """
+    backend = storage.get_storage_backend()
+    if not isinstance(backend, storage.LocalFileBackend):
+        raise HTTPException(status_code=404, detail="No disponible")
+    if not backend.verify(blob_name, exp, ct, max_bytes, sig):
+        raise HTTPException(status_code=403, detail="URL de subida inválida o vencida")
+    if request.headers.get("content-type") != ct:
+        raise HTTPException(status_code=415, detail=f"Content-Type debe ser {ct}")
+    if int(request.headers.get("content-length") or 0) > max_bytes:
+        raise HTTPException(status_code=413, detail="Archivo demasiado grande")
+
+    path = backend.path(blob_name)
+    # Solo creación, igual que la SAS de Azure
+    if os.path.exists(path):
+        raise HTTPException(status_code=409, detail="El archivo ya se subió")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + ".part"
+    written = 0
+    with open(partial, "wb") as fh:
+        async for chunk in request.stream():
+            written += len(chunk)
+            if written > max_bytes:
+                break
+            fh.write(chunk)
+    if written > max_bytes:
+        os.remove(partial)
+        raise HTTPException(status_code=413, detail="Archivo demasiado grande")
+    os.replace(partial, path)
+    return {"bytes": written}
+
+@router.get("/evidence/local/{blob_name:path}")
+@query_budget(0)
+def get_local_evidence(blob_name: str):
+    """Sirve los archivos del almacenamiento local (solo desarrollo)."""
+    backend = storage.get_storage_backend()
+    if not isinstance(backend, storage.LocalFileBackend) or not storage.BLOB_NAME_RE.match(blob_name):
+        raise HTTPException(status_code=404, detail="No disponible")
+    info = backend.stat(blob_name)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    return FileResponse(backend.path(blob_name), media_type=info[1])
+
+# Subida reanudable (videos grandes en redes inestables), estilo tus:
+# 1. POST /evidence/uploads con el ticket, content-type y tamaño -> sesión.
+# 2. PATCH a `url_subida` con el header Upload-Offset y
+#    Content-Type application/offset+octet-stream, una parte a la vez.
+# 3. Si se corta: HEAD a `url_subida` devuelve Upload-Offset y se sigue
+#    desde ahí. La última parte registra la Evidencia.
+
+def _open_upload(db: Session, id_subida: str) -> models.SubidaEvidencia:
+    subida = db.query(models.SubidaEvidencia).filter(models.SubidaEvidencia.id_subida == id_subida).first()
+    if not subida:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    if subida.id_evidencia_subida is None and subida.fecha_expira_subida < datetime.now(timezone.utc).replace(tzinfo=None):
+        raise HTTPException(status_code=410, detail="La subida venció; inicia una nueva")
+    return subida
+
+def _upload_headers(subida: models.SubidaEvidencia) -> dict:
+    return {
+        "Upload-Offset": str(subida.offset_subida),
+        "Upload-Length": str(subida.tamano_subida),
+        "Cache-Control": "no-store",
+    }
+
+def _upload_state(request: Request, subida: models.SubidaEvidencia, evidencia=None) -> dict:
+    return {
+        "id_subida": subida.id_subida,
+        "url_subida": str(request.url_for("patch_resumable_upload", id_subida=subida.id_subida)),
+        "offset": subida.offset_subida,
+        "tamano_bytes": subida.tamano_subida,
+        "tamano_maximo_parte": config.get_settings().UPLOAD_CHUNK_MAX_BYTES,
+        "expira": subida.fecha_expira_subida,
+        "completada": subida.id_evidencia_subida is not None,
+        "evidencia": evidencia,
+    }
+
+@router.post("/evidence/uploads", response_model=schemas.SubidaReanudableResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(2)
+def create_resumable_upload(
+    solicitud: schemas.SolicitudSubidaEvidencia,
+    request: Request,
+    response: Response,
+    db: Session = Depends(database.get_db)
+):
+    """
+    Abre una sesión de subida por partes (vigencia UPLOAD_RESUMABLE_TTL_SECONDS).
+    Admite archivos de hasta UPLOAD_RESUMABLE_MAX_BYTES.
+    """
+    if solicitud.content_type not in storage.ALLOWED_UPLOAD_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo de archivo no permitido. Tipos válidos: {list(storage.ALLOWED_UPLOAD_TYPES)}"
+        )
+    max_bytes = config.get_settings().UPLOAD_RESUMABLE_MAX_BYTES
+    if not 0 < solicitud.tamano_bytes <= max_bytes:
+        raise HTTPException(status_code=413, detail=f"El archivo debe pesar entre 1 byte y {max_bytes} bytes")
+    _device_ticket(db, solicitud.id_ticket, solicitud.id_usuario_reporte_ticket)
+
+    subida = models.SubidaEvidencia(
+        id_subida=storage.new_upload_id(),
+        id_ticket_subida=solicitud.id_ticket,
+        dispositivo_subida=solicitud.id_usuario_reporte_ticket,
+        blob_subida=storage.new_blob_name(solicitud.id_ticket, solicitud.content_type),
+        content_type_subida=solicitud.content_type,
+        tamano_subida=solicitud.tamano_bytes,
+        offset_subida=0,
+        fecha_expira_subida=storage.resumable_expiry(),
+    )
+    db.add(subida)
+    # Antes del commit: así no hace falta recargarla
+    estado = _upload_state(request, subida)
+    response.headers.update(_upload_headers(subida))
+    response.headers["Location"] = estado["url_subida"]
+    db.commit()
+    return estado
+
+@router.head("/evidence/uploads/{id_subida}")
+@query_budget(1)
+def head_resumable_upload(id_subida: str, db: Session = Depends(database.get_db)):
+    """Offset guardado (header Upload-Offset): desde ahí continúa el cliente."""
+    subida = _open_upload(db, id_subida)
+    return Response(status_code=status.HTTP_200_OK, headers=_upload_headers(subida))
+
+def _lookup_upload(id_subida: str) -> Tuple[models.SubidaEvidencia, Optional[models.Evidencia]]:
+    """
+    La subida (y su evidencia, si ya se completó), desligadas de una sesión
+    propia que se cierra aquí: el PATCH no retiene una conexión del pool
+    mientras lee la parte de un cliente lento.
+    """
+    db = database.SessionLocal()
+    try:
+        subida = _open_upload(db, id_subida)
+        evidencia = None
+        if subida.id_evidencia_subida is not None:
+            evidencia = db.get(models.Evidencia, subida.id_evidencia_subida)
+        db.expunge_all()
+        return subida, evidencia
+    finally:
+        db.close()
+
+def _save_chunk(subida: models.SubidaEvidencia, offset: int, data: bytes) -> Optional[models.Evidencia]:
+    """
+    Guarda la parte y avanza el offset solo si nadie lo movió (dos PATCH
+    simultáneos: gana uno, el otro recibe 409). La última parte confirma el
+    archivo y registra la Evidencia en la misma transacción. Abre su propia
+    sesión, ya con la parte completa en memoria.
+    """
+    db = database.SessionLocal()
+    try:
+        backend = storage.get_storage_backend()
+        backend.write_chunk(subida.blob_subida, offset, data)
+        nuevo = offset + len(data)
+        valores = {"offset_subida": nuevo}
+        evidencia = None
+        if nuevo == subida.tamano_subida:
+            try:
+                backend.finish_chunks(subida.blob_subida, subida.content_type_subida, subida.tamano_subida)
+            except ValueError:
+                raise HTTPException(status_code=409, detail="Las partes guardadas no coinciden con el tamaño declarado")
+            evidencia = _new_evidence(
+                db, subida.id_ticket_subida, backend.public_url(subida.blob_subida), subida.content_type_subida
+            )
+            db.flush()
+            valores["id_evidencia_subida"] = evidencia.id_evidencia
+        S = models.SubidaEvidencia
+        actualizadas = db.query(S).filter(S.id_subida == subida.id_subida, S.offset_subida == offset).update(
+            valores, synchronize_session=False
+        )
+        if not actualizadas:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Otra parte se guardó al mismo tiempo; consulta el offset")
+        respuesta = schemas.EvidenciaResponse.model_validate(evidencia) if evidencia else None
+        db.commit()
+        # `subida` está desligada de `db`: se actualiza aquí, sin recargarla
+        subida.offset_subida = nuevo
+        if evidencia:
+            subida.id_evidencia_subida = respuesta.id_evidencia
+        return respuesta
+    finally:
+        db.close()
+
+@router.patch("/evidence/uploads/{id_subida}", response_model=schemas.SubidaReanudableResponse)
+@query_budget(3)
+async def patch_resumable_upload(
+    id_subida: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset")
+):
+    """
+    Agrega una parte en `Upload-Offset` (debe ser el offset guardado; si
+    no, 409 con el correcto en el header). Una parte interrumpida no se
+    guarda: se reintenta desde el último offset. En una subida ya completada,
+    un PATCH vacío en el offset final devuelve la evidencia registrada.
+    """
+    # Sin Depends(get_db): ninguna transacción queda abierta mientras se lee el cuerpo
+    subida, evidencia = await asyncio.to_thread(_lookup_upload, id_subida)
+    if request.headers.get("content-type") != storage.OFFSET_CONTENT_TYPE:
+        raise HTTPException(status_code=415, detail=f"Content-Type debe ser {storage.OFFSET_CONTENT_TYPE}")
+    if subida.id_evidencia_subida is not None and upload_offset == subida.tamano_subida:
+        # El cliente perdió la respuesta de la última parte: ya está registrada
+        response.headers.update(_upload_headers(subida))
+        return _upload_state(request, subida, evidencia)
+    if subida.id_evidencia_subida is not None or upload_offset != subida.offset_subida:
+        raise HTTPException(
+            status_code=409, detail="El offset no coincide con lo guardado", headers=_upload_headers(subida)
+        )
+    limite = min(config.get_settings().UPLOAD_CHUNK_MAX_BYTES, subida.tamano_subida - subida.offset_subida)
+    if int(request.headers.get("content-length") or 0) > limite:
+        raise HTTPException(status_code=413, detail=f"La parte debe pesar como máximo {limite} bytes")
+
+    # A lo más una parte en memoria; si el cliente se desconecta no se guarda nada
+    data = bytearray()
+    async for chunk in request.stream():
+        data += chunk
+        if len(data) > limite:
+            raise HTTPException(status_code=413, detail=f"La parte debe pesar como máximo {limite} bytes")
+
+    evidencia = None
+    if data:
+        evidencia = await asyncio.to_thread(_save_chunk, subida, upload_offset, bytes(data))
+    response.headers.update(_upload_headers(subida))
+    return _upload_state(request, subida, evidencia)
+
 # --- 2. GESTIÓN DE REPORTES (TICKETS) ---
 
 @router.post("/tickets", response_model=schemas.TicketResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(6)
 def create_public_ticket(
     ticket: schemas.TicketCreatePublic, 
     db: Session = Depends(database.get_db)
@@ -90,26 +440,65 @@ def create_public_ticket(
     )
     
     db.add(new_ticket)
+    db.flush()
+    # El post-proceso (ruteo, evidencias, duplicados, avisos) corre en segundo
+    # plano; la tarea se confirma en la misma transacción que el ticket.
+    enqueue_task(db, "ticket_creado", {"id_ticket": new_ticket.id_ticket})
+    mapa.track_ticket_created(db, new_ticket)
+    record_ticket_event(
+        db, new_ticket, models.TipoEventoTicket.CREADO,
+        id_organizacion=new_ticket.id_organizacion_ticket
+    )
     db.commit()
     db.refresh(new_ticket)
     
     return new_ticket
 
 @router.get("/tickets/status/{user_uuid}", response_model=List[schemas.TicketResponse])
-def get_my_tickets_status(user_uuid: str, db: Session = Depends(database.get_db)):
+@query_budget(2)
+def get_my_tickets_status(
+    user_uuid: str,
+    request: Request,
+    historial: bool = False,
+    db: Session = Depends(database.get_db)
+):
     """
     Permite al ciudadano consultar el historial de SUS reportes.
     Filtra por el UUID del dispositivo.
+    Con `historial=true` incluye los reportes cerrados ya archivados.
+    Acepta formato columnar (ver services/encoding.py).
     """
     tickets = db.query(models.Ticket).filter(
         models.Ticket.id_usuario_reporte_ticket == user_uuid
     ).order_by(models.Ticket.fecha_creacion_ticket.desc()).all()
+
+    if historial:
+        archivados = archivo.archived_tickets_for_device(db, user_uuid)
+        tickets = sorted(tickets + archivados, key=lambda t: t.fecha_creacion_ticket, reverse=True)
     
-    return tickets
+    return encoding.list_response(request, tickets, schemas.TicketResponse)
+
+# --- 2b. SINCRONIZACIÓN (App móvil) ---
+
+@router.get("/sync/{user_uuid}", response_model=schemas.SyncResponse)
+@query_budget(3)
+def sync_device(
+    user_uuid: str,
+    token: Optional[str] = None,
+    db: Session = Depends(database.get_db)
+):
+    """
+    Reemplaza la descarga de /zonas y /tickets/status en cada apertura.
+    Sin `token` devuelve todo (completo=true); con el token de la última
+    respuesta, solo las zonas y tickets del dispositivo creados, modificados
+    o eliminados desde entonces (ver services/sync.py).
+    """
+    return sync.build_sync(db, user_uuid, token, get_zona_catalogo())
 
 # --- 3. CHATBOT PÚBLICO ---
 
 @router.post("/chatbot/ask", response_model=schemas.ChatbotResponse)
+@query_budget(1)
 def public_chatbot(request: schemas.ChatbotRequest, db: Session = Depends(database.get_db)):
     """
     Chatbot simple para responder dudas ciudadanas.
@@ -144,4 +533,41 @@ def public_chatbot(request: schemas.ChatbotRequest, db: Session = Depends(databa
     return {
         "response": response_text,
         "suggested_actions": actions
-    }
\ No newline at end of file
+    }
+# --- 4. MAPA PÚBLICO DE INCIDENTES (Transparencia) ---
+
+@router.get("/mapa", response_model=schemas.MapaIndiceResponse)
+@query_budget(1)
+def get_mapa_index(request: Request, response: Response, db: Session = Depends(database.get_db)):
+    """
+    Último snapshot del mapa por ventana de días (HEATMAP_WINDOWS_DAYS).
+    El contenido se descarga de `url`, que no cambia nunca: el cliente solo
+    vuelve a bajarlo cuando el índice apunta a otro (ver services/mapa.py).
+    """
+    ttl = config.get_settings().HEATMAP_INDEX_TTL_SECONDS
+    response.headers["Cache-Control"] = f"public, max-age={ttl}"
+    return {
+        "vigencia_segundos": ttl,
+        "ventanas": [
+            {**ventana, "url": str(request.url_for("get_mapa_snapshot", id_snapshot=ventana["id_snapshot"]))}
+            for ventana in mapa.get_mapa_cache().index(db)
+        ],
+    }
+
+@router.get("/mapa/{id_snapshot}", response_model=schemas.MapaSnapshot)
+@query_budget(1)
+def get_mapa_snapshot(
+    id_snapshot: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(database.get_db)
+):
+    """Conteos por zona y tipo de un snapshot. Inmutable: ETag y caché de un año."""
+    snapshot = mapa.get_mapa_cache().snapshot(db, id_snapshot)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Snapshot no encontrado")
+    content, digest = snapshot
+    etag = f'"{digest}"'
+    headers = {"Cache-Control": mapa.IMMUTABLE_CACHE_CONTROL, "ETag": etag}
+    if if_none_match and (if_none_match.strip() == "*" or etag in if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, field_validator
+from typing import Any, Optional, List, Dict
+import json
 from datetime import date, datetime
 from enum import Enum
 
@@ -75,6 +76,18 @@ class EstadoTicket(str, Enum):
     RESUELTO = "RESUELTO"
     CERRADO = "CERRADO"
 
+class TipoArchivo(str, Enum):
+    IMAGEN = "IMAGEN"
+    VIDEO = "VIDEO"
+    DOCUMENTO = "DOCUMENTO"
+
+class TipoEventoTicket(str, Enum):
+    CREADO = "CREADO"
+    ASIGNADO = "ASIGNADO"
+    TRANSFERIDO = "TRANSFERIDO"
+    CAMBIO_ESTADO = "CAMBIO_ESTADO"
+    CAMBIO_PRIORIDAD = "CAMBIO_PRIORIDAD"
+
 # ==========================================
 # 2. SCHEMAS: ZONAS
 # ==========================================
@@ -201,6 +214,20 @@ class GastoCreate(BaseModel):
     categoria_gasto: CategoriaGasto
     evidencia_url_gasto: Optional[str] = None
 
+# Fila del CSV de importación masiva (mismas columnas + fecha opcional)
+class GastoImportRow(GastoCreate):
+    fecha_gasto: Optional[date] = None
+
+class GastoImportError(BaseModel):
+    fila: int  # Línea del archivo (la 1 es el encabezado)
+    error: str
+
+class GastoImportResultado(BaseModel):
+    filas_procesadas: int
+    gastos_registrados: int
+    filas_con_error: int
+    errores: List[GastoImportError] = []
+
 # ==========================================
 # 8. SCHEMAS: TICKETS (Público y Privado)
 # ==========================================
@@ -232,12 +259,22 @@ class TicketResponse(BaseModel):
     estado_ticket: EstadoTicket
     descripcion_ticket: Optional[str]
     fecha_creacion_ticket: datetime
+    fecha_cierre_ticket: Optional[datetime] = None  # Al pasar a RESUELTO o CERRADO
     id_zona_ticket: Optional[int]
+    id_ticket_padre: Optional[int] = None  # Reporte original si es duplicado
+    archivado: bool = False  # Viene de TICKETS_ARCHIVO (consultas con historial)
     # Se omiten datos sensibles del ciudadano
 
     class Config:
         from_attributes = True
 
+class TicketBusquedaResponse(TicketResponse):
+    relevancia: float  # Mayor = más relevante
+
+class TicketsBusquedaPagina(BaseModel):
+    tickets: List[TicketBusquedaResponse]
+    siguiente_cursor: Optional[str] = None  # None = no hay más páginas
+
 # ==========================================
 # TOKEN JWT
 # ==========================================
@@ -245,6 +282,11 @@ class TicketResponse(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None  # Para /auth/refresh (rota en cada uso)
+    expires_in: Optional[int] = None     # Segundos de vigencia del access_token
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -259,4 +301,215 @@ class ChatbotRequest(BaseModel):
 
 class ChatbotResponse(BaseModel):
     response: str
-    suggested_actions: List[str] = [] # Ej: ["Crear Reporte", "Ver Mapa"]
\ No newline at end of file
+    suggested_actions: List[str] = [] # Ej: ["Crear Reporte", "Ver Mapa"]
+
+# ==========================================
+# 10. SCHEMAS: DASHBOARD (Home)
+# ==========================================
+
+class ResumenFinancieroResponse(BaseModel):
+    billetera_disponible: float
+    presupuesto_comprometido: float
+    gasto_real_ejecutado: float
+    saldo_libre_para_proyectos: float
+
+class MetricasImpactoResponse(BaseModel):
+    tickets_resueltos: int
+    tickets_activos: int
+    satisfaccion_ciudadana: float
+
+class DashboardHomeResponse(BaseModel):
+    # Cada sección es None si no respondió a tiempo o falló
+    objetivos: Optional[List[ObjetivoResponse]] = None
+    finanzas: Optional[ResumenFinancieroResponse] = None
+    impacto: Optional[MetricasImpactoResponse] = None
+    proyectos: Optional[List[ProyectoResponse]] = None
+    secciones_incompletas: List[str] = []
+    tiempos_ms: Dict[str, float] = {}
+
+class PeriodoBurnDown(str, Enum):
+    SEMANA = "SEMANA"
+    MES = "MES"
+
+class BurnDownPunto(BaseModel):
+    periodo: date  # Inicio del periodo (lunes de la semana o día 1 del mes)
+    gastado: float
+    acumulado: float
+    restante: float  # presupuesto - acumulado
+    por_categoria: Dict[str, float] = {}
+
+class BurnDownProyecto(BaseModel):
+    id_proyecto: int
+    nombre_proyecto: str
+    presupuesto_proyecto: float
+    fecha_inicio_proyecto: Optional[date] = None
+    fecha_fin_proyecto: Optional[date] = None
+    total_gastado: float
+    serie: List[BurnDownPunto] = []
+
+# ==========================================
+# 11. SCHEMAS: BITÁCORA DE TICKETS
+# ==========================================
+
+class EventoTicketResponse(BaseModel):
+    id_evento: int
+    id_ticket_evento: int
+    id_organizacion_evento: int
+    id_usuario_evento: Optional[int] = None
+    tipo_evento: TipoEventoTicket
+    estado_anterior_evento: Optional[EstadoTicket] = None
+    estado_nuevo_evento: Optional[EstadoTicket] = None
+    detalle_evento: Optional[Dict[str, Any]] = None
+    fecha_evento: datetime
+
+    # DETALLE_EVENTO se guarda como texto JSON
+    @field_validator("detalle_evento", mode="before")
+    @classmethod
+    def parse_detalle(cls, value):
+        return json.loads(value) if isinstance(value, str) else value
+
+    class Config:
+        from_attributes = True
+
+class EventosPagina(BaseModel):
+    eventos: List[EventoTicketResponse]
+    siguiente_cursor: Optional[str] = None  # None = no hay más páginas
+
+# ==========================================
+# 12. SCHEMAS: SLA (Tiempos de resolución)
+# ==========================================
+
+class PercentilesResolucion(BaseModel):
+    total: int  # Tickets cerrados contados
+    # Estimados desde el histograma (error relativo < 25%); None si no hay cerrados
+    p50_horas: Optional[float] = None
+    p90_horas: Optional[float] = None
+    p99_horas: Optional[float] = None
+
+class GrupoSla(BaseModel):
+    id_zona: Optional[int] = None
+    tipo_incidente: Optional[TipoIncidente] = None
+    resolucion: PercentilesResolucion
+    antiguedad_abiertos: Dict[str, int]  # {"0-1d": n, "1-3d": n, ..., ">30d": n}
+
+class SlaResponse(BaseModel):
+    total: GrupoSla
+    por_zona: List[GrupoSla] = []
+    por_tipo: List[GrupoSla] = []
+
+# ==========================================
+# 13. SCHEMAS: EVIDENCIAS (Subida directa)
+# ==========================================
+
+class SolicitudSubidaEvidencia(BaseModel):
+    id_ticket: int
+    id_usuario_reporte_ticket: str  # UUID del dispositivo que creó el ticket
+    content_type: str               # image/jpeg, image/png o video/mp4
+    tamano_bytes: int               # Tamaño exacto del archivo a subir
+
+class UrlSubidaResponse(BaseModel):
+    url_subida: str
+    metodo: str = "PUT"
+    headers: Dict[str, str]         # Headers que el cliente debe enviar en el PUT
+    url_evidencia: str              # URL final del archivo (sin firma)
+    token_subida: str               # Se envía a /evidence/complete al terminar
+    expira: datetime
+
+class SubidaCompletada(BaseModel):
+    token_subida: str
+
+class EvidenciaResponse(BaseModel):
+    id_evidencia: int
+    id_ticket_evidencia: int
+    url_evidencia: str
+    tipo_archivo_evidencia: Optional[TipoArchivo] = None
+    fecha_carga_evidencia: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class SubidaReanudableResponse(BaseModel):
+    id_subida: str
+    url_subida: str                 # Destino de HEAD (offset) y PATCH (partes)
+    offset: int                     # Bytes ya guardados: la siguiente parte empieza aquí
+    tamano_bytes: int
+    tamano_maximo_parte: int        # Bytes máximos por PATCH
+    expira: datetime
+    completada: bool = False
+    evidencia: Optional[EvidenciaResponse] = None
+
+# ==========================================
+# 14. SCHEMAS: SINCRONIZACIÓN MÓVIL
+# ==========================================
+
+class SyncResponse(BaseModel):
+    token: str                      # Se envía en la siguiente sincronización
+    completo: bool                  # True = lista completa: reemplazar lo local
+    hay_mas: bool = False           # True = pedir de nuevo con el token nuevo
+    zonas: List[ZonaResponse]       # Creadas o modificadas (o todas si completo)
+    zonas_eliminadas: List[int]
+    tickets: List[TicketResponse]   # Creados o modificados (o todos si completo)
+    tickets_eliminados: List[int]   # Borrados o archivados
+
+# ==========================================
+# 15. SCHEMAS: TICKETS CON DETALLE COMPLETO (Operadores)
+# ==========================================
+
+class ProyectoResumen(BaseModel):
+    id_proyecto: int
+    nombre_proyecto: str
+    estado_proyecto: Optional[EstadoProyecto] = None
+
+    class Config:
+        from_attributes = True
+
+class TicketDetalleResponse(TicketResponse):
+    """Ticket con zona, proyecto y evidencias (una sola ida a la API por página)."""
+    prioridad_ticket: Optional[Prioridad] = None
+    des_hechos_lugar_ticket: Optional[str] = None
+    ubicacion_lat_ticket: Optional[float] = None
+    ubicacion_lon_ticket: Optional[float] = None
+    id_proyecto_ticket: Optional[int] = None
+    zona: Optional[ZonaResponse] = None
+    proyecto: Optional[ProyectoResumen] = None
+    evidencias: List[EvidenciaResponse] = []
+
+# ==========================================
+# 16. SCHEMAS: MAPA PÚBLICO DE INCIDENTES
+# ==========================================
+
+class MapaConteoTipo(BaseModel):
+    tipo_incidente: TipoIncidente
+    total: int
+    abiertos: int
+    cerrados: int
+
+class MapaZona(BaseModel):
+    id_zona: Optional[int] = None   # None = tickets sin zona
+    nombre_zona: Optional[str] = None
+    estado_zona: Optional[str] = None
+    total: int
+    abiertos: int
+    cerrados: int
+    por_tipo: List[MapaConteoTipo]
+
+class MapaSnapshot(BaseModel):
+    """Contenido de /public/mapa/{id_snapshot} (se guarda ya serializado)."""
+    ventana_dias: int
+    desde: date                     # Días de creación incluidos (UTC)
+    hasta: date
+    total: int
+    abiertos: int
+    cerrados: int
+    zonas: List[MapaZona]
+
+class MapaVentana(BaseModel):
+    ventana_dias: int
+    id_snapshot: int
+    url: str                        # Inmutable: se puede guardar en caché sin límite
+    hash: str
+    generado: datetime
+
+class MapaIndiceResponse(BaseModel):
+    vigencia_segundos: int          # Cuándo volver a pedir el índice
+    ventanas: List[MapaVentana]
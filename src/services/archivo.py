@@ -0,0 +1,219 @@
+"""
+Archivo de tickets cerrados antiguos (TICKETS -> TICKETS_ARCHIVO).
+
+Mantiene chica la tabla caliente: la bandeja, los conteos y las consultas de
+estado dejan de pagar por años de tickets cerrados.
+
+- Se archivan los tickets RESUELTO/CERRADO cerrados hace más de
+  ARCHIVE_AFTER_DAYS (sin fecha de cierre cuenta la de creación), junto con
+  sus evidencias. No se archivan los que tienen duplicados aún abiertos.
+- Cada lote de ARCHIVE_BATCH_SIZE tickets es una transacción corta:
+  SELECT ... FOR UPDATE SKIP LOCKED de los IDs, INSERT ... SELECT al
+  archivo y DELETE de la tabla caliente. Solo se bloquean las filas del
+  lote y un fallo deshace el lote completo (nunca queda a medias).
+- Opcional (MySQL): TICKETS_ARCHIVO particionada por mes de
+  FECHA_CREACION_TICKET; cada corrida agrega las particiones que falten.
+  TICKETS no se particiona: MySQL no admite particiones en tablas con FK.
+
+La bitácora (EVENTOS_TICKETS) y los histogramas de SLA no se tocan. Las
+lecturas consultan el archivo solo cuando la petición pide historial.
+"""
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import DateTime, delete, exists, func, insert, literal, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, aliased
+
+from .. import models
+from ..config import get_settings
+from . import sync
+from .sla import ESTADOS_CERRADOS
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_TABLE = models.TicketArchivado.__tablename__
+
+# ==========================================
+# LECTURAS CON HISTORIAL
+# ==========================================
+
+def get_archived_ticket(db: Session, ticket_id: int, org_id: int) -> Optional[models.TicketArchivado]:
+    A = models.TicketArchivado
+    return db.query(A).filter(A.id_ticket == ticket_id, A.id_organizacion_ticket == org_id).first()
+
+def archived_tickets_for_device(db: Session, user_uuid: str) -> List[models.TicketArchivado]:
+    A = models.TicketArchivado
+    return db.query(A).filter(A.id_usuario_reporte_ticket == user_uuid).order_by(
+        A.fecha_creacion_ticket.desc()
+    ).all()
+
+# ==========================================
+# ARCHIVADO POR LOTES
+# ==========================================
+
+def _archivable_ids(db: Session, cutoff: datetime, batch_size: int) -> List[int]:
+    T = models.Ticket
+    hijo = aliased(models.Ticket)
+    duplicados_abiertos = exists().where(
+        hijo.id_ticket_padre == T.id_ticket, hijo.estado_ticket.notin_(ESTADOS_CERRADOS)
+    )
+    rows = db.query(T.id_ticket).filter(
+        T.estado_ticket.in_(ESTADOS_CERRADOS),
+        func.coalesce(T.fecha_cierre_ticket, T.fecha_creacion_ticket) < cutoff,
+        ~duplicados_abiertos
+    ).order_by(T.id_ticket).limit(batch_size).with_for_update(skip_locked=True).all()
+    return [row.id_ticket for row in rows]
+
+def _copy_rows(db: Session, source, target, where, extra: dict = None) -> None:
+    """INSERT INTO target (columnas comunes + extra) SELECT ... FROM source WHERE where."""
+    names = [column.name for column in target.columns if column.name not in (extra or {})]
+    columns = []
+    for name in names:
+        column = source.c[name]
+        # La PK del archivo incluye la fecha de creación (no puede ser NULL)
+        if name == "FECHA_CREACION_TICKET":
+            column = func.coalesce(column, func.now())
+        columns.append(column)
+    for value in (extra or {}).values():
+        columns.append(value)
+    db.execute(insert(target).from_select(names + list(extra or {}), select(*columns).where(where)))
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> tuple:
+    """Archiva un lote y confirma. Devuelve (tickets, evidencias) archivados."""
+    ids = _archivable_ids(db, cutoff, batch_size)
+    if not ids:
+        db.rollback()
+        return 0, 0
+    tickets, evidencias = models.Ticket.__table__, models.Evidencia.__table__
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    _copy_rows(db, tickets, models.TicketArchivado.__table__, tickets.c.ID_TICKET.in_(ids),
+               {"FECHA_ARCHIVADO_TICKET": literal(now, DateTime)})
+    _copy_rows(db, evidencias, models.EvidenciaArchivada.__table__, evidencias.c.ID_TICKET_EVIDENCIA.in_(ids))
+    # La app deja de verlos en /public/sync (como en /tickets/status sin historial)
+    sync.record_ticket_deletions(db, tickets.c.ID_TICKET.in_(ids))
+
+    # Hijos antes que el ticket (en SQLite las FK no se aplican por defecto)
+    evidencias_borradas = db.execute(
+        delete(models.Evidencia).where(models.Evidencia.id_ticket_evidencia.in_(ids)),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    db.execute(
+        delete(models.HuellaTicket).where(models.HuellaTicket.id_ticket_huella.in_(ids)),
+        execution_options={"synchronize_session": False}
+    )
+    db.execute(
+        delete(models.Ticket).where(models.Ticket.id_ticket.in_(ids)),
+        execution_options={"synchronize_session": False}
+    )
+    db.commit()
+    return len(ids), evidencias_borradas
+
+def run_archive(
+    engine: Engine,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+) -> dict:
+    """Archiva lotes hasta que no quede nada archivable (o max_batches)."""
+    settings = get_settings()
+    older_than_days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    start = time.perf_counter()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = now - timedelta(days=older_than_days)
+
+    particiones = []
+    if settings.ARCHIVE_MYSQL_PARTITIONING and engine.dialect.name == "mysql":
+        particiones = ensure_archive_partitions(engine, now.date(), settings.ARCHIVE_PARTITION_MONTHS_AHEAD)
+
+    total_tickets = total_evidencias = lotes = 0
+    while max_batches is None or lotes < max_batches:
+        with Session(engine) as db:
+            tickets, evidencias = archive_batch(db, cutoff, batch_size)
+        if not tickets:
+            break
+        lotes += 1
+        total_tickets += tickets
+        total_evidencias += evidencias
+        logger.info("Lote %d: %d tickets y %d evidencias archivados", lotes, tickets, evidencias)
+        # Deja respirar a la réplica y a las peticiones entre lotes
+        time.sleep(settings.ARCHIVE_PAUSE_SECONDS)
+
+    return {
+        "tickets_archivados": total_tickets,
+        "evidencias_archivadas": total_evidencias,
+        "lotes": lotes,
+        "particiones_creadas": particiones,
+        "corte": cutoff.isoformat(),
+        "duracion_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+# ==========================================
+# PARTICIONES MENSUALES (MySQL)
+# ==========================================
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _partition(month: date) -> str:
+    # Cada partición guarda el mes que empieza en `month`
+    return f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{_next_month(month):%Y-%m-%d}'))"
+
+def ensure_archive_partitions(engine: Engine, today: date, months_ahead: int) -> List[str]:
+    """
+    Particiona TICKETS_ARCHIVO por mes (RANGE sobre TO_DAYS de la fecha de
+    creación) o agrega los meses que falten hasta `months_ahead` meses
+    adelante, partiendo la partición pmax. Devuelve las particiones creadas.
+    """
+    with engine.connect() as conn:
+        existing = {
+            row[0] for row in conn.execute(text(
+                "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla AND PARTITION_NAME IS NOT NULL"
+            ), {"tabla": ARCHIVE_TABLE})
+        }
+        oldest = conn.execute(select(func.min(models.TicketArchivado.fecha_creacion_ticket))).scalar()
+
+    last = _month_start(today)
+    for _ in range(months_ahead):
+        last = _next_month(last)
+
+    if not existing:
+        first = _month_start(oldest.date() if oldest else today)
+        months = []
+        month = first
+        while month <= last:
+            months.append(month)
+            month = _next_month(month)
+        definitions = [f"PARTITION p_inicial VALUES LESS THAN (TO_DAYS('{first:%Y-%m-%d}'))"]
+        definitions += [_partition(month) for month in months]
+        definitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        ddl = (
+            f"ALTER TABLE {ARCHIVE_TABLE} PARTITION BY RANGE (TO_DAYS(FECHA_CREACION_TICKET)) "
+            f"({', '.join(definitions)})"
+        )
+    else:
+        # Meses nuevos a partir del último existente (los nombres pYYYYMM ordenan por fecha)
+        monthly = sorted(name for name in existing if name[1:].isdigit())
+        month = _next_month(datetime.strptime(monthly[-1][1:], "%Y%m").date()) if monthly else _month_start(today)
+        months = []
+        while month <= last:
+            months.append(month)
+            month = _next_month(month)
+        if not months:
+            return []
+        definitions = [_partition(month) for month in months] + ["PARTITION pmax VALUES LESS THAN MAXVALUE"]
+        ddl = f"ALTER TABLE {ARCHIVE_TABLE} REORGANIZE PARTITION pmax INTO ({', '.join(definitions)})"
+
+    with engine.begin() as conn:
+        conn.execute(text(ddl))
+    created = [f"p{month:%Y%m}" for month in months]
+    logger.info("Particiones de %s creadas: %s", ARCHIVE_TABLE, created)
+    return created
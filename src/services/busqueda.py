@@ -0,0 +1,161 @@
+"""
+Búsqueda de texto completo sobre tickets (descripción y hechos del lugar).
+
+- MySQL: índice FULLTEXT (FT_TICKETS_TEXTO) en TICKETS; MySQL lo mantiene
+  solo al insertar/actualizar. El plegado de acentos lo da la collation
+  de la tabla (utf8mb4_0900_ai_ci / *_unicode_ci son insensibles a acentos).
+- SQLite (desarrollo): tabla virtual FTS5 (TICKETS_FTS) de contenido externo
+  con tokenizer `unicode61 remove_diacritics 2`, sincronizada con triggers.
+- Otros motores: LIKE (sin índice; solo para no romper en desarrollo).
+
+El texto buscado también se pliega (minúsculas, sin acentos) antes de
+consultar; se ignoran las palabras de menos de tres letras ("de", "la",
+"en"...) y un ticket debe contener todas las demás. La organización se
+filtra dentro de la consulta de relevancia, así que el costo depende de
+los tickets de la organización que coinciden, no del tamaño de la tabla.
+Los resultados se ordenan por relevancia y se paginan por cursor
+(relevancia, ID_TICKET).
+"""
+import logging
+import re
+import unicodedata
+from typing import List, Optional
+
+from sqlalchemy import and_, column, func, inspect, literal_column, or_, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import pagination
+
+logger = logging.getLogger(__name__)
+
+FULLTEXT_INDEX = "FT_TICKETS_TEXTO"
+FTS_TABLE = "TICKETS_FTS"
+
+_SQLITE_FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        DESCRIPCION_TICKET, DES_HECHOS_LUGAR_TICKET,
+        content='TICKETS', content_rowid='ID_TICKET',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS TICKETS_FTS_AI AFTER INSERT ON TICKETS BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, DESCRIPCION_TICKET, DES_HECHOS_LUGAR_TICKET)
+        VALUES (new.ID_TICKET, new.DESCRIPCION_TICKET, new.DES_HECHOS_LUGAR_TICKET);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS TICKETS_FTS_AD AFTER DELETE ON TICKETS BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, DESCRIPCION_TICKET, DES_HECHOS_LUGAR_TICKET)
+        VALUES ('delete', old.ID_TICKET, old.DESCRIPCION_TICKET, old.DES_HECHOS_LUGAR_TICKET);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS TICKETS_FTS_AU
+        AFTER UPDATE OF DESCRIPCION_TICKET, DES_HECHOS_LUGAR_TICKET ON TICKETS BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, DESCRIPCION_TICKET, DES_HECHOS_LUGAR_TICKET)
+        VALUES ('delete', old.ID_TICKET, old.DESCRIPCION_TICKET, old.DES_HECHOS_LUGAR_TICKET);
+        INSERT INTO {FTS_TABLE}(rowid, DESCRIPCION_TICKET, DES_HECHOS_LUGAR_TICKET)
+        VALUES (new.ID_TICKET, new.DESCRIPCION_TICKET, new.DES_HECHOS_LUGAR_TICKET);
+    END""",
+]
+
+def ensure_search_index(engine: Engine) -> Optional[str]:
+    """
+    Crea el índice de texto completo si falta (lo llama src.migrate).
+    Devuelve el nombre de lo creado, o None si ya existía o el motor no aplica.
+    """
+    dialect = engine.dialect.name
+    if dialect == "mysql":
+        existing = {ix["name"] for ix in inspect(engine).get_indexes("TICKETS")}
+        if FULLTEXT_INDEX in existing:
+            return None
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"ALTER TABLE TICKETS ADD FULLTEXT INDEX {FULLTEXT_INDEX} "
+                "(DESCRIPCION_TICKET, DES_HECHOS_LUGAR_TICKET)"
+            ))
+        return FULLTEXT_INDEX
+    if dialect == "sqlite":
+        if inspect(engine).has_table(FTS_TABLE):
+            return None
+        with engine.begin() as conn:
+            for ddl in _SQLITE_FTS_DDL:
+                conn.execute(text(ddl))
+            # Indexa los tickets que ya existían
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        return FTS_TABLE
+    logger.warning("Sin índice de texto completo para %s: la búsqueda usará LIKE", dialect)
+    return None
+
+def fold_terms(texto: str) -> List[str]:
+    """'Fuga de AGUA en Toluca' -> ['fuga', 'de', 'agua', 'en', 'toluca'] (sin acentos)."""
+    decomposed = unicodedata.normalize("NFKD", texto.lower())
+    folded = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return re.findall(r"\w+", folded)
+
+def search_terms(texto: str) -> List[str]:
+    """
+    Términos a buscar: plegados, sin los de menos de tres letras (mismo
+    criterio que duplicados.shingles). Si solo hay palabras cortas se usan
+    tal cual.
+    """
+    terms = fold_terms(texto)
+    return [t for t in terms if len(t) > 2] or terms
+
+def _ranked_ids(db: Session, terms: List[str], org_id: int):
+    """
+    Subconsulta (id, relevancia) de los tickets de `org_id` que contienen
+    todos los términos; mayor relevancia = mejor.
+    """
+    dialect = db.get_bind().dialect.name
+    T = models.Ticket
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import match
+        # '+': término obligatorio. Los términos son solo \w+, sin operadores
+        score = match(
+            T.descripcion_ticket, T.des_hechos_lugar_ticket, against=" ".join(f"+{term}" for term in terms)
+        ).in_boolean_mode()
+        return select(T.id_ticket.label("id"), score.label("relevancia")).where(
+            score > 0, T.id_organizacion_ticket == org_id
+        ).subquery()
+    if dialect == "sqlite":
+        fts = table(FTS_TABLE, column("rowid"))
+        # Cada término entre comillas: la entrada del usuario no se interpreta como sintaxis FTS5
+        query = " AND ".join(f'"{term}"' for term in terms)
+        fts_ref = literal_column(FTS_TABLE)
+        return select(
+            fts.c.rowid.label("id"),
+            (-func.bm25(fts_ref)).label("relevancia")  # bm25: menor es mejor
+        ).select_from(fts).join(T, T.id_ticket == fts.c.rowid).where(
+            fts_ref.op("MATCH")(query), T.id_organizacion_ticket == org_id
+        ).subquery()
+    # Respaldo sin índice: todos los términos presentes, relevancia constante
+    conditions = [
+        or_(T.descripcion_ticket.ilike(f"%{term}%"), T.des_hechos_lugar_ticket.ilike(f"%{term}%"))
+        for term in terms
+    ]
+    return select(T.id_ticket.label("id"), literal_column("1.0").label("relevancia")).where(
+        T.id_organizacion_ticket == org_id, *conditions
+    ).subquery()
+
+def search_tickets(db: Session, org_id: int, texto: str, limite: int, cursor: Optional[str]) -> dict:
+    """
+    Tickets de `org_id` que coinciden con `texto`, por relevancia.
+    Devuelve {"tickets": [(ticket, relevancia), ...], "siguiente_cursor": str | None}.
+    """
+    terms = search_terms(texto)
+    if not terms:
+        return {"tickets": [], "siguiente_cursor": None}
+    after = pagination.decode_cursor(cursor, 2)
+
+    ranked = _ranked_ids(db, terms, org_id)
+    T = models.Ticket
+    query = db.query(T, ranked.c.relevancia).join(ranked, T.id_ticket == ranked.c.id)
+    if after:
+        relevancia, last_id = after
+        query = query.filter(or_(
+            ranked.c.relevancia < relevancia,
+            and_(ranked.c.relevancia == relevancia, T.id_ticket < last_id)
+        ))
+    rows = query.order_by(ranked.c.relevancia.desc(), T.id_ticket.desc()).limit(limite + 1).all()
+    rows, siguiente = pagination.page(
+        rows, limite, lambda row: pagination.encode_cursor(float(row.relevancia), row.Ticket.id_ticket)
+    )
+    return {"tickets": rows, "siguiente_cursor": siguiente}
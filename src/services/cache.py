@@ -0,0 +1,181 @@
+"""
+Caché de resultados para consultas de lectura (dashboard).
+
+- Las entradas se indexan por (organización, consulta, parámetros).
+- Cada entrada guarda la versión de las tablas de las que depende.
+  Los eventos de sesión de SQLAlchemy incrementan la versión de una tabla
+  en cada flush (o UPDATE/DELETE/INSERT masivo) que la toca, por lo que una
+  entrada con versiones viejas se descarta en la siguiente lectura.
+- Tamaño acotado con desalojo LRU y métricas de aciertos.
+
+Nota: las versiones viven en memoria del proceso. Con varios workers, una
+escritura en otro proceso no invalida esta caché; QUERY_CACHE_TTL_SECONDS
+acota ese desfase.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Callable, Hashable, Iterable, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+
+# Tablas cuyas escrituras invalidan resultados cacheados
+TABLAS_VERSIONADAS = frozenset({
+    "TRANSACCIONES",
+    "PROYECTOS",
+    "GASTOS",
+    "OBJETIVOS",
+    "TICKETS",
+    "MEDICIONES",
+    "HISTOGRAMAS_RESOLUCION",
+})
+
+class QueryCache:
+    """Caché LRU en memoria, segura entre hilos, invalidada por versión de tabla."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[Hashable, Tuple[tuple, float, Any]]" = OrderedDict()
+        self._versions: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # --- Versiones por tabla ---
+
+    def bump(self, tables: Iterable[str]) -> None:
+        """Incrementa la versión de cada tabla (invalida sus dependientes)."""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def _current_versions(self, tables: Tuple[str, ...]) -> tuple:
+        return tuple(self._versions.get(t, 0) for t in tables)
+
+    # --- Lectura ---
+
+    def get_or_compute(
+        self,
+        org_id: int,
+        query_name: str,
+        tables: Tuple[str, ...],
+        compute: Callable[[], Any],
+        params: tuple = ()
+    ) -> Any:
+        """
+        Devuelve el resultado cacheado de `query_name` para la organización o
+        lo calcula con `compute()`. El resultado debe ser un dato plano
+        (dict/list), nunca objetos ORM ligados a una sesión.
+        """
+        if not self.enabled:
+            return compute()
+
+        key = (org_id, query_name, params)
+        now = time.monotonic()
+        with self._lock:
+            # Se capturan las versiones ANTES de calcular: si hay una escritura
+            # durante el cálculo, la entrada nace vieja y se recalcula después.
+            versions = self._current_versions(tables)
+            entry = self._entries.get(key)
+            if entry is not None:
+                cached_versions, stored_at, value = entry
+                if cached_versions == versions and now - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self.invalidations += 1
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = (versions, now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Métricas para observabilidad (tasa de aciertos, tamaño, desalojos)."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "table_versions": dict(self._versions),
+            }
+
+@lru_cache()
+def get_query_cache() -> QueryCache:
+    settings = get_settings()
+    return QueryCache(
+        max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS,
+        enabled=settings.QUERY_CACHE_ENABLED,
+    )
+
+# ==========================================
+# EVENTOS DE SESIÓN (Invalidación)
+# ==========================================
+
+_PENDING_KEY = "query_cache_tablas"
+
+def _versioned_tables(objects) -> set:
+    tables = set()
+    for obj in objects:
+        table = getattr(type(obj), "__tablename__", None)
+        if table in TABLAS_VERSIONADAS:
+            tables.add(table)
+    return tables
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_flush(session, flush_context):
+    # En after_flush, new/dirty/deleted todavía reflejan lo que se escribió
+    tables = _versioned_tables(chain(session.new, session.dirty, session.deleted))
+    if tables:
+        get_query_cache().bump(tables)
+        session.info.setdefault(_PENDING_KEY, set()).update(tables)
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_on_bulk(orm_execute_state):
+    # INSERT/UPDATE/DELETE masivos (session.execute(insert(Modelo), filas),
+    # query.update(), ...) no pasan por flush.
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    table = mapper.local_table.name if mapper is not None else None
+    if table in TABLAS_VERSIONADAS:
+        get_query_cache().bump((table,))
+        orm_execute_state.session.info.setdefault(_PENDING_KEY, set()).add(table)
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    # Segundo incremento al confirmar: una lectura concurrente entre el flush
+    # y el commit pudo cachear datos previos con la versión ya incrementada.
+    tables = session.info.pop(_PENDING_KEY, None)
+    if tables:
+        get_query_cache().bump(tables)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
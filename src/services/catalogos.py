@@ -0,0 +1,48 @@
+"""
+Catálogos en memoria para endpoints públicos de alto tráfico.
+
+El catálogo de zonas se carga al arrancar (lifespan) y se refresca cuando
+vence ZONAS_CATALOGO_TTL_SECONDS, así /public/zonas no consulta la BD en
+cada apertura de la app.
+"""
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from ..config import get_settings
+
+class ZonaCatalogo:
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._zonas: Optional[List[dict]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, db: Session) -> List[dict]:
+        """Recarga el catálogo desde la BD."""
+        zonas = [
+            schemas.ZonaResponse.model_validate(z).model_dump()
+            for z in db.query(models.Zona).order_by(models.Zona.id_zona).all()
+        ]
+        with self._lock:
+            self._zonas = zonas
+            self._loaded_at = time.monotonic()
+        return zonas
+
+    def get(self, db: Session) -> List[dict]:
+        zonas = self._zonas
+        if zonas is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+            return zonas
+        return self.load(db)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._zonas = None
+
+@lru_cache()
+def get_zona_catalogo() -> ZonaCatalogo:
+    return ZonaCatalogo(ttl_seconds=get_settings().ZONAS_CATALOGO_TTL_SECONDS)
@@ -0,0 +1,27 @@
+"""
+Contadores en tablas de agregados: INSERT ... ON DUPLICATE KEY UPDATE
+(MySQL) o ON CONFLICT DO UPDATE (SQLite) sobre la PK, en una sola sentencia
+y dentro de la transacción de quien llama.
+"""
+from sqlalchemy.orm import Session
+
+def upsert_increment(db: Session, model, keys: dict, deltas: dict) -> None:
+    """
+    Suma `deltas` ({atributo: incremento}) a la fila de `model` con PK
+    `keys` ({atributo: valor}); si no existe, la crea con los incrementos.
+    """
+    columns = model.__mapper__.columns
+    updates = {columns[attr]: columns[attr] + delta for attr, delta in deltas.items()}
+    values = {**keys, **deltas}
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(model).values(values).on_duplicate_key_update(updates)
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(model).values(values).on_conflict_do_update(
+            index_elements=list(model.__table__.primary_key.columns), set_=updates
+        )
+    else:
+        raise RuntimeError(f"Contadores incrementales no soportados en {dialect}")
+    db.execute(stmt)
@@ -0,0 +1,185 @@
+"""
+Detección de reportes duplicados (mismo incidente reportado varias veces).
+
+Al procesar un ticket nuevo (tarea `ticket_creado`):
+1. Se calcula su huella: celda de una malla lat/lon, periodo de tiempo y
+   firma MinHash de la descripción + hechos del lugar.
+2. Los candidatos salen de HUELLAS_TICKETS leyendo solo las 3x3 celdas
+   vecinas y los periodos actual y anterior, del mismo tipo de incidente y
+   de la misma organización (índice IX_HUELLAS_CELDA); nunca se recorre la
+   tabla completa.
+3. Se descartan los que están a más de DEDUP_RADIUS_METERS o
+   DEDUP_WINDOW_HOURS, y entre los restantes gana el de mayor similitud de
+   Jaccard estimada, si supera DEDUP_SIMILARITY_THRESHOLD.
+4. El ticket se liga al padre del candidato (o al candidato, si es original),
+   así todos los duplicados apuntan al primer reporte.
+
+Un duplicado y su padre siempre están en la misma organización (la bandeja
+sin duplicados y /tickets/{id}/duplicados solo ven la propia): al
+transferir un ticket, detach_for_transfer lo separa de su grupo.
+
+Tickets sin ubicación no participan. La celda mide DEDUP_RADIUS_METERS en
+latitud y el doble en longitud (grados de longitud más cortos), lo que
+garantiza que las celdas vecinas cubren el radio hasta latitud 60°.
+"""
+import hashlib
+import math
+import random
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import get_settings
+from .busqueda import fold_terms
+
+METROS_POR_GRADO = 111_320.0
+MINHASH_PERMUTATIONS = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Permutaciones fijas (la firma debe ser estable entre procesos y versiones)
+_rng = random.Random(20240611)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+# ==========================================
+# MINHASH
+# ==========================================
+
+def shingles(texto: str) -> set:
+    """Palabras y pares de palabras consecutivas (sin acentos ni mayúsculas)."""
+    terms = [t for t in fold_terms(texto) if len(t) > 2]  # fuera "de", "la", "en"...
+    return set(terms) | {f"{a} {b}" for a, b in zip(terms, terms[1:])}
+
+def minhash(tokens: set) -> Optional[List[int]]:
+    if not tokens:
+        return None
+    hashes = [
+        struct.unpack("<I", hashlib.blake2b(token.encode(), digest_size=4).digest())[0]
+        for token in tokens
+    ]
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+def encode_signature(signature: Optional[List[int]]) -> Optional[str]:
+    return "".join(f"{value:08x}" for value in signature) if signature else None
+
+def decode_signature(text: Optional[str]) -> Optional[List[int]]:
+    if not text:
+        return None
+    return [int(text[i:i + 8], 16) for i in range(0, len(text), 8)]
+
+def estimate_jaccard(a: List[int], b: List[int]) -> float:
+    """Fracción de posiciones iguales = estimación de la similitud de Jaccard."""
+    return sum(1 for x, y in zip(a, b) if x == y) / min(len(a), len(b))
+
+# ==========================================
+# MALLA ESPACIO-TEMPORAL
+# ==========================================
+
+def _grid(lat: float, lon: float, fecha: datetime, radius_m: float, window_h: float) -> Tuple[int, int, int]:
+    lat_step = radius_m / METROS_POR_GRADO
+    lon_step = lat_step * 2  # 1 / cos(60°)
+    period = int(_epoch_hours(fecha) // window_h)
+    return math.floor(lat / lat_step), math.floor(lon / lon_step), period
+
+def _epoch_hours(fecha: datetime) -> float:
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha.timestamp() / 3600
+
+def _distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * 6_371_000 * math.asin(math.sqrt(h))
+
+# ==========================================
+# DETECCIÓN
+# ==========================================
+
+def detect_duplicate(db: Session, ticket: models.Ticket) -> Optional[Tuple[int, float]]:
+    """
+    Registra la huella del ticket y, si encuentra un reporte previo del mismo
+    incidente, fija ticket.id_ticket_padre. Devuelve (id_padre, similitud) o
+    None. Idempotente: si el ticket ya tiene huella no hace nada.
+    """
+    settings = get_settings()
+    if ticket.ubicacion_lat_ticket is None or ticket.ubicacion_lon_ticket is None:
+        return None
+    if db.get(models.HuellaTicket, ticket.id_ticket) is not None:
+        return None
+
+    lat, lon = float(ticket.ubicacion_lat_ticket), float(ticket.ubicacion_lon_ticket)
+    fecha = ticket.fecha_creacion_ticket or datetime.now(timezone.utc)
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    radius, window = settings.DEDUP_RADIUS_METERS, settings.DEDUP_WINDOW_HOURS
+    cell_lat, cell_lon, period = _grid(lat, lon, fecha, radius, window)
+    signature = minhash(shingles(" ".join(filter(None, (ticket.descripcion_ticket, ticket.des_hechos_lugar_ticket)))))
+
+    H = models.HuellaTicket
+    candidates = db.query(H, models.Ticket.id_ticket_padre).join(
+        models.Ticket, models.Ticket.id_ticket == H.id_ticket_huella
+    ).filter(
+        H.tipo_incidente_huella == ticket.tipo_incidente_ticket,
+        H.celda_lat_huella.in_((cell_lat - 1, cell_lat, cell_lat + 1)),
+        H.celda_lon_huella.in_((cell_lon - 1, cell_lon, cell_lon + 1)),
+        H.periodo_huella.in_((period - 1, period)),
+        H.id_ticket_huella != ticket.id_ticket,
+        models.Ticket.id_organizacion_ticket == ticket.id_organizacion_ticket,
+    ).all()
+
+    best = None
+    if signature is not None:
+        max_age = timedelta(hours=window)
+        for huella, parent_id in candidates:
+            other = decode_signature(huella.firma_minhash_huella)
+            if other is None or abs(fecha - huella.fecha_huella) > max_age:
+                continue
+            if _distance_m(lat, lon, float(huella.lat_huella), float(huella.lon_huella)) > radius:
+                continue
+            similarity = estimate_jaccard(signature, other)
+            if similarity >= settings.DEDUP_SIMILARITY_THRESHOLD and (best is None or similarity > best[1]):
+                best = (parent_id or huella.id_ticket_huella, similarity)
+
+    db.add(H(
+        id_ticket_huella=ticket.id_ticket,
+        tipo_incidente_huella=ticket.tipo_incidente_ticket,
+        celda_lat_huella=cell_lat,
+        celda_lon_huella=cell_lon,
+        periodo_huella=period,
+        lat_huella=lat,
+        lon_huella=lon,
+        fecha_huella=fecha,
+        firma_minhash_huella=encode_signature(signature),
+    ))
+    if best is not None:
+        ticket.id_ticket_padre = best[0]
+    return best
+
+def detach_for_transfer(db: Session, ticket: models.Ticket) -> None:
+    """
+    Llamar antes de cambiar la organización del ticket. Deja de ser duplicado
+    (su padre se queda en la organización de origen) y, si era el original,
+    sus duplicados pasan al más antiguo de ellos como nuevo original. No confirma.
+    """
+    ticket.id_ticket_padre = None
+    hijos = db.query(models.Ticket).filter(
+        models.Ticket.id_ticket_padre == ticket.id_ticket,
+        models.Ticket.id_organizacion_ticket == ticket.id_organizacion_ticket,
+    ).order_by(models.Ticket.id_ticket).all()
+    if not hijos:
+        return
+    # Por el ORM (no UPDATE masivo): así el cambio llega a /public/sync
+    hijos[0].id_ticket_padre = None
+    for hijo in hijos[1:]:
+        hijo.id_ticket_padre = hijos[0].id_ticket
@@ -0,0 +1,241 @@
+"""
+Codificación compacta de respuestas para clientes móviles.
+
+1. Formato columnar (opcional): con `Accept: application/vnd.comecyt.columnar+json`
+   o `?formato=columnar`, los listados se devuelven como un arreglo por campo
+   en lugar de un objeto por fila (los nombres de campo van una sola vez):
+
+       {"filas": 2,
+        "columnas": {"id_ticket": [7, 8], "estado_ticket": [0, 1], ...},
+        "diccionarios": {"estado_ticket": ["RECIBIDO", "ASIGNADO"], ...}}
+
+   Los campos enum van codificados por diccionario: la columna guarda el
+   índice en `diccionarios[campo]` (solo los valores presentes, en orden de
+   aparición). Sin la opción, la respuesta es el JSON de siempre.
+
+2. Compresión negociada (CompressionMiddleware): br (si está instalado el
+   paquete Brotli) o gzip según Accept-Encoding, solo para respuestas de
+   texto/JSON de al menos COMPRESSION_MIN_BYTES.
+
+Para medir bytes y CPU contra el JSON actual: python -m src.tools.encoding_bench
+"""
+import enum
+import gzip
+import json
+import threading
+import typing
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Type
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import brotli
+except ImportError:  # Dependencia opcional: sin ella solo se ofrece gzip
+    brotli = None
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.comecyt.columnar+json"
+COLUMNAR_QUERY_VALUE = "columnar"
+
+# ==========================================
+# FORMATO COLUMNAR
+# ==========================================
+
+def wants_columnar(request: Request) -> bool:
+    if request.query_params.get("formato") == COLUMNAR_QUERY_VALUE:
+        return True
+    return COLUMNAR_MEDIA_TYPE in request.headers.get("accept", "")
+
+@lru_cache()
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+@lru_cache()
+def _enum_fields(model: Type[BaseModel]) -> frozenset:
+    """Campos cuyo tipo es un Enum (o Optional[Enum])."""
+    names = set()
+    for name, field in model.model_fields.items():
+        candidates = typing.get_args(field.annotation) or (field.annotation,)
+        if any(isinstance(c, type) and issubclass(c, enum.Enum) for c in candidates):
+            names.add(name)
+    return frozenset(names)
+
+def encode_columnar(items: list, model: Type[BaseModel]) -> dict:
+    """Valida `items` (ORM o dicts) con `model` y los transpone a columnas."""
+    adapter = _list_adapter(model)
+    rows = adapter.dump_python(adapter.validate_python(items, from_attributes=True), mode="json")
+    enum_fields = _enum_fields(model)
+    columns: Dict[str, list] = {}
+    dictionaries: Dict[str, list] = {}
+    for name in model.model_fields:
+        values = [row[name] for row in rows]
+        if name in enum_fields:
+            index: Dict[Any, int] = {}
+            values = [None if value is None else index.setdefault(value, len(index)) for value in values]
+            dictionaries[name] = list(index)
+        columns[name] = values
+    return {"filas": len(rows), "columnas": columns, "diccionarios": dictionaries}
+
+def render_columnar(items: list, model: Type[BaseModel]) -> bytes:
+    return json.dumps(
+        encode_columnar(items, model), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+def list_response(request: Request, items: list, model: Type[BaseModel], headers: Optional[dict] = None):
+    """
+    Devuelve `items` tal cual (FastAPI los serializa con el response_model)
+    o, si el cliente pidió formato columnar, la respuesta ya codificada.
+    `headers` solo se usa en la respuesta columnar (en la normal se ponen
+    en el `Response` inyectado).
+    """
+    if not wants_columnar(request):
+        return items
+    response = Response(content=render_columnar(items, model), media_type=COLUMNAR_MEDIA_TYPE, headers=headers)
+    response.headers["Vary"] = "Accept"
+    return response
+
+# ==========================================
+# COMPRESIÓN (br / gzip)
+# ==========================================
+
+_COMPRESSIBLE_TYPES = (b"application/json", COLUMNAR_MEDIA_TYPE.encode(), b"text/")
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Codificación a usar según Accept-Encoding (br > gzip), o None."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+class CompressionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses: Dict[str, int] = {}
+        self.bytes_in: Dict[str, int] = {}
+        self.bytes_out: Dict[str, int] = {}
+        self.skipped_small = 0
+
+    def record(self, encoding: str, size_in: int, size_out: int) -> None:
+        with self._lock:
+            self.responses[encoding] = self.responses.get(encoding, 0) + 1
+            self.bytes_in[encoding] = self.bytes_in.get(encoding, 0) + size_in
+            self.bytes_out[encoding] = self.bytes_out.get(encoding, 0) + size_out
+
+    def incr_skipped(self) -> None:
+        with self._lock:
+            self.skipped_small += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "brotli_disponible": brotli is not None,
+                "respuestas_pequenas_sin_comprimir": self.skipped_small,
+                "por_codificacion": {
+                    encoding: {
+                        "respuestas": count,
+                        "bytes_sin_comprimir": self.bytes_in[encoding],
+                        "bytes_enviados": self.bytes_out[encoding],
+                        "proporcion": round(self.bytes_out[encoding] / self.bytes_in[encoding], 4)
+                        if self.bytes_in[encoding] else 0.0,
+                    }
+                    for encoding, count in self.responses.items()
+                },
+            }
+
+@lru_cache()
+def get_compression_stats() -> CompressionStats:
+    return CompressionStats()
+
+def compress(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+class CompressionMiddleware:
+    """
+    Comprime respuestas de un solo cuerpo (las de la API). Las respuestas
+    en streaming, las ya codificadas y las pequeñas pasan sin cambios.
+    """
+
+    def __init__(self, app, stats: CompressionStats, minimum_size: int = 1024,
+                 gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.stats = stats
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = negotiate_encoding(value.decode("latin-1"))
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+            start, start_message = start_message, None
+            if message["type"] != "http.response.body":
+                await send(start)
+                await send(message)
+                return
+            body = message.get("body", b"")
+            if message.get("more_body") or not self._compressible(start["headers"]):
+                await send(start)
+                await send(message)
+                return
+            if len(body) < self.minimum_size:
+                self.stats.incr_skipped()
+                await send(start)
+                await send(message)
+                return
+            compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            headers = [(k, v) for k, v in start["headers"] if k != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            self.stats.record(encoding, len(body), len(compressed))
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _compressible(headers) -> bool:
+        content_type = b""
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        return content_type.startswith(_COMPRESSIBLE_TYPES)
@@ -0,0 +1,190 @@
+"""
+Bitácora de tickets (EVENTOS_TICKETS) con escritura en lotes.
+
+- record_ticket_event(db, ...) deja el evento pendiente en la sesión de la
+  petición. Si la sesión confirma, el evento pasa al buffer del escritor;
+  si hace rollback, se descarta (no se registran cambios que no ocurrieron).
+- EventLogWriter junta los eventos y los inserta en un solo INSERT
+  multi-fila cada EVENT_LOG_FLUSH_SECONDS o al llegar a
+  EVENT_LOG_BATCH_SIZE, en su propia transacción y fuera de la petición.
+  Solo vacía el ciclo del lifespan (y stop()): la petición nunca escribe;
+  si el buffer llega a EVENT_LOG_BUFFER_MAX se descartan los más viejos.
+
+Compromiso: los eventos que están en el buffer se pierden si el proceso
+muere antes del siguiente vaciado (a lo más EVENT_LOG_FLUSH_SECONDS). El
+apagado ordenado (lifespan) vacía el buffer.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Optional
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from .. import database, models
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_PENDIENTES_KEY = "eventos_ticket"
+
+def record_ticket_event(
+    db: Session,
+    ticket: models.Ticket,
+    tipo: models.TipoEventoTicket,
+    id_organizacion: int,
+    id_usuario: Optional[int] = None,
+    estado_anterior: Optional[models.EstadoTicket] = None,
+    detalle: Optional[dict] = None,
+) -> None:
+    """
+    Registra un evento del ticket; se escribe solo si `db` confirma.
+    Debe llamarse después del flush que asigna el ID a un ticket nuevo.
+    Todos los eventos llevan las mismas columnas (None explícito) para que
+    el lote sea un solo INSERT.
+    """
+    db.info.setdefault(_PENDIENTES_KEY, []).append({
+        "id_ticket_evento": ticket.id_ticket,
+        "id_organizacion_evento": id_organizacion,
+        "id_usuario_evento": id_usuario,
+        "tipo_evento": tipo,
+        "estado_anterior_evento": estado_anterior,
+        "estado_nuevo_evento": ticket.estado_ticket,
+        "detalle_evento": json.dumps(detalle, ensure_ascii=False) if detalle else None,
+        "fecha_evento": datetime.now(timezone.utc).replace(tzinfo=None),
+    })
+
+@event.listens_for(Session, "after_commit")
+def _publish_on_commit(session):
+    eventos = session.info.pop(_PENDIENTES_KEY, None)
+    if eventos:
+        get_event_writer().add(eventos)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_PENDIENTES_KEY, None)
+
+# ==========================================
+# ESCRITOR EN LOTES
+# ==========================================
+
+class EventLogWriter:
+    def __init__(self, batch_size: int, flush_seconds: float, buffer_max: int):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.buffer_max = buffer_max
+        self._buffer: deque = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()   # Un solo vaciado a la vez
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+
+    def add(self, eventos: List[dict]) -> None:
+        with self._lock:
+            self._buffer.extend(eventos)
+            overflow = len(self._buffer) - self.buffer_max
+            for _ in range(max(overflow, 0)):
+                self._buffer.popleft()
+                self.dropped += 1
+            full = len(self._buffer) >= self.batch_size
+        if overflow > 0:
+            logger.error("Bitácora de tickets llena: %d eventos descartados", overflow)
+        # Corre en el after_commit de la petición (hilo del threadpool): solo
+        # despierta al ciclo, nunca escribe aquí
+        loop, wake = self._loop, self._wake
+        if full and loop is not None and wake is not None and not wake.is_set():
+            loop.call_soon_threadsafe(wake.set)
+
+    def flush(self) -> int:
+        """Inserta lo acumulado (en lotes de batch_size). Devuelve filas escritas."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    break
+                start = time.perf_counter()
+                database.get_engine()
+                db = database.SessionLocal()
+                try:
+                    # render_nulls: sin él el ORM omite las columnas en None y
+                    # parte el lote en un INSERT por combinación de columnas
+                    db.execute(insert(models.EventoTicket).execution_options(render_nulls=True), batch)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    # Se devuelven al frente del buffer para el siguiente intento
+                    with self._lock:
+                        self._buffer.extendleft(reversed(batch))
+                    self.failures += 1
+                    logger.exception("No se pudo escribir un lote de %d eventos de ticket", len(batch))
+                    break
+                finally:
+                    db.close()
+                written += len(batch)
+                self.written += len(batch)
+                self.flushes += 1
+                self.last_flush_ms = (time.perf_counter() - start) * 1000
+        return written
+
+    # --- Ciclo de vida (lifespan) ---
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            # Cada flush_seconds, o antes si add() juntó un lote completo
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                logger.exception("Error vaciando la bitácora de tickets")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = self._wake = None
+        await asyncio.to_thread(self.flush)
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "buffered": buffered,
+            "written_total": self.written,
+            "flushes_total": self.flushes,
+            "flush_failures_total": self.failures,
+            "dropped_total": self.dropped,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+@lru_cache()
+def get_event_writer() -> EventLogWriter:
+    settings = get_settings()
+    return EventLogWriter(
+        batch_size=settings.EVENT_LOG_BATCH_SIZE,
+        flush_seconds=settings.EVENT_LOG_FLUSH_SECONDS,
+        buffer_max=settings.EVENT_LOG_BUFFER_MAX,
+    )
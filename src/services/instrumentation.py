@@ -0,0 +1,279 @@
+"""
+Instrumentación de peticiones HTTP y consultas SQL.
+
+- InstrumentationMiddleware (ASGI puro): latencia por plantilla de ruta
+  (p. ej. /operations/tickets/{ticket_id}), conteo por código de estado y
+  número de sentencias SQL / tiempo de BD por petición.
+- Eventos before/after_cursor_execute: cuentan y miden cada sentencia y
+  alimentan un log muestreado de consultas lentas con parámetros redactados.
+- query_budget(n): declara el máximo de sentencias SQL de un endpoint; con
+  QUERY_BUDGET_CHECK (apagado por defecto) el middleware registra (log +
+  contador) cada petición que lo excede, con las sentencias responsables.
+  tests/test_query_budget_*.py lo verifica en CI.
+- render_prometheus(): todo lo anterior (más pool y caché) en formato texto.
+
+El costo por petición es de unos pocos microsegundos (dos perf_counter por
+sentencia y un par de observaciones de histograma por petición).
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config import get_settings
+from .cache import get_query_cache
+from .metrics import (
+    Histogram, LATENCY_BUCKETS, render_histogram, render_pool_metrics, render_sample
+)
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Sentencias que se conservan por petición para reportar un presupuesto excedido
+MAX_CAPTURED_STATEMENTS = 50
+
+def query_budget(max_queries: int):
+    """
+    Declara el máximo de sentencias SQL que puede ejecutar un endpoint
+    (incluida la autenticación). Va DEBAJO del decorador de la ruta:
+
+        @router.get("/zonas")
+        @query_budget(1)
+        def get_zonas(...):
+    """
+    def decorator(endpoint):
+        endpoint.__query_budget__ = max_queries
+        return endpoint
+    return decorator
+
+def get_query_budget(endpoint) -> Optional[int]:
+    return getattr(endpoint, "__query_budget__", None)
+
+class RequestStats:
+    """Contador de SQL de UNA petición (compartido con sus hilos de trabajo)."""
+    __slots__ = ("queries", "db_time", "scope", "statements", "_lock")
+
+    def __init__(self, scope: dict, capture_statements: bool = False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.scope = scope
+        self.statements = [] if capture_statements else None
+        self._lock = threading.Lock()
+
+    @property
+    def route(self) -> str:
+        # El router deja la ruta resuelta en el scope; sin ruta (404)
+        # se agrupa para no crear una serie por cada URL desconocida.
+        return getattr(self.scope.get("route"), "path", None) or "<sin_ruta>"
+
+    def add(self, statement: str, elapsed: float) -> None:
+        with self._lock:
+            self.queries += 1
+            self.db_time += elapsed
+            if self.statements is not None and len(self.statements) < MAX_CAPTURED_STATEMENTS:
+                self.statements.append(statement)
+
+# La petición en curso; los hilos del threadpool heredan una copia del
+# contexto, pero apuntan al mismo objeto RequestStats.
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+def current_request() -> Optional[RequestStats]:
+    """Contador de la petición en curso (None fuera de una petición: tareas, arranque)."""
+    return _current_request.get()
+
+class _RouteMetrics:
+    __slots__ = ("latency", "queries", "db_time", "statuses", "budget_exceeded", "_lock")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.statuses = {}
+        self.budget_exceeded = 0
+        self._lock = threading.Lock()
+
+    def count_status(self, status: int) -> None:
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+class Instrumentation:
+    def __init__(self, slow_threshold_ms: float, slow_sample_rate: float, slow_log_size: int,
+                 check_budgets: bool = True):
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.slow_sample_rate = slow_sample_rate
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.check_budgets = check_budgets
+        self.budget_violations = deque(maxlen=100)
+        self.db_query_seconds = Histogram(LATENCY_BUCKETS)
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def route(self, method: str, template: str) -> _RouteMetrics:
+        key = (method, template)
+        metrics = self._routes.get(key)
+        if metrics is None:
+            with self._lock:
+                metrics = self._routes.setdefault(key, _RouteMetrics())
+        return metrics
+
+    # --- SQL ---
+
+    def record_query(self, statement: str, parameters, elapsed: float) -> None:
+        self.db_query_seconds.observe(elapsed)
+        stats = _current_request.get()
+        if stats is not None:
+            stats.add(statement, elapsed)
+        if elapsed >= self.slow_threshold and random.random() < self.slow_sample_rate:
+            self.slow_queries.append({
+                "statement": statement[:2000],
+                # Nunca se registran valores: solo cuántos parámetros había
+                "parameters": _redact(parameters),
+                "duration_ms": round(elapsed * 1000, 2),
+                "route": stats.route if stats is not None else None,
+                "timestamp": time.time(),
+            })
+
+    # --- Presupuesto de consultas ---
+
+    def check_budget(self, method: str, stats: RequestStats, metrics: _RouteMetrics) -> None:
+        budget = get_query_budget(stats.scope.get("endpoint"))
+        if budget is None or stats.queries <= budget:
+            return
+        with metrics._lock:
+            metrics.budget_exceeded += 1
+        self.budget_violations.append({
+            "method": method,
+            "route": stats.route,
+            "queries": stats.queries,
+            "budget": budget,
+            "statements": stats.statements or [],
+            "timestamp": time.time(),
+        })
+        logger.warning(
+            "Presupuesto de consultas excedido en %s %s: %d > %d\n%s",
+            method, stats.route, stats.queries, budget, "\n".join(stats.statements or [])
+        )
+
+    # --- Exportación ---
+
+    def render_prometheus(self, pools: Optional[dict] = None) -> str:
+        lines = [
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            routes = list(self._routes.items())
+        for (method, template), metrics in routes:
+            lines += render_histogram("http_request_duration_seconds", metrics.latency,
+                                      {"method": method, "route": template})
+        lines.append("# TYPE http_requests_total counter")
+        for (method, template), metrics in routes:
+            with metrics._lock:
+                statuses = dict(metrics.statuses)
+            for status, count in statuses.items():
+                lines.append(render_sample("http_requests_total", count,
+                                           {"method": method, "route": template, "status": status}))
+        lines.append("# TYPE http_request_db_queries histogram")
+        for (method, template), metrics in routes:
+            lines += render_histogram("http_request_db_queries", metrics.queries,
+                                      {"method": method, "route": template})
+        lines.append("# TYPE http_request_db_seconds histogram")
+        for (method, template), metrics in routes:
+            lines += render_histogram("http_request_db_seconds", metrics.db_time,
+                                      {"method": method, "route": template})
+
+        lines.append("# TYPE http_query_budget_exceeded_total counter")
+        for (method, template), metrics in routes:
+            if metrics.budget_exceeded:
+                lines.append(render_sample("http_query_budget_exceeded_total", metrics.budget_exceeded,
+                                           {"method": method, "route": template}))
+
+        lines.append("# TYPE db_query_duration_seconds histogram")
+        lines += render_histogram("db_query_duration_seconds", self.db_query_seconds)
+
+        lines += render_pool_metrics(pools or {})
+
+        cache = get_query_cache().stats()
+        for key in ("hits", "misses", "invalidations", "evictions"):
+            lines += [f"# TYPE query_cache_{key}_total counter",
+                      render_sample(f"query_cache_{key}_total", cache[key])]
+        lines += ["# TYPE query_cache_entries gauge", render_sample("query_cache_entries", cache["entries"])]
+        return "\n".join(lines) + "\n"
+
+def _redact(parameters) -> str:
+    if not parameters:
+        return "<sin parámetros>"
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (list, tuple, dict)):
+        return f"<redactado: {len(parameters)} filas>"
+    return f"<redactado: {len(parameters)}>"
+
+@lru_cache()
+def get_instrumentation() -> Instrumentation:
+    settings = get_settings()
+    return Instrumentation(
+        slow_threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+        slow_sample_rate=settings.SLOW_QUERY_SAMPLE_RATE,
+        slow_log_size=settings.SLOW_QUERY_LOG_SIZE,
+        check_budgets=settings.QUERY_BUDGET_CHECK,
+    )
+
+def instrument_engine(engine: Engine) -> None:
+    """Cuenta y mide cada sentencia SQL ejecutada por `engine`."""
+    instrumentation = get_instrumentation()
+
+    # El inicio va en el contexto de la sentencia, no en la conexión: si la
+    # sentencia falla no hay after_cursor_execute y no debe quedar nada
+    # acumulado en una conexión que vuelve al pool
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_query_start", None)
+        if start is not None:
+            instrumentation.record_query(statement, parameters, time.perf_counter() - start)
+
+# ==========================================
+# MIDDLEWARE ASGI
+# ==========================================
+
+class InstrumentationMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        instrumentation = get_instrumentation()
+        stats = RequestStats(scope, capture_statements=instrumentation.check_budgets)
+        token = _current_request.set(stats)
+        status_holder = [500]
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_request.reset(token)
+            metrics = instrumentation.route(scope["method"], stats.route)
+            metrics.latency.observe(elapsed)
+            metrics.queries.observe(stats.queries)
+            metrics.db_time.observe(stats.db_time)
+            metrics.count_status(status_holder[0])
+            if instrumentation.check_budgets:
+                instrumentation.check_budget(scope["method"], stats, metrics)
@@ -0,0 +1,269 @@
+"""
+Mapa público de incidentes (/public/mapa).
+
+- CONTEOS_INCIDENTES_DIA guarda, por día de creación (UTC), zona y tipo,
+  cuántos tickets se reportaron y cuántos de ellos están cerrados. Se
+  actualiza en la misma transacción que el ticket: +1 al crearlo y ±1 en
+  cerrados al pasar entre abierto y cerrado (mismo criterio que el SLA).
+  Archivar no lo cambia: los archivados siguen contando.
+- src.tools.mapa_snapshots (periódico, fuera de la API) genera por cada
+  ventana de HEATMAP_WINDOWS_DAYS un JSON sumando esas filas y lo guarda en
+  SNAPSHOTS_MAPA solo si cambió. Un snapshot nunca se modifica: se sirve en
+  su propia URL con Cache-Control immutable y ETag (su SHA-256), así que
+  navegadores y CDN lo guardan sin volver a preguntar.
+- /public/mapa solo dice cuál es el último snapshot de cada ventana (con
+  vigencia corta). Índice y snapshots se sirven desde memoria: el tráfico
+  anónimo nunca lee TICKETS.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from ..config import get_settings
+from . import contadores
+from .sla import ESTADOS_CERRADOS
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _creation_day(value: datetime) -> date:
+    # La BD guarda UTC; MySQL y SQLite devuelven fechas sin zona
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+# ==========================================
+# MANTENIMIENTO INCREMENTAL
+# ==========================================
+
+def _upsert_increment(db: Session, day: date, ticket: models.Ticket, total: int, cerrados: int) -> None:
+    contadores.upsert_increment(db, models.ConteoIncidenteDia, {
+        "fecha_conteo": day,
+        "id_zona_conteo": ticket.id_zona_ticket or 0,
+        "tipo_incidente_conteo": ticket.tipo_incidente_ticket,
+    }, {"total_conteo": total, "cerrados_conteo": cerrados})
+
+def track_ticket_created(db: Session, ticket: models.Ticket) -> None:
+    """
+    Llamar después del flush del ticket nuevo. Cuenta el día de hoy (UTC):
+    FECHA_CREACION la pone la BD y leerla costaría otra consulta.
+    No confirma.
+    """
+    cerrado = 1 if ticket.estado_ticket in ESTADOS_CERRADOS else 0
+    _upsert_increment(db, _utcnow().date(), ticket, 1, cerrado)
+
+def track_state_change(db: Session, ticket: models.Ticket, estado_anterior: Optional[models.EstadoTicket]) -> None:
+    """Llamar después de cambiar ticket.estado_ticket. No confirma."""
+    cerrado_antes = estado_anterior in ESTADOS_CERRADOS
+    cerrado_ahora = ticket.estado_ticket in ESTADOS_CERRADOS
+    if cerrado_antes == cerrado_ahora or ticket.fecha_creacion_ticket is None:
+        return
+    _upsert_increment(db, _creation_day(ticket.fecha_creacion_ticket), ticket, 0, 1 if cerrado_ahora else -1)
+
+def rebuild_counters(conn: Connection, batch_size: int = 10000) -> int:
+    """
+    Recalcula CONTEOS_INCIDENTES_DIA desde TICKETS y TICKETS_ARCHIVO (carga
+    inicial, seed o importaciones por fuera de la API). Agrupa en la BD.
+    Devuelve el número de tickets contados. No confirma.
+    """
+    counts: Dict[tuple, List[int]] = {}
+    for T in (models.Ticket, models.TicketArchivado):
+        dia = func.date(T.fecha_creacion_ticket)
+        result = conn.execute(
+            select(
+                dia, T.id_zona_ticket, T.tipo_incidente_ticket, func.count(),
+                func.sum(case((T.estado_ticket.in_(ESTADOS_CERRADOS), 1), else_=0)),
+            ).where(T.fecha_creacion_ticket.isnot(None)).group_by(dia, T.id_zona_ticket, T.tipo_incidente_ticket)
+        )
+        for dia_valor, zona, tipo, total, cerrados in result:
+            # SQLite devuelve DATE() como texto
+            if not isinstance(dia_valor, date):
+                dia_valor = date.fromisoformat(str(dia_valor)[:10])
+            conteo = counts.setdefault((dia_valor, zona or 0, tipo), [0, 0])
+            conteo[0] += int(total)
+            conteo[1] += int(cerrados or 0)
+
+    table = models.ConteoIncidenteDia.__table__
+    conn.execute(delete(table))
+    rows = [
+        {"FECHA_CONTEO": dia, "ID_ZONA_CONTEO": zona, "TIPO_INCIDENTE_CONTEO": tipo,
+         "TOTAL_CONTEO": total, "CERRADOS_CONTEO": cerrados}
+        for (dia, zona, tipo), (total, cerrados) in counts.items()
+    ]
+    for i in range(0, len(rows), batch_size):
+        conn.execute(insert(table), rows[i:i + batch_size])
+    return sum(total for total, _ in counts.values())
+
+# ==========================================
+# GENERACIÓN DE SNAPSHOTS
+# ==========================================
+
+def _sum_counts(counts: Counter) -> dict:
+    total, cerrados = counts["total"], counts["cerrados"]
+    return {"total": total, "abiertos": total - cerrados, "cerrados": cerrados}
+
+def build_snapshot(db: Session, days: int, today: date, zonas: Dict[int, models.Zona]) -> dict:
+    """Conteos de los últimos `days` días (incluido hoy) por zona y tipo."""
+    C = models.ConteoIncidenteDia
+    desde = today - timedelta(days=days - 1)
+    rows = db.query(
+        C.id_zona_conteo, C.tipo_incidente_conteo, func.sum(C.total_conteo), func.sum(C.cerrados_conteo)
+    ).filter(C.fecha_conteo >= desde, C.fecha_conteo <= today).group_by(
+        C.id_zona_conteo, C.tipo_incidente_conteo
+    ).all()
+
+    por_zona: Dict[int, Dict[str, Counter]] = {}
+    for zona, tipo, total, cerrados in rows:
+        total = int(total or 0)
+        if total <= 0:
+            continue
+        por_zona.setdefault(zona, {})[tipo] = Counter(total=total, cerrados=int(cerrados or 0))
+
+    total_general: Counter = Counter()
+    items = []
+    for zona_id in sorted(por_zona):
+        tipos = por_zona[zona_id]
+        zona_total = sum(tipos.values(), Counter())
+        total_general += zona_total
+        zona = zonas.get(zona_id)
+        items.append({
+            "id_zona": zona_id or None,
+            "nombre_zona": zona.nombre_zona if zona else None,
+            "estado_zona": zona.estado_zona if zona else None,
+            **_sum_counts(zona_total),
+            "por_tipo": [
+                {"tipo_incidente": tipo, **_sum_counts(tipos[tipo])}
+                for tipo in sorted(tipos, key=lambda tipo: getattr(tipo, "value", tipo))
+            ],
+        })
+    return {
+        "ventana_dias": days, "desde": desde, "hasta": today,
+        **_sum_counts(total_general), "zonas": items,
+    }
+
+def render_snapshot(content: dict) -> Tuple[str, str]:
+    """(JSON compacto validado con MapaSnapshot, SHA-256 hexadecimal)."""
+    data = schemas.MapaSnapshot.model_validate(content).model_dump(mode="json")
+    body = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    return body, hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+def _latest_query(db: Session):
+    S = models.SnapshotMapa
+    latest = select(func.max(S.id_snapshot)).group_by(S.ventana_snapshot)
+    return db.query(S.ventana_snapshot, S.id_snapshot, S.hash_snapshot, S.fecha_snapshot).filter(
+        S.id_snapshot.in_(latest)
+    )
+
+def publish_snapshots(db: Session, windows: List[int], keep: int, now: Optional[datetime] = None) -> List[tuple]:
+    """
+    Genera el snapshot de cada ventana y lo guarda si difiere del último;
+    conserva los `keep` más recientes por ventana. Confirma.
+    Devuelve [(ventana, id_snapshot, nuevo)].
+    """
+    S = models.SnapshotMapa
+    now = now or _utcnow()
+    zonas = {zona.id_zona: zona for zona in db.query(models.Zona).all()}
+    latest = {ventana: (id_snapshot, digest) for ventana, id_snapshot, digest, _ in _latest_query(db).all()}
+
+    results = []
+    for days in windows:
+        body, digest = render_snapshot(build_snapshot(db, days, now.date(), zonas))
+        previous = latest.get(days)
+        if previous is not None and previous[1] == digest:
+            results.append((days, previous[0], False))
+            continue
+        snapshot = S(ventana_snapshot=days, hash_snapshot=digest, contenido_snapshot=body, fecha_snapshot=now)
+        db.add(snapshot)
+        db.flush()
+        results.append((days, snapshot.id_snapshot, True))
+
+        # Los viejos se pueden borrar: quien los tenga en caché ya no vuelve a pedirlos
+        oldest_kept = db.query(S.id_snapshot).filter(S.ventana_snapshot == days).order_by(
+            S.id_snapshot.desc()
+        ).offset(max(keep, 1) - 1).limit(1).scalar()
+        if oldest_kept is not None:
+            db.execute(
+                delete(S).where(S.ventana_snapshot == days, S.id_snapshot < oldest_kept),
+                execution_options={"synchronize_session": False}
+            )
+    db.commit()
+    get_mapa_cache().invalidate_index()
+    return results
+
+# ==========================================
+# LECTURA (Caché en memoria)
+# ==========================================
+
+class MapaCache:
+    """
+    Índice (último snapshot por ventana) con vigencia de `ttl_seconds` y
+    contenido de snapshots por ID sin vencimiento (son inmutables), hasta
+    `max_entries` con desalojo LRU.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._index: Optional[List[dict]] = None
+        self._loaded_at = 0.0
+        self._snapshots: "OrderedDict[int, Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def index(self, db: Session) -> List[dict]:
+        index = self._index
+        if index is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+            return index
+        windows = set(get_settings().heatmap_windows)
+        index = [
+            {"ventana_dias": ventana, "id_snapshot": id_snapshot, "hash": digest, "generado": fecha}
+            for ventana, id_snapshot, digest, fecha in sorted(_latest_query(db).all())
+            if ventana in windows
+        ]
+        with self._lock:
+            self._index = index
+            self._loaded_at = time.monotonic()
+        return index
+
+    def snapshot(self, db: Session, id_snapshot: int) -> Optional[Tuple[bytes, str]]:
+        """(JSON, SHA-256) del snapshot, o None si no existe (no se guarda en caché)."""
+        with self._lock:
+            cached = self._snapshots.get(id_snapshot)
+            if cached is not None:
+                self._snapshots.move_to_end(id_snapshot)
+                return cached
+        S = models.SnapshotMapa
+        row = db.query(S.contenido_snapshot, S.hash_snapshot).filter(S.id_snapshot == id_snapshot).first()
+        if row is None:
+            return None
+        cached = (row[0].encode("utf-8"), row[1])
+        with self._lock:
+            self._snapshots[id_snapshot] = cached
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+        return cached
+
+    def invalidate_index(self) -> None:
+        with self._lock:
+            self._index = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index = None
+            self._snapshots.clear()
+
+@lru_cache()
+def get_mapa_cache() -> MapaCache:
+    settings = get_settings()
+    return MapaCache(settings.HEATMAP_INDEX_TTL_SECONDS, settings.HEATMAP_SNAPSHOT_CACHE_ENTRIES)
@@ -0,0 +1,206 @@
+"""
+Métricas en memoria del proceso (sin dependencias externas).
+
+- Histogram: histograma de buckets fijos, seguro entre hilos.
+- PoolMetrics: telemetría de un pool de conexiones de SQLAlchemy
+  (checkouts, overflow, espera por conexión y vida de las conexiones).
+  Una instancia por pool ("primario", "replica-0", ...): el nombre es el
+  pool_logging_name del engine y va como etiqueta `pool` en Prometheus.
+"""
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Sequence
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# Buckets en segundos
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIFETIME_BUCKETS = (1, 10, 60, 300, 900, 1800, 3600, 7200, 28800)
+
+PRIMARY_POOL = "primario"
+
+class Histogram:
+    """Histograma acumulativo estilo Prometheus (buckets `le`)."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # último = +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimación (cota superior del bucket) del cuantil q."""
+        with self._lock:
+            counts, total = list(self._counts), self._count
+        if not total:
+            return 0.0
+        target = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts, total, acc = list(self._counts), self._count, self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return {
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], cumulative)),
+            "count": total,
+            "sum": acc,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+# ==========================================
+# POOL DE CONEXIONES
+# ==========================================
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkout_wait = Histogram(LATENCY_BUCKETS)
+        self.connection_lifetime = Histogram(LIFETIME_BUCKETS)
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, pool=None) -> dict:
+        data = {
+            "checkouts_total": self.checkouts,
+            "checkins_total": self.checkins,
+            "connects_total": self.connects,
+            "invalidations_total": self.invalidations,
+            "checkout_timeouts_total": self.timeouts,
+            "checkout_wait_seconds": self.checkout_wait.snapshot(),
+            "connection_lifetime_seconds": self.connection_lifetime.snapshot(),
+        }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                # overflow() es negativo mientras el pool base no se ha llenado
+                "overflow_in_use": max(pool.overflow(), 0),
+                "idle": pool.checkedin(),
+            })
+        return data
+
+@lru_cache(maxsize=None)
+def get_pool_metrics(name: str = PRIMARY_POOL) -> PoolMetrics:
+    return PoolMetrics()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout por una conexión."""
+
+    def _do_get(self):
+        # logging_name sobrevive a dispose() (el pool se recrea con los mismos argumentos)
+        metrics = get_pool_metrics(self.logging_name or PRIMARY_POOL)
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.incr("timeouts")
+            raise
+        finally:
+            metrics.checkout_wait.observe(time.perf_counter() - start)
+
+def instrument_pool(engine: Engine, name: str = PRIMARY_POOL) -> None:
+    """Registra los eventos del pool de `engine` en el PoolMetrics de `name`."""
+    metrics = get_pool_metrics(name)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.incr("connects")
+        connection_record.info["abierta_en"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.incr("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.incr("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.incr("invalidations")
+
+    @event.listens_for(engine, "close")
+    def _on_close(dbapi_connection, connection_record):
+        opened_at = connection_record.info.pop("abierta_en", None)
+        if opened_at is not None:
+            metrics.connection_lifetime.observe(time.monotonic() - opened_at)
+
+# ==========================================
+# FORMATO PROMETHEUS (texto)
+# ==========================================
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+def render_histogram(name: str, histogram: Histogram, labels: dict = None) -> list:
+    """Líneas _bucket/_sum/_count de un histograma (sin HELP/TYPE)."""
+    labels = labels or {}
+    snap = histogram.snapshot()
+    lines = [
+        f"{name}_bucket{_format_labels({**labels, 'le': le})} {count}"
+        for le, count in snap["buckets"].items()
+    ]
+    lines.append(f"{name}_sum{_format_labels(labels)} {snap['sum']}")
+    lines.append(f"{name}_count{_format_labels(labels)} {snap['count']}")
+    return lines
+
+def render_sample(name: str, value, labels: dict = None) -> str:
+    return f"{name}{_format_labels(labels or {})} {value}"
+
+def render_pool_metrics(pools: Dict[str, object]) -> list:
+    """Métricas de cada pool ({nombre: pool}) con la etiqueta `pool`."""
+    snaps = {name: get_pool_metrics(name).snapshot(pool) for name, pool in pools.items()}
+    lines = []
+    for key in ("checkouts_total", "checkins_total", "connects_total",
+                "invalidations_total", "checkout_timeouts_total"):
+        lines.append(f"# TYPE db_pool_{key} counter")
+        lines += [render_sample(f"db_pool_{key}", snap[key], {"pool": name}) for name, snap in snaps.items()]
+    for key in ("pool_size", "checked_out", "overflow_in_use", "idle"):
+        gauges = [render_sample(f"db_pool_{key}", snap[key], {"pool": name})
+                  for name, snap in snaps.items() if key in snap]
+        if gauges:
+            lines += [f"# TYPE db_pool_{key} gauge", *gauges]
+    lines.append("# TYPE db_pool_checkout_wait_seconds histogram")
+    for name in pools:
+        lines += render_histogram("db_pool_checkout_wait_seconds", get_pool_metrics(name).checkout_wait, {"pool": name})
+    lines.append("# TYPE db_pool_connection_lifetime_seconds histogram")
+    for name in pools:
+        lines += render_histogram("db_pool_connection_lifetime_seconds", get_pool_metrics(name).connection_lifetime, {"pool": name})
+    return lines
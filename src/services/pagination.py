@@ -0,0 +1,45 @@
+"""
+Paginación por cursor (keyset) para listados largos.
+
+El cursor es opaco para el cliente: codifica los valores de la última fila
+entregada (p. ej. fecha e ID) y la siguiente página se pide con
+`WHERE (orden) < (cursor)`, que usa el índice en lugar de un OFFSET que
+recorre todas las filas anteriores.
+"""
+import base64
+import json
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, status
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+# Para respuestas que ya son una lista (p. ej. la bandeja), el cursor va en este header
+NEXT_CURSOR_HEADER = "X-Siguiente-Cursor"
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """Valores del cursor (o None si no hay). 400 si el cursor no es válido."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación inválido")
+    return values
+
+def page(rows: list, limit: int, cursor_of) -> tuple:
+    """
+    Recorta `rows` (consultadas con limit + 1) a `limit` y calcula el cursor
+    de la siguiente página con `cursor_of(ultima_fila)`, o None si no hay más.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, cursor_of(rows[-1])
@@ -0,0 +1,173 @@
+"""
+Límite de peticiones (token bucket) para los endpoints públicos sin autenticación.
+
+- Cada ruta limitada tiene un bucket por dispositivo (header X-Device-Id, el
+  mismo UUID que id_usuario_reporte_ticket) y otro por IP, más holgado
+  (RATE_LIMIT_IP_MULTIPLIER) para no castigar a quienes comparten red.
+  Sin X-Device-Id solo aplica el de IP.
+- Los buckets viven en memoria con desalojo LRU (RATE_LIMIT_MAX_BUCKETS).
+  Un bucket desalojado vuelve lleno, lo cual solo favorece al cliente.
+- Las peticiones rechazadas reciben 429 con Retry-After.
+
+El límite es por worker: con N workers, el límite efectivo es hasta N veces
+el configurado.
+"""
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from ..config import get_settings
+
+DEVICE_HEADER = b"x-device-id"
+
+def parse_rate(spec: str) -> Tuple[float, float]:
+    """'10/60' -> (capacidad 10, 10/60 fichas por segundo)."""
+    count, _, seconds = spec.partition("/")
+    capacity, period = float(count), float(seconds or 1)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"Límite inválido: {spec!r} (formato 'peticiones/segundos')")
+    return capacity, capacity / period
+
+class TokenBuckets:
+    """Buckets por llave con capacidad y recarga fijas, LRU acotado."""
+
+    def __init__(self, capacity: float, refill_per_second: float, max_buckets: int):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()   # llave -> [fichas, última recarga]
+        self._lock = threading.Lock()
+
+    def take(self, key: str, now: float) -> float:
+        """
+        Consume una ficha. Devuelve 0 si se permitió, o los segundos que faltan
+        para la siguiente ficha si el bucket está vacío.
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.capacity, now]
+                if len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_per_second)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.refill_per_second
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class RouteLimit:
+    def __init__(self, spec: str, ip_multiplier: float, max_buckets: int):
+        capacity, refill = parse_rate(spec)
+        self.spec = spec
+        self.device = TokenBuckets(capacity, refill, max_buckets)
+        self.ip = TokenBuckets(capacity * ip_multiplier, refill * ip_multiplier, max_buckets)
+        self.allowed = 0
+        self.limited = 0
+
+    def check(self, device: Optional[str], ip: str) -> float:
+        """0 si se permite; si no, segundos de espera sugeridos."""
+        now = time.monotonic()
+        wait = self.ip.take(ip, now)
+        if not wait and device:
+            wait = self.device.take(device, now)
+        if wait:
+            self.limited += 1
+        else:
+            self.allowed += 1
+        return wait
+
+class RateLimiter:
+    def __init__(self, limits: Dict[Tuple[str, str], RouteLimit], enabled: bool = True):
+        self.limits = limits   # (método, ruta) -> RouteLimit
+        self.enabled = enabled
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "routes": {
+                f"{method} {path}": {
+                    "limit": limit.spec,
+                    "allowed": limit.allowed,
+                    "limited": limit.limited,
+                    "device_buckets": len(limit.device),
+                    "ip_buckets": len(limit.ip),
+                }
+                for (method, path), limit in self.limits.items()
+            },
+        }
+
+@lru_cache()
+def get_rate_limiter() -> RateLimiter:
+    settings = get_settings()
+    routes = {
+        ("POST", "/public/tickets"): settings.RATE_LIMIT_PUBLIC_TICKETS,
+        ("POST", "/public/evidence/upload"): settings.RATE_LIMIT_PUBLIC_EVIDENCE,
+        ("POST", "/public/evidence/upload-url"): settings.RATE_LIMIT_PUBLIC_EVIDENCE,
+        ("POST", "/public/evidence/complete"): settings.RATE_LIMIT_PUBLIC_EVIDENCE,
+        # Solo la creación de la sesión: las partes ya están autorizadas
+        ("POST", "/public/evidence/uploads"): settings.RATE_LIMIT_PUBLIC_EVIDENCE,
+        ("POST", "/public/chatbot/ask"): settings.RATE_LIMIT_PUBLIC_CHATBOT,
+    }
+    return RateLimiter(
+        {
+            key: RouteLimit(spec, settings.RATE_LIMIT_IP_MULTIPLIER, settings.RATE_LIMIT_MAX_BUCKETS)
+            for key, spec in routes.items()
+        },
+        enabled=settings.RATE_LIMIT_ENABLED,
+    )
+
+# ==========================================
+# MIDDLEWARE ASGI
+# ==========================================
+
+class RateLimitMiddleware:
+    """
+    Aplica RateLimiter antes de leer el cuerpo: una petición rechazada no
+    toca la BD ni consume ancho de banda de subida.
+    """
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limiter.limits.get((scope["method"], scope["path"]))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        device = None
+        for name, value in scope["headers"]:
+            if name == DEVICE_HEADER:
+                device = value.decode("latin-1")[:64]
+                break
+        client = scope.get("client")
+        wait = limit.check(device, client[0] if client else "desconocido")
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Demasiadas solicitudes, intenta más tarde."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(wait)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
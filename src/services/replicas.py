@@ -0,0 +1,233 @@
+"""
+Enrutamiento de lecturas a réplicas de la base de datos.
+
+- ReplicaSet: reparte las lecturas (round-robin) entre las réplicas sanas.
+  Una réplica que acumula DB_REPLICA_MAX_FAILURES errores de conexión
+  seguidos se expulsa por DB_REPLICA_EJECTION_SECONDS; al vencer ese plazo
+  se prueba con un `SELECT 1` antes de readmitirla.
+- StickyClients: lectura de lo propio. Tras una escritura exitosa, las
+  lecturas de ese cliente van al primario durante DB_READ_YOUR_WRITES_SECONDS
+  para no leer de una réplica atrasada.
+- ReadYourWritesMiddleware: marca al cliente (en memoria y con la cookie
+  `rw_hasta`, que sirve entre workers) después de cada escritura.
+
+Nota: la caché de consultas (services/cache.py) se invalida con las
+escrituras del primario; una lectura de réplica atrasada puede quedar
+cacheada hasta QUERY_CACHE_TTL_SECONDS.
+"""
+import hashlib
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = "rw_hasta"
+METODOS_LECTURA = frozenset({"GET", "HEAD"})
+
+# ==========================================
+# RÉPLICAS Y SALUD
+# ==========================================
+
+class _Replica:
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.failures = 0          # Errores de conexión consecutivos
+        self.ejected_until = 0.0   # monotonic; 0 = en servicio
+        self.ejections = 0
+        self.reads = 0
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+class ReplicaSet:
+    """Réplicas de solo lectura con expulsión por salud."""
+
+    def __init__(self, engines: List[Engine], max_failures: int, ejection_seconds: float):
+        self.max_failures = max_failures
+        self.ejection_seconds = ejection_seconds
+        self._replicas = [_Replica(engine) for engine in engines]
+        self._by_engine = {id(r.engine): r for r in self._replicas}
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self.fallbacks = 0         # Lecturas enviadas al primario por falta de réplicas
+        for replica in self._replicas:
+            self._listen(replica)
+
+    def _listen(self, replica: _Replica) -> None:
+        dbapi = replica.engine.dialect.dbapi
+
+        @event.listens_for(replica.engine, "handle_error")
+        def _on_error(context):
+            # Solo errores de conexión (caída, red, archivo inaccesible),
+            # no errores de SQL de la propia consulta.
+            if context.is_disconnect or (
+                dbapi is not None and isinstance(context.original_exception, dbapi.OperationalError)
+            ):
+                self.mark_failure(replica.engine)
+
+        @event.listens_for(replica.engine, "checkout")
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            if replica.failures:
+                self.mark_success(replica.engine)
+
+    def mark_failure(self, engine: Engine) -> None:
+        replica = self._by_engine[id(engine)]
+        with self._lock:
+            replica.failures += 1
+            if replica.failures >= self.max_failures and not replica.ejected_until:
+                replica.ejected_until = time.monotonic() + self.ejection_seconds
+                replica.ejections += 1
+                logger.warning(
+                    "Réplica %s expulsada por %.0fs tras %d fallos",
+                    replica.name, self.ejection_seconds, replica.failures
+                )
+
+    def mark_success(self, engine: Engine) -> None:
+        replica = self._by_engine[id(engine)]
+        with self._lock:
+            replica.failures = 0
+
+    def _probe(self, replica: _Replica) -> bool:
+        try:
+            with replica.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    def _available(self, replica: _Replica) -> bool:
+        with self._lock:
+            if not replica.ejected_until:
+                return True
+            if time.monotonic() < replica.ejected_until:
+                return False
+            # Plazo vencido: un solo hilo hace la prueba, los demás la esperan expulsada
+            replica.ejected_until = time.monotonic() + self.ejection_seconds
+        if self._probe(replica):
+            with self._lock:
+                replica.failures = 0
+                replica.ejected_until = 0.0
+            logger.info("Réplica %s readmitida", replica.name)
+            return True
+        return False
+
+    def choose(self) -> Optional[Engine]:
+        """Siguiente réplica sana, o None si todas están expulsadas."""
+        count = len(self._replicas)
+        start = next(self._next)
+        for offset in range(count):
+            replica = self._replicas[(start + offset) % count]
+            if self._available(replica):
+                replica.reads += 1
+                return replica.engine
+        self.fallbacks += 1
+        return None
+
+    @property
+    def engines(self) -> List[Engine]:
+        return [replica.engine for replica in self._replicas]
+
+    def dispose(self) -> None:
+        for replica in self._replicas:
+            replica.engine.dispose()
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "fallbacks_to_primary": self.fallbacks,
+                "replicas": [
+                    {
+                        "url": r.name,
+                        "healthy": not r.ejected_until,
+                        "ejected_for_s": round(max(r.ejected_until - now, 0.0), 1),
+                        "consecutive_failures": r.failures,
+                        "ejections": r.ejections,
+                        "reads": r.reads,
+                    }
+                    for r in self._replicas
+                ],
+            }
+
+# ==========================================
+# LECTURA DE LO PROPIO (Stickiness)
+# ==========================================
+
+def client_key(headers, client) -> str:
+    """
+    Identifica al cliente: su token (hash) si viene autenticado; si no, su IP.
+    `headers` es un Mapping (Request.headers / Headers(scope=...)).
+    """
+    authorization = headers.get("authorization")
+    if authorization:
+        return "token:" + hashlib.sha1(authorization.encode()).hexdigest()
+    return "ip:" + (client[0] if client else "desconocido")
+
+class StickyClients:
+    """Clientes que escribieron recientemente (LRU acotado, en memoria)."""
+
+    def __init__(self, window_seconds: float, max_clients: int):
+        self.window_seconds = window_seconds
+        self.max_clients = max_clients
+        self._until: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark(self, key: str) -> float:
+        """Registra una escritura; devuelve el fin de la ventana (epoch)."""
+        until = time.time() + self.window_seconds
+        with self._lock:
+            self._until[key] = until
+            self._until.move_to_end(key)
+            while len(self._until) > self.max_clients:
+                self._until.popitem(last=False)
+        return until
+
+    def is_sticky(self, key: str, cookie: Optional[str] = None) -> bool:
+        now = time.time()
+        if cookie:
+            try:
+                # Se acota a la ventana: una cookie alterada no fija al cliente para siempre
+                if now < float(cookie) <= now + self.window_seconds:
+                    return True
+            except ValueError:
+                pass
+        with self._lock:
+            until = self._until.get(key)
+            if until is not None and until <= now:
+                del self._until[key]
+                return False
+        return until is not None
+
+class ReadYourWritesMiddleware:
+    """Tras una escritura con éxito (< 400), fija al cliente al primario."""
+
+    def __init__(self, app, sticky: StickyClients):
+        self.app = app
+        self.sticky = sticky
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in METODOS_LECTURA:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                key = client_key(Headers(scope=scope), scope.get("client"))
+                until = self.sticky.mark(key)
+                max_age = int(self.sticky.window_seconds) + 1
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{STICKY_COOKIE}={until:.3f}; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax"
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
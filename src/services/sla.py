@@ -0,0 +1,206 @@
+"""
+Tiempos de resolución (SLA) y antigüedad de tickets abiertos.
+
+- Al pasar un ticket a RESUELTO/CERRADO se fija FECHA_CIERRE_TICKET y se
+  suma 1 a la cubeta de su tiempo de resolución en HISTOGRAMAS_RESOLUCION
+  (por organización, zona y tipo), en la misma transacción que el cambio.
+  Si se reabre (o se transfiere), se resta de la cubeta en que se contó.
+- Los percentiles p50/p90/p99 se estiman sumando las filas del histograma e
+  interpolando dentro de la cubeta: el costo no depende del número de
+  tickets. Las cubetas crecen 25% cada una, así que el error relativo de la
+  estimación es menor a 25%.
+- La antigüedad de los abiertos sale de un solo GROUP BY sobre el índice
+  IX_TICKETS_ORG_ESTADO (sin ordenar ni traer tickets).
+
+Si se cambian BUCKET_BOUNDS_HOURS hay que reconstruir los histogramas:
+    python -m src.tools.sla_rebuild
+"""
+import bisect
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import contadores
+
+ESTADOS_CERRADOS = (models.EstadoTicket.RESUELTO, models.EstadoTicket.CERRADO)
+PERCENTILES = (50, 90, 99)
+
+# Límites superiores de cada cubeta en horas: 15 min * 1.25^i hasta ~2 años.
+# La última cubeta (índice len(BUCKET_BOUNDS_HOURS)) recibe todo lo mayor.
+BUCKET_BOUNDS_HOURS = [0.25 * 1.25 ** i for i in range(51)]
+
+# (etiqueta, días máximos) de la antigüedad de tickets abiertos; el resto cae en la última
+AGING_BUCKETS = [("0-1d", 1), ("1-3d", 3), ("3-7d", 7), ("7-14d", 14), ("14-30d", 30)]
+AGING_OVERFLOW = ">30d"
+AGING_LABELS = [label for label, _ in AGING_BUCKETS] + [AGING_OVERFLOW]
+
+def _utc_naive(value: datetime) -> datetime:
+    # La BD guarda UTC; MySQL y SQLite devuelven fechas sin zona
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def bucket_of(hours: float) -> int:
+    return bisect.bisect_left(BUCKET_BOUNDS_HOURS, max(hours, 0.0))
+
+def _resolution_bucket(creado: Optional[datetime], cierre: datetime) -> int:
+    if creado is None:
+        return 0
+    return bucket_of((_utc_naive(cierre) - _utc_naive(creado)).total_seconds() / 3600)
+
+# ==========================================
+# MANTENIMIENTO INCREMENTAL
+# ==========================================
+
+def _upsert_increment(db: Session, ticket: models.Ticket, cubeta: int, delta: int) -> None:
+    contadores.upsert_increment(db, models.HistogramaResolucion, {
+        "id_organizacion_histograma": ticket.id_organizacion_ticket,
+        "id_zona_histograma": ticket.id_zona_ticket or 0,
+        "tipo_incidente_histograma": ticket.tipo_incidente_ticket,
+        "cubeta_histograma": cubeta,
+    }, {"conteo_histograma": delta})
+
+def track_state_change(db: Session, ticket: models.Ticket, estado_anterior: Optional[models.EstadoTicket]) -> None:
+    """
+    Llamar después de cambiar ticket.estado_ticket y antes de cambiarle la
+    organización (la cubeta a restar es la de la organización que lo cerró).
+    No confirma: el histograma cambia solo si la transacción se confirma.
+    """
+    cerrado_antes = estado_anterior in ESTADOS_CERRADOS
+    cerrado_ahora = ticket.estado_ticket in ESTADOS_CERRADOS
+    if cerrado_antes == cerrado_ahora:
+        return
+    if cerrado_ahora:
+        ticket.fecha_cierre_ticket = datetime.now(timezone.utc).replace(tzinfo=None)
+        _upsert_increment(db, ticket, _resolution_bucket(ticket.fecha_creacion_ticket, ticket.fecha_cierre_ticket), 1)
+    else:
+        # Cerrados antes de que existiera FECHA_CIERRE no se contaron
+        if ticket.fecha_cierre_ticket is not None:
+            _upsert_increment(db, ticket, _resolution_bucket(ticket.fecha_creacion_ticket, ticket.fecha_cierre_ticket), -1)
+        ticket.fecha_cierre_ticket = None
+
+def rebuild_histograms(conn: Connection, batch_size: int = 10000) -> int:
+    """
+    Recalcula HISTOGRAMAS_RESOLUCION desde los tickets cerrados, incluidos
+    los archivados (carga inicial, seed o cambio de cubetas). Recorre las
+    tablas una vez en streaming.
+    Devuelve el número de tickets contados. No confirma.
+    """
+    counts: Counter = Counter()
+    # Los tickets archivados siguen contando para el SLA
+    for T in (models.Ticket, models.TicketArchivado):
+        result = conn.execution_options(yield_per=batch_size).execute(
+            select(
+                T.id_organizacion_ticket, T.id_zona_ticket, T.tipo_incidente_ticket,
+                T.fecha_creacion_ticket, T.fecha_cierre_ticket,
+            ).where(T.estado_ticket.in_(ESTADOS_CERRADOS), T.fecha_cierre_ticket.isnot(None))
+        )
+        for org, zona, tipo, creado, cierre in result:
+            counts[(org, zona or 0, tipo, _resolution_bucket(creado, cierre))] += 1
+
+    table = models.HistogramaResolucion.__table__
+    conn.execute(delete(table))
+    rows = [
+        {"ID_ORGANIZACION_HISTOGRAMA": org, "ID_ZONA_HISTOGRAMA": zona, "TIPO_INCIDENTE_HISTOGRAMA": tipo,
+         "CUBETA_HISTOGRAMA": cubeta, "CONTEO_HISTOGRAMA": conteo}
+        for (org, zona, tipo, cubeta), conteo in counts.items()
+    ]
+    for i in range(0, len(rows), batch_size):
+        conn.execute(insert(table), rows[i:i + batch_size])
+    return sum(counts.values())
+
+# ==========================================
+# CONSULTA
+# ==========================================
+
+def estimate_percentiles(counts: Dict[int, int]) -> dict:
+    """{cubeta: conteo} -> {"total", "p50_horas", "p90_horas", "p99_horas"}."""
+    total = sum(counts.values())
+    result = {"total": total}
+    for p in PERCENTILES:
+        result[f"p{p}_horas"] = _percentile(counts, total, p) if total else None
+    return result
+
+def _percentile(counts: Dict[int, int], total: int, p: int) -> float:
+    rank = total * p / 100
+    acumulado = 0
+    for cubeta in sorted(counts):
+        conteo = counts[cubeta]
+        if conteo <= 0:
+            continue
+        if acumulado + conteo >= rank:
+            lower = BUCKET_BOUNDS_HOURS[cubeta - 1] if cubeta > 0 else 0.0
+            # Cubeta abierta (> ~2 años): se reporta su límite inferior
+            upper = BUCKET_BOUNDS_HOURS[cubeta] if cubeta < len(BUCKET_BOUNDS_HOURS) else lower
+            return round(lower + (upper - lower) * (rank - acumulado) / conteo, 2)
+        acumulado += conteo
+    return round(BUCKET_BOUNDS_HOURS[-1], 2)
+
+def _aging_counts(db: Session, org_id: int, now: datetime) -> List[tuple]:
+    """(zona, tipo, conteo por cubeta de antigüedad...) de los tickets abiertos de org_id."""
+    T = models.Ticket
+    columns, previous = [], None
+    for _, days in AGING_BUCKETS:
+        limit = now - timedelta(days=days)
+        condition = T.fecha_creacion_ticket >= limit
+        if previous is not None:
+            condition = condition & (T.fecha_creacion_ticket < previous)
+        columns.append(func.sum(case((condition, 1), else_=0)))
+        previous = limit
+    columns.append(func.sum(case((T.fecha_creacion_ticket < previous, 1), else_=0)))
+    return db.query(T.id_zona_ticket, T.tipo_incidente_ticket, *columns).filter(
+        T.id_organizacion_ticket == org_id,
+        T.estado_ticket.notin_(ESTADOS_CERRADOS)
+    ).group_by(T.id_zona_ticket, T.tipo_incidente_ticket).all()
+
+def _empty_aging() -> dict:
+    return dict.fromkeys(AGING_LABELS, 0)
+
+def _group(histograms: Dict[int, int], aging: dict, **keys) -> dict:
+    return {**keys, "resolucion": estimate_percentiles(histograms), "antiguedad_abiertos": aging}
+
+def sla_report(db: Session, org_id: int, now: Optional[datetime] = None) -> dict:
+    """Percentiles de resolución y antigüedad de abiertos: total, por zona y por tipo."""
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    H = models.HistogramaResolucion
+    rows = db.query(
+        H.id_zona_histograma, H.tipo_incidente_histograma, H.cubeta_histograma, H.conteo_histograma
+    ).filter(H.id_organizacion_histograma == org_id, H.conteo_histograma > 0).all()
+
+    hist_total: Dict[int, int] = Counter()
+    hist_zona: Dict[int, Counter] = defaultdict(Counter)
+    hist_tipo: Dict[str, Counter] = defaultdict(Counter)
+    for zona, tipo, cubeta, conteo in rows:
+        hist_total[cubeta] += conteo
+        hist_zona[zona][cubeta] += conteo
+        hist_tipo[tipo][cubeta] += conteo
+
+    aging_total = _empty_aging()
+    aging_zona: Dict[int, dict] = defaultdict(_empty_aging)
+    aging_tipo: Dict[str, dict] = defaultdict(_empty_aging)
+    for zona, tipo, *conteos in _aging_counts(db, org_id, now):
+        for label, conteo in zip(AGING_LABELS, conteos):
+            conteo = int(conteo or 0)
+            aging_total[label] += conteo
+            aging_zona[zona or 0][label] += conteo
+            aging_tipo[tipo][label] += conteo
+
+    return {
+        "total": _group(hist_total, aging_total),
+        "por_zona": [
+            _group(hist_zona.get(zona, {}), aging_zona.get(zona, _empty_aging()), id_zona=zona or None)
+            for zona in sorted(set(hist_zona) | set(aging_zona))
+        ],
+        "por_tipo": [
+            _group(hist_tipo.get(tipo, {}), aging_tipo.get(tipo, _empty_aging()), tipo_incidente=tipo)
+            for tipo in _sorted_tipos(set(hist_tipo) | set(aging_tipo))
+        ],
+    }
+
+def _sorted_tipos(tipos: Iterable) -> list:
+    return sorted(tipos, key=lambda tipo: getattr(tipo, "value", tipo))
@@ -1,15 +1,24 @@
 from azure.storage.blob import BlobServiceClient
 from fastapi import UploadFile, HTTPException
+from jose import JWTError, jwt
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote, urlencode
+import hashlib
+import hmac
+import re
+import time
 import uuid
 import os
+from .. import models
 from ..config import get_settings
 
-settings = get_settings()
-
 async def upload_image_to_azure(file: UploadFile) -> str:
     """
     Sube un archivo a Azure Blob Storage y retorna la URL pública.
     """
+    settings = get_settings()
     try:
         # 1. Validar extensión (básico)
         filename = file.filename
@@ -37,4 +46,306 @@ async def upload_image_to_azure(file: UploadFile) -> str:
 
     except Exception as e:
         print(f"Error subiendo a Azure: {e}")
-        raise HTTPException(status_code=500, detail="Error al procesar la imagen en el servidor")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Error al procesar la imagen en el servidor")
+
+# ==========================================
+# SUBIDAS DIRECTAS (URL FIRMADA)
+# ==========================================
+# El cliente sube el archivo directo al almacenamiento con una URL de corta
+# vigencia; la API solo firma la URL y, al terminar, verifica el objeto y
+# registra la Evidencia (ver /public/evidence/upload-url y /complete).
+
+# content-type -> (extensión, tipo de archivo)
+ALLOWED_UPLOAD_TYPES = {
+    "image/jpeg": (".jpg", models.TipoArchivo.IMAGEN),
+    "image/png": (".png", models.TipoArchivo.IMAGEN),
+    "video/mp4": (".mp4", models.TipoArchivo.VIDEO),
+}
+
+# evidencias/<id_ticket>/<uuid>.<ext>: lo genera la API, nunca el cliente
+BLOB_NAME_RE = re.compile(r"^evidencias/\d+/[0-9a-f]{32}\.(jpg|png|mp4)$")
+
+def new_blob_name(id_ticket: int, content_type: str) -> str:
+    ext, _ = ALLOWED_UPLOAD_TYPES[content_type]
+    return f"evidencias/{id_ticket}/{uuid.uuid4().hex}{ext}"
+
+class AzureBlobBackend:
+    """
+    URL con SAS de solo creación para un blob, sobre HTTPS: sirve para crear
+    el blob una vez y no para reemplazarlo, así que lo verificado al
+    completar queda fijo. Azure no limita el tamaño de un PUT con SAS: el
+    tamaño y el content-type se verifican al completar (y el blob se borra
+    si no cumplen); los que nunca se completan los borra purge_orphan_blobs.
+    """
+
+    def __init__(self, connection_string: str, container: str):
+        self._service = BlobServiceClient.from_connection_string(connection_string)
+        self.container = container
+
+    def _blob(self, blob_name: str):
+        return self._service.get_blob_client(container=self.container, blob=blob_name)
+
+    def presign_put(self, blob_name: str, content_type: str, max_bytes: int, expires: datetime) -> Tuple[str, dict]:
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+        credential = self._service.credential
+        sas = generate_blob_sas(
+            account_name=credential.account_name,
+            container_name=self.container,
+            blob_name=blob_name,
+            account_key=credential.account_key,
+            # Sin write: con él la SAS permitiría sobrescribir el blob ya verificado
+            permission=BlobSasPermissions(create=True),
+            expiry=expires,
+            protocol="https",
+        )
+        headers = {"x-ms-blob-type": "BlockBlob", "Content-Type": content_type}
+        return f"{self._blob(blob_name).url}?{sas}", headers
+
+    def public_url(self, blob_name: str) -> str:
+        return self._blob(blob_name).url
+
+    def stat(self, blob_name: str) -> Optional[Tuple[int, str]]:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            props = self._blob(blob_name).get_blob_properties()
+        except ResourceNotFoundError:
+            return None
+        return props.size, props.content_settings.content_type
+
+    def delete(self, blob_name: str) -> None:
+        self._blob(blob_name).delete_blob()
+
+    def list_blobs(self, prefix: str) -> Iterator[Tuple[str, datetime]]:
+        """(nombre, última modificación en UTC sin zona) de los blobs con ese prefijo."""
+        container = self._service.get_container_client(self.container)
+        for props in container.list_blobs(name_starts_with=prefix):
+            yield props.name, props.last_modified.astimezone(timezone.utc).replace(tzinfo=None)
+
+    # --- Subidas reanudables: cada parte es un bloque sin confirmar ---
+
+    @staticmethod
+    def _block_id(offset: int) -> str:
+        # Los IDs de un blob deben medir lo mismo (el SDK los pasa a base64).
+        # Reintentar una parte en el mismo offset reemplaza su bloque.
+        return f"{offset:016d}"
+
+    def write_chunk(self, blob_name: str, offset: int, data: bytes) -> None:
+        self._blob(blob_name).stage_block(block_id=self._block_id(offset), data=data, length=len(data))
+
+    def finish_chunks(self, blob_name: str, content_type: str, total: int) -> None:
+        """Confirma los bloques en orden de offset: Azure arma el blob sin releerlos."""
+        from azure.storage.blob import BlobBlock, ContentSettings
+
+        blob = self._blob(blob_name)
+        committed, uncommitted = blob.get_block_list("all")
+        # Un reintento tras un fallo al registrar puede encontrar bloques ya confirmados
+        sizes = {block.id: block.size for block in committed}
+        sizes.update({block.id: block.size for block in uncommitted})
+        blocks, offset = [], 0
+        while offset < total:
+            block_id = self._block_id(offset)
+            if block_id not in sizes:
+                raise ValueError(f"Falta la parte en el offset {offset} de {blob_name}")
+            blocks.append(BlobBlock(block_id=block_id))
+            offset += sizes[block_id]
+        if offset != total:
+            raise ValueError(f"Las partes de {blob_name} suman {offset} bytes, se esperaban {total}")
+        blob.commit_block_list(blocks, content_settings=ContentSettings(content_type=content_type))
+
+    def abort_chunks(self, blob_name: str) -> None:
+        # Azure descarta solo los bloques sin confirmar a los 7 días
+        pass
+
+class LocalFileBackend:
+    """
+    Equivalente local (desarrollo): la "URL firmada" apunta a
+    PUT /public/evidence/local/{blob} con expiración, content-type y tamaño
+    máximo firmados con HMAC; el archivo se guarda en LOCAL_STORAGE_DIR.
+    """
+
+    ROUTE = "/public/evidence/local/"
+
+    def __init__(self, directory: str, public_url: str, secret: str):
+        self.directory = os.path.abspath(directory)
+        self.public_prefix = public_url.rstrip("/") + self.ROUTE
+        self._secret = secret.encode()
+
+    def _signature(self, blob_name: str, expires: int, content_type: str, max_bytes: int) -> str:
+        message = f"{blob_name}\n{expires}\n{content_type}\n{max_bytes}".encode()
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def presign_put(self, blob_name: str, content_type: str, max_bytes: int, expires: datetime) -> Tuple[str, dict]:
+        exp = int(expires.timestamp())
+        query = urlencode({
+            "exp": exp, "ct": content_type, "max": max_bytes,
+            "sig": self._signature(blob_name, exp, content_type, max_bytes),
+        })
+        return f"{self.public_url(blob_name)}?{query}", {"Content-Type": content_type}
+
+    def verify(self, blob_name: str, exp: int, content_type: str, max_bytes: int, sig: str) -> bool:
+        if not BLOB_NAME_RE.match(blob_name) or exp < time.time():
+            return False
+        return hmac.compare_digest(sig, self._signature(blob_name, exp, content_type, max_bytes))
+
+    def public_url(self, blob_name: str) -> str:
+        return self.public_prefix + quote(blob_name)
+
+    def path(self, blob_name: str) -> str:
+        if not BLOB_NAME_RE.match(blob_name):
+            raise ValueError(f"Nombre de objeto inválido: {blob_name!r}")
+        return os.path.join(self.directory, *blob_name.split("/"))
+
+    def stat(self, blob_name: str) -> Optional[Tuple[int, str]]:
+        try:
+            size = os.path.getsize(self.path(blob_name))
+        except OSError:
+            return None
+        ext = os.path.splitext(blob_name)[1]
+        content_type = next(ct for ct, (e, _) in ALLOWED_UPLOAD_TYPES.items() if e == ext)
+        return size, content_type
+
+    def delete(self, blob_name: str) -> None:
+        try:
+            os.remove(self.path(blob_name))
+        except FileNotFoundError:
+            pass
+
+    def list_blobs(self, prefix: str) -> Iterator[Tuple[str, datetime]]:
+        """Como en Azure; los .part de las subidas reanudables no son objetos."""
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                full = os.path.join(root, filename)
+                blob_name = os.path.relpath(full, self.directory).replace(os.sep, "/")
+                if blob_name.startswith(prefix) and BLOB_NAME_RE.match(blob_name):
+                    yield blob_name, datetime.fromtimestamp(os.path.getmtime(full), timezone.utc).replace(tzinfo=None)
+
+    # --- Subidas reanudables: las partes se escriben en <archivo>.part ---
+
+    def _partial_path(self, blob_name: str) -> str:
+        return self.path(blob_name) + ".part"
+
+    def write_chunk(self, blob_name: str, offset: int, data: bytes) -> None:
+        partial = self._partial_path(blob_name)
+        os.makedirs(os.path.dirname(partial), exist_ok=True)
+        # Sin truncate: la escritura ocurre antes de confirmar el offset, y una
+        # parte tardía que pierde esa confirmación no debe cortar lo que ya se
+        # guardó después de ella. Lo que sobre se reescribe con las partes
+        # siguientes (nunca pasa del tamaño declarado)
+        with open(partial, "r+b" if os.path.exists(partial) else "wb") as fh:
+            fh.seek(offset)
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def finish_chunks(self, blob_name: str, content_type: str, total: int) -> None:
+        """Renombra el archivo parcial (no se vuelve a leer)."""
+        partial, path = self._partial_path(blob_name), self.path(blob_name)
+        if not os.path.exists(partial) and os.path.exists(path):
+            size = os.path.getsize(path)  # Reintento: ya se había renombrado
+        else:
+            size = os.path.getsize(partial)
+        if size != total:
+            raise ValueError(f"{blob_name} tiene {size} bytes, se esperaban {total}")
+        if os.path.exists(partial):
+            os.replace(partial, path)
+
+    def abort_chunks(self, blob_name: str) -> None:
+        try:
+            os.remove(self._partial_path(blob_name))
+        except FileNotFoundError:
+            pass
+
+@lru_cache()
+def get_storage_backend():
+    settings = get_settings()
+    if settings.STORAGE_BACKEND == "local":
+        return LocalFileBackend(settings.LOCAL_STORAGE_DIR, settings.LOCAL_STORAGE_PUBLIC_URL, settings.SECRET_KEY)
+    if settings.STORAGE_BACKEND == "azure":
+        return AzureBlobBackend(settings.AZURE_CONNECTION_STRING, settings.AZURE_CONTAINER_NAME)
+    raise ValueError(f"STORAGE_BACKEND desconocido: {settings.STORAGE_BACKEND!r} (azure | local)")
+
+def upload_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=get_settings().UPLOAD_URL_TTL_SECONDS)
+
+# --- Token de subida: liga la URL firmada con el aviso de término ---
+
+UPLOAD_TOKEN_TYPE = "subida_evidencia"
+
+def create_upload_token(blob_name: str, id_ticket: int, device: str, content_type: str, max_bytes: int,
+                        expires: datetime) -> str:
+    settings = get_settings()
+    # El aviso de término puede llegar después de que venza la URL (subida lenta)
+    exp = expires + timedelta(seconds=settings.UPLOAD_URL_TTL_SECONDS)
+    claims = {
+        "tipo": UPLOAD_TOKEN_TYPE, "blob": blob_name, "id_ticket": id_ticket,
+        "dev": device, "ct": content_type, "max": max_bytes, "exp": exp,
+    }
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def decode_upload_token(token: str) -> Optional[dict]:
+    settings = get_settings()
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return claims if claims.get("tipo") == UPLOAD_TOKEN_TYPE else None
+
+def purge_orphan_blobs(db, now: Optional[datetime] = None, batch_size: int = 500) -> int:
+    """
+    Borra los objetos de evidencias/ que nunca se completaron: sin Evidencia
+    que los use ni subida reanudable vigente, y más viejos que la vigencia
+    del token de subida (URL + aviso de término). No confirma (solo lee).
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    limite = now - timedelta(seconds=2 * get_settings().UPLOAD_URL_TTL_SECONDS)
+    backend = get_storage_backend()
+    viejos = [name for name, modified in backend.list_blobs("evidencias/") if modified < limite]
+
+    borrados = 0
+    for i in range(0, len(viejos), batch_size):
+        lote = viejos[i:i + batch_size]
+        urls = {backend.public_url(name): name for name in lote}
+        usados = {
+            urls[url] for (url,) in db.query(models.Evidencia.url_evidencia).filter(
+                models.Evidencia.url_evidencia.in_(list(urls))
+            )
+        }
+        S = models.SubidaEvidencia
+        usados.update(blob for (blob,) in db.query(S.blob_subida).filter(S.blob_subida.in_(lote)))
+        for name in lote:
+            if name not in usados:
+                backend.delete(name)
+                borrados += 1
+    return borrados
+
+# ==========================================
+# SUBIDAS REANUDABLES (POR PARTES)
+# ==========================================
+# Estilo tus: POST crea la sesión, HEAD devuelve el offset guardado y cada
+# PATCH agrega una parte de hasta UPLOAD_CHUNK_MAX_BYTES en ese offset. Si la
+# conexión se corta, solo se pierde la parte en curso. La última parte
+# confirma el archivo en el almacenamiento (bloques de Azure o renombrado
+# local, sin releer los datos) y registra la Evidencia.
+
+OFFSET_CONTENT_TYPE = "application/offset+octet-stream"
+
+def new_upload_id() -> str:
+    return uuid.uuid4().hex
+
+def resumable_expiry() -> datetime:
+    seconds = get_settings().UPLOAD_RESUMABLE_TTL_SECONDS
+    return datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=seconds)
+
+def purge_expired_uploads(db, now: Optional[datetime] = None) -> int:
+    """Borra las sesiones vencidas sin completar y sus partes. Confirma."""
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    S = models.SubidaEvidencia
+    vencidas = db.query(S).filter(S.fecha_expira_subida < now, S.id_evidencia_subida.is_(None)).all()
+    backend = get_storage_backend()
+    for subida in vencidas:
+        backend.abort_chunks(subida.blob_subida)
+        db.delete(subida)
+    db.commit()
+    return len(vencidas)
@@ -0,0 +1,190 @@
+"""
+Sincronización incremental para la app móvil (/public/sync/{uuid}).
+
+- Cada flush que crea, modifica o borra una Zona o un Ticket agrega una
+  fila a CAMBIOS_SYNC en la misma transacción (evento de sesión). Los
+  borrados masivos que no pasan por el ORM (archivo) la agregan ellos
+  mismos con record_ticket_deletions.
+- El token del cliente es el último ID_CAMBIO que recibió. Una
+  sincronización con token lee solo los cambios posteriores de su
+  dispositivo y los globales (zonas) por el índice
+  IX_CAMBIOS_SYNC_DISPOSITIVO y luego las filas actuales de lo que cambió:
+  el costo depende del número de cambios, no del historial.
+- Un ID_CAMBIO se asigna al insertar, pero se hace visible al confirmar:
+  un cambio con ID menor todavía sin confirmar no debe quedar atrás del
+  token. Por eso solo se entregan cambios con más de SYNC_GRACE_SECONDS y
+  la lectura se detiene en el primero más reciente.
+- Sin token, con uno ilegible o más viejo que SYNC_LOG_RETENTION_DAYS, la
+  respuesta es la lista completa (como /zonas + /tickets/status).
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import get_settings
+
+GLOBAL_DEVICE = "*"
+
+# ==========================================
+# REGISTRO DE CAMBIOS (Eventos de sesión)
+# ==========================================
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _change(obj, operacion: models.OperacionSync, now: datetime) -> Optional[dict]:
+    if isinstance(obj, models.Ticket):
+        entidad, id_entidad, dispositivo = models.EntidadSync.TICKET, obj.id_ticket, obj.id_usuario_reporte_ticket
+    elif isinstance(obj, models.Zona):
+        entidad, id_entidad, dispositivo = models.EntidadSync.ZONA, obj.id_zona, GLOBAL_DEVICE
+    else:
+        return None
+    return {
+        "ENTIDAD_CAMBIO": entidad, "ID_ENTIDAD_CAMBIO": id_entidad, "DISPOSITIVO_CAMBIO": dispositivo,
+        "OPERACION_CAMBIO": operacion, "FECHA_CAMBIO": now,
+    }
+
+@event.listens_for(Session, "after_flush")
+def _record_on_flush(session, flush_context):
+    # En after_flush los objetos nuevos ya tienen ID y new/dirty/deleted
+    # todavía reflejan lo que se escribió
+    now = _utcnow()
+    rows = [_change(obj, models.OperacionSync.GUARDADO, now) for obj in session.new]
+    rows += [
+        _change(obj, models.OperacionSync.GUARDADO, now)
+        for obj in session.dirty if session.is_modified(obj, include_collections=False)
+    ]
+    rows += [_change(obj, models.OperacionSync.ELIMINADO, now) for obj in session.deleted]
+    rows = [row for row in rows if row is not None]
+    if rows:
+        session.connection().execute(insert(models.CambioSync.__table__), rows)
+
+def record_ticket_deletions(db: Session, where) -> None:
+    """INSERT ... SELECT de un ELIMINADO por cada ticket que cumple `where` (borrados masivos)."""
+    tickets = models.Ticket.__table__
+    db.execute(insert(models.CambioSync.__table__).from_select(
+        ["ENTIDAD_CAMBIO", "ID_ENTIDAD_CAMBIO", "DISPOSITIVO_CAMBIO", "OPERACION_CAMBIO", "FECHA_CAMBIO"],
+        select(
+            literal(models.EntidadSync.TICKET.value), tickets.c.ID_TICKET, tickets.c.ID_USUARIO_REPORTE_TICKET,
+            literal(models.OperacionSync.ELIMINADO.value), literal(_utcnow(), models.CambioSync.fecha_cambio.type),
+        ).where(where)
+    ))
+
+# ==========================================
+# TOKEN
+# ==========================================
+# "<último ID_CAMBIO>-<epoch de emisión>": la fecha permite saber si los
+# cambios posteriores al token siguen en la tabla.
+
+def encode_token(id_cambio: int, issued_at: datetime) -> str:
+    return f"{id_cambio}-{int(issued_at.replace(tzinfo=timezone.utc).timestamp())}"
+
+def decode_token(token: Optional[str], now: datetime) -> Optional[int]:
+    """ID_CAMBIO del token, o None si hace falta la lista completa."""
+    if not token:
+        return None
+    seq, _, issued = token.partition("-")
+    try:
+        seq, issued = int(seq), int(issued)
+    except ValueError:
+        return None
+    retention = timedelta(days=get_settings().SYNC_LOG_RETENTION_DAYS)
+    if datetime.fromtimestamp(issued, timezone.utc).replace(tzinfo=None) < now - retention:
+        return None
+    return seq
+
+# ==========================================
+# LECTURA
+# ==========================================
+
+def latest_change_id(db: Session, watermark: datetime) -> int:
+    """Último ID_CAMBIO entregable (para el token de una lista completa)."""
+    C = models.CambioSync
+    return db.query(func.max(C.id_cambio)).filter(C.fecha_cambio <= watermark).scalar() or 0
+
+def changes_since(db: Session, device: str, since: int, watermark: datetime, limit: int) -> Tuple[list, int, bool]:
+    """
+    Cambios del dispositivo (y globales) posteriores a `since`, reducidos al
+    último por entidad. Devuelve (cambios, nuevo token, hay_mas).
+    """
+    C = models.CambioSync
+    rows = db.query(C.id_cambio, C.entidad_cambio, C.id_entidad_cambio, C.operacion_cambio, C.fecha_cambio).filter(
+        C.dispositivo_cambio.in_((device, GLOBAL_DEVICE)),
+        C.id_cambio > since
+    ).order_by(C.id_cambio).limit(limit + 1).all()
+
+    latest = {}
+    last = since
+    for id_cambio, entidad, id_entidad, operacion, fecha in rows[:limit]:
+        if fecha > watermark:
+            # Lo que sigue puede tener detrás un cambio aún sin confirmar:
+            # se entrega en la próxima sincronización
+            return list(latest.values()), last, False
+        latest[(entidad, id_entidad)] = (entidad, id_entidad, operacion)
+        last = id_cambio
+    return list(latest.values()), last, len(rows) > limit
+
+def build_sync(db: Session, device: str, token: Optional[str], zonas_catalogo) -> dict:
+    """Respuesta de /public/sync: lista completa o solo lo que cambió desde `token`."""
+    settings = get_settings()
+    now = _utcnow()
+    watermark = now - timedelta(seconds=settings.SYNC_GRACE_SECONDS)
+    since = decode_token(token, now)
+
+    if since is None:
+        T = models.Ticket
+        last = latest_change_id(db, watermark)
+        tickets = db.query(T).filter(T.id_usuario_reporte_ticket == device).order_by(
+            T.fecha_creacion_ticket.desc()
+        ).all()
+        return {
+            "token": encode_token(last, now), "completo": True, "hay_mas": False,
+            "zonas": zonas_catalogo.get(db), "zonas_eliminadas": [],
+            "tickets": tickets, "tickets_eliminados": [],
+        }
+
+    cambios, last, hay_mas = changes_since(db, device, since, watermark, settings.SYNC_MAX_CHANGES)
+    ids = {entidad: [] for entidad in models.EntidadSync}
+    eliminados = {entidad: set() for entidad in models.EntidadSync}
+    for entidad, id_entidad, operacion in cambios:
+        if operacion == models.OperacionSync.ELIMINADO:
+            eliminados[entidad].add(id_entidad)
+        else:
+            ids[entidad].append(id_entidad)
+
+    zonas: List[models.Zona] = []
+    if ids[models.EntidadSync.ZONA]:
+        zonas = db.query(models.Zona).filter(models.Zona.id_zona.in_(ids[models.EntidadSync.ZONA])).all()
+    tickets: List[models.Ticket] = []
+    if ids[models.EntidadSync.TICKET]:
+        T = models.Ticket
+        tickets = db.query(T).filter(
+            T.id_ticket.in_(ids[models.EntidadSync.TICKET]), T.id_usuario_reporte_ticket == device
+        ).all()
+    # Guardados que ya no existen (borrados después) cuentan como eliminados
+    eliminados[models.EntidadSync.ZONA] |= set(ids[models.EntidadSync.ZONA]) - {z.id_zona for z in zonas}
+    eliminados[models.EntidadSync.TICKET] |= set(ids[models.EntidadSync.TICKET]) - {t.id_ticket for t in tickets}
+
+    return {
+        "token": encode_token(last, now), "completo": False, "hay_mas": hay_mas,
+        "zonas": zonas, "zonas_eliminadas": sorted(eliminados[models.EntidadSync.ZONA]),
+        "tickets": tickets, "tickets_eliminados": sorted(eliminados[models.EntidadSync.TICKET]),
+    }
+
+# ==========================================
+# DEPURACIÓN
+# ==========================================
+
+def prune_changes(db: Session, retention_days: int) -> int:
+    """
+    Borra cambios con más de `retention_days` (+1 día de margen sobre la
+    vigencia de los tokens). Confirma.
+    """
+    C = models.CambioSync
+    cutoff = _utcnow() - timedelta(days=retention_days + 1)
+    deleted = db.execute(delete(C).where(C.fecha_cambio < cutoff), execution_options={"synchronize_session": False}).rowcount
+    db.commit()
+    return deleted
@@ -0,0 +1,361 @@
+"""
+Cola de tareas en segundo plano con entrega al-menos-una-vez (patrón outbox).
+
+Flujo:
+1. El endpoint llama a enqueue_task(db, tipo, payload) y hace su commit
+   normal: la tarea (fila de TAREAS_OUTBOX) se confirma junto con el dato.
+2. Tras el commit, la tarea se ofrece a la cola en memoria del worker para
+   procesarse de inmediato.
+3. Un pool acotado de TASK_WORKERS corrutinas toma cada tarea (UPDATE
+   condicional, así dos procesos no la ejecutan a la vez) y corre su
+   manejador en un hilo.
+4. Si el manejador falla, la tarea se reprograma con backoff exponencial;
+   tras TASK_MAX_ATTEMPTS queda FALLIDA.
+5. Un sondeo periódico recoge lo que la cola en memoria no vio: reintentos,
+   tareas de otros workers, tareas perdidas por un reinicio y tareas cuyo
+   plazo EN_PROCESO (TASK_LEASE_SECONDS) venció.
+
+Los manejadores deben ser idempotentes: una tarea puede ejecutarse más de
+una vez (p. ej. si el proceso muere después de ejecutarla y antes de
+marcarla COMPLETADA).
+"""
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, event, inspect, or_
+from sqlalchemy.orm import Session
+
+from .. import database, models
+from ..config import get_settings
+from .duplicados import detect_duplicate
+from .metrics import Histogram, render_histogram, render_sample
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Session, dict], None]
+_HANDLERS: Dict[str, Handler] = {}
+
+def task_handler(tipo: str):
+    """
+    Registra la función que procesa las tareas de `tipo`. Recibe la sesión y
+    el payload; no debe hacer commit (la cola confirma su trabajo junto con
+    el cierre de la tarea).
+    """
+    def decorator(func: Handler) -> Handler:
+        _HANDLERS[tipo] = func
+        return func
+    return decorator
+
+def _utcnow() -> datetime:
+    # Naive en UTC: las columnas DateTime del outbox no guardan zona horaria
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+_NUEVAS_KEY = "tareas_nuevas"
+
+def enqueue_task(db: Session, tipo: str, payload: dict) -> models.TareaOutbox:
+    """
+    Agrega la tarea a la sesión. Se confirma (o se descarta) con el commit
+    (o rollback) del llamador; tras el commit se despacha sin esperar al sondeo.
+    """
+    tarea = models.TareaOutbox(
+        tipo_tarea=tipo,
+        payload_tarea=json.dumps(payload),
+        estado_tarea=models.EstadoTarea.PENDIENTE,
+        intentos_tarea=0,
+        proximo_intento_tarea=_utcnow(),
+    )
+    db.add(tarea)
+    db.info.setdefault(_NUEVAS_KEY, []).append(tarea)
+    get_task_queue().metrics.incr("enqueued")
+    return tarea
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_on_commit(session):
+    tareas = session.info.pop(_NUEVAS_KEY, None)
+    if not tareas:
+        return
+    queue = get_task_queue()
+    for tarea in tareas:
+        # identity no recarga el objeto (el commit lo dejó expirado)
+        identity = inspect(tarea).identity
+        if identity:
+            queue.notify(identity[0])
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_NUEVAS_KEY, None)
+
+# ==========================================
+# MÉTRICAS
+# ==========================================
+
+class TaskMetrics:
+    def __init__(self):
+        self.enqueued = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.lost_claims = 0      # Otra ejecución ya había tomado la tarea
+        self.duration = Histogram()
+        self._lock = threading.Lock()
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, queue_depth: int) -> dict:
+        return {
+            "enqueued_total": self.enqueued,
+            "completed_total": self.completed,
+            "retried_total": self.retried,
+            "failed_total": self.failed,
+            "lost_claims_total": self.lost_claims,
+            "queue_depth": queue_depth,
+            "duration_seconds": self.duration.snapshot(),
+        }
+
+# ==========================================
+# COLA Y WORKERS
+# ==========================================
+
+class TaskQueue:
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        poll_seconds: float,
+        poll_batch: int,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        lease_seconds: float,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.poll_seconds = poll_seconds
+        self.poll_batch = poll_batch
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.metrics = TaskMetrics()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued = set()     # IDs en la cola (el sondeo no los repite)
+        self._tasks: List[asyncio.Task] = []
+
+    # --- Ciclo de vida (lifespan) ---
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._poll_loop()))
+
+    async def stop(self, timeout: float) -> None:
+        """Espera hasta `timeout` a que se vacíe la cola; lo pendiente sigue en el outbox."""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Cola de tareas detenida con %d pendientes", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._loop = self._queue = None
+        self._queued.clear()
+        self._tasks = []
+
+    # --- Despacho ---
+
+    def notify(self, task_id: int) -> None:
+        """Ofrece una tarea recién confirmada (seguro desde cualquier hilo)."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # Sin cola en este proceso: la recoge el sondeo
+        try:
+            loop.call_soon_threadsafe(self._offer, task_id)
+        except RuntimeError:
+            pass  # El loop se está cerrando (apagado)
+
+    def _offer(self, task_id: int) -> None:
+        if self._queue is None or task_id in self._queued:
+            return
+        try:
+            self._queue.put_nowait(task_id)
+            self._queued.add(task_id)
+        except asyncio.QueueFull:
+            pass  # Contrapresión: la tarea ya está en el outbox, el sondeo la recoge
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                due = await asyncio.to_thread(self._due_ids)
+                for task_id in due:
+                    if task_id not in self._queued:
+                        self._queued.add(task_id)
+                        await self._queue.put(task_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error sondeando el outbox de tareas")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def _worker(self) -> None:
+        while True:
+            task_id = await self._queue.get()
+            self._queued.discard(task_id)
+            try:
+                await asyncio.to_thread(self.run_task, task_id)
+            except Exception:
+                logger.exception("Error inesperado procesando la tarea %s", task_id)
+            finally:
+                self._queue.task_done()
+
+    # --- Acceso a BD (en hilos) ---
+
+    @staticmethod
+    def _due_filter(now: datetime):
+        T = models.TareaOutbox
+        return or_(
+            and_(T.estado_tarea == models.EstadoTarea.PENDIENTE, T.proximo_intento_tarea <= now),
+            and_(T.estado_tarea == models.EstadoTarea.EN_PROCESO, T.bloqueada_hasta_tarea < now),
+        )
+
+    def _due_ids(self) -> List[int]:
+        database.get_engine()
+        db = database.SessionLocal()
+        try:
+            rows = db.query(models.TareaOutbox.id_tarea).filter(
+                self._due_filter(_utcnow())
+            ).order_by(models.TareaOutbox.proximo_intento_tarea).limit(self.poll_batch).all()
+            return [row.id_tarea for row in rows]
+        finally:
+            db.close()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)  # Jitter: evita reintentos sincronizados
+
+    def run_task(self, task_id: int) -> Optional[bool]:
+        """
+        Toma y ejecuta una tarea. Devuelve True/False según el resultado, o
+        None si no estaba vencida o ya la tomó otra ejecución.
+        """
+        T = models.TareaOutbox
+        database.get_engine()
+        db = database.SessionLocal()
+        try:
+            now = _utcnow()
+            claimed = db.query(T).filter(T.id_tarea == task_id, self._due_filter(now)).update(
+                {
+                    T.estado_tarea: models.EstadoTarea.EN_PROCESO,
+                    T.intentos_tarea: T.intentos_tarea + 1,
+                    T.bloqueada_hasta_tarea: now + timedelta(seconds=self.lease_seconds),
+                },
+                synchronize_session=False
+            )
+            db.commit()
+            if not claimed:
+                self.metrics.incr("lost_claims")
+                return None
+
+            tarea = db.get(T, task_id)
+            tipo, attempts = tarea.tipo_tarea, tarea.intentos_tarea
+            handler = _HANDLERS.get(tipo)
+            start = time.perf_counter()
+            try:
+                if handler is None:
+                    raise LookupError(f"Sin manejador para tareas '{tipo}'")
+                handler(db, json.loads(tarea.payload_tarea))
+                db.flush()
+            except Exception as e:
+                db.rollback()
+                self._record_failure(db, task_id, tipo, attempts, e, permanent=handler is None)
+                return False
+            finally:
+                self.metrics.duration.observe(time.perf_counter() - start)
+
+            # El resultado del manejador y el cierre de la tarea se confirman juntos
+            tarea.estado_tarea = models.EstadoTarea.COMPLETADA
+            tarea.fecha_completada_tarea = _utcnow()
+            tarea.bloqueada_hasta_tarea = None
+            tarea.ultimo_error_tarea = None
+            db.commit()
+            self.metrics.incr("completed")
+            return True
+        finally:
+            db.close()
+
+    def _record_failure(self, db: Session, task_id: int, tipo: str, attempts: int, error: Exception, permanent: bool):
+        tarea = db.get(models.TareaOutbox, task_id)
+        tarea.ultimo_error_tarea = f"{type(error).__name__}: {error}"[:2000]
+        tarea.bloqueada_hasta_tarea = None
+        if permanent or attempts >= self.max_attempts:
+            tarea.estado_tarea = models.EstadoTarea.FALLIDA
+            self.metrics.incr("failed")
+            logger.error("Tarea %s (%s) FALLIDA tras %d intentos: %s", task_id, tipo, attempts, error)
+        else:
+            tarea.estado_tarea = models.EstadoTarea.PENDIENTE
+            tarea.proximo_intento_tarea = _utcnow() + timedelta(seconds=self._backoff(attempts))
+            self.metrics.incr("retried")
+            logger.warning("Tarea %s (%s) falló (intento %d), se reintenta: %s", task_id, tipo, attempts, error)
+        db.commit()
+
+    # --- Observabilidad ---
+
+    def stats(self) -> dict:
+        return self.metrics.snapshot(self._queue.qsize() if self._queue is not None else 0)
+
+    def render_prometheus(self) -> list:
+        snap = self.stats()
+        lines = []
+        for key in ("enqueued_total", "completed_total", "retried_total", "failed_total", "lost_claims_total"):
+            lines += [f"# TYPE tasks_{key} counter", render_sample(f"tasks_{key}", snap[key])]
+        lines += ["# TYPE tasks_queue_depth gauge", render_sample("tasks_queue_depth", snap["queue_depth"])]
+        lines.append("# TYPE tasks_duration_seconds histogram")
+        lines += render_histogram("tasks_duration_seconds", self.metrics.duration)
+        return lines
+
+@lru_cache()
+def get_task_queue() -> TaskQueue:
+    settings = get_settings()
+    return TaskQueue(
+        workers=settings.TASK_WORKERS,
+        max_queue=settings.TASK_QUEUE_SIZE,
+        poll_seconds=settings.TASK_POLL_SECONDS,
+        poll_batch=settings.TASK_POLL_BATCH,
+        max_attempts=settings.TASK_MAX_ATTEMPTS,
+        backoff_base=settings.TASK_BACKOFF_BASE_SECONDS,
+        backoff_max=settings.TASK_BACKOFF_MAX_SECONDS,
+        lease_seconds=settings.TASK_LEASE_SECONDS,
+    )
+
+# ==========================================
+# MANEJADORES
+# ==========================================
+
+@task_handler("ticket_creado")
+def _on_ticket_creado(db: Session, payload: dict) -> None:
+    """
+    Post-proceso de un reporte ciudadano, fuera de la petición. Aquí se
+    enganchan el ruteo, el procesamiento de evidencias, la detección de
+    duplicados y las notificaciones.
+    """
+    ticket = db.get(models.Ticket, payload["id_ticket"])
+    if ticket is None:
+        logger.info("Ticket %s ya no existe; tarea descartada", payload["id_ticket"])
+        return
+    if get_settings().DEDUP_ENABLED:
+        match = detect_duplicate(db, ticket)
+        if match is not None:
+            logger.info("Ticket %s es duplicado de %s (similitud %.2f)", ticket.id_ticket, *match)
+    logger.debug("Ticket %s procesado en segundo plano", ticket.id_ticket)
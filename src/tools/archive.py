@@ -0,0 +1,48 @@
+"""
+Archiva tickets cerrados antiguos (y sus evidencias) en TICKETS_ARCHIVO.
+
+Pensado para correr periódicamente (cron o job programado), fuera de los
+workers de la API. Es seguro correrlo en paralelo o interrumpirlo: cada
+lote es una transacción independiente.
+
+Uso:
+    python -m src.tools.archive                               # ARCHIVE_AFTER_DAYS de la configuración
+    python -m src.tools.archive --older-than-days 180 --batch-size 1000
+    python -m src.tools.archive --max-batches 10 --database-url mysql+pymysql://...
+"""
+import argparse
+import logging
+import sys
+
+from sqlalchemy import create_engine
+
+from ..services.archivo import run_archive
+
+logger = logging.getLogger(__name__)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Archiva tickets cerrados antiguos.")
+    parser.add_argument("--database-url", help="BD a archivar (default: DATABASE_URL de la configuración)")
+    parser.add_argument("--older-than-days", type=int, help="Días desde el cierre (default: ARCHIVE_AFTER_DAYS)")
+    parser.add_argument("--batch-size", type=int, help="Tickets por lote (default: ARCHIVE_BATCH_SIZE)")
+    parser.add_argument("--max-batches", type=int, help="Detenerse después de N lotes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    database_url = args.database_url
+    if database_url is None:
+        from ..config import get_settings
+        database_url = get_settings().DATABASE_URL
+
+    result = run_archive(
+        create_engine(database_url),
+        older_than_days=args.older_than_days,
+        batch_size=args.batch_size,
+        max_batches=args.max_batches,
+    )
+    logger.info("Archivado completado: %s", result)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+Borra los refresh tokens vencidos de REFRESH_TOKENS (cada /auth/refresh
+agrega una fila). Correr periódicamente, fuera de la API.
+
+Uso:
+    python -m src.tools.auth_prune
+"""
+import logging
+import sys
+
+from .. import database
+from ..auth import prune_refresh_tokens
+
+logger = logging.getLogger(__name__)
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    db = database.SessionLocal(bind=database.get_engine())
+    try:
+        borrados = prune_refresh_tokens(db)
+    finally:
+        db.close()
+    logger.info("Refresh tokens vencidos borrados: %d", borrados)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
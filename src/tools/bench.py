@@ -0,0 +1,302 @@
+"""
+Prueba de carga en proceso (sin red) con percentiles de latencia.
+
+Conduce la app por ASGI (httpx.ASGITransport, con su lifespan) contra una
+BD SQLite temporal sembrada con datos demo, mezclando tres escenarios:
+
+- ciudadano: catálogo de zonas, alta de ticket y consulta de estatus.
+- operador: bandeja, asignación a proyecto y transferencia entre organizaciones.
+- dashboard: home compuesto, finanzas, burn-down e impacto.
+
+Reporta peticiones/s y p50/p95/p99 por endpoint y guarda el resultado en
+JSON para comparar dos corridas.
+
+Uso:
+    python -m src.tools.bench --duration 20 --concurrency 8 --output base.json
+    python -m src.tools.bench --duration 20 --output nuevo.json --compare base.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from .fixtures import create_local_app
+
+DEFAULT_MIX = "ciudadano=0.6,operador=0.3,dashboard=0.1"
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Percentil por rango más cercano (valores ya ordenados)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(q * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+class BenchContext:
+    def __init__(self, client, demo: dict, tokens: dict, rng: random.Random):
+        self.client = client
+        self.demo = demo
+        self.tokens = tokens
+        self.rng = rng
+        self.record = True
+        self.samples = defaultdict(list)   # endpoint -> [segundos]
+        self.errors = defaultdict(int)     # endpoint -> peticiones con status >= 400
+        self.own_tickets = []              # IDs vistos en la bandeja del operador
+
+    def auth(self, org: str = "demo") -> dict:
+        return {"Authorization": f"Bearer {self.tokens[org]}"}
+
+    async def request(self, label: str, method: str, path: str, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.request(method, path, **kwargs)
+        elapsed = time.perf_counter() - start
+        if self.record:
+            self.samples[label].append(elapsed)
+            if response.status_code >= 400:
+                self.errors[label] += 1
+        return response
+
+# ==========================================
+# ESCENARIOS
+# ==========================================
+
+async def scenario_ciudadano(ctx: BenchContext):
+    device = f"bench-device-{ctx.rng.randrange(500)}"
+    await ctx.request("GET /public/zonas", "GET", "/public/zonas")
+    await ctx.request(
+        "POST /public/tickets", "POST", "/public/tickets",
+        headers={"X-Device-Id": device},
+        json={
+            "id_usuario_reporte_ticket": device,
+            "tipo_incidente_ticket": ctx.rng.choice(["BASURA", "FUGA", "OLOR", "QUIMICO"]),
+            "id_zona_ticket": ctx.demo["id_zona"],
+            "descripcion_ticket": "Reporte generado por la prueba de carga",
+            "ubicacion_lat_ticket": 19.28 + ctx.rng.random() / 100,
+            "ubicacion_lon_ticket": -99.5 - ctx.rng.random() / 100,
+        }
+    )
+    for _ in range(ctx.rng.randint(1, 3)):
+        await ctx.request("GET /public/tickets/status/{user_uuid}", "GET", f"/public/tickets/status/{device}")
+
+async def scenario_operador(ctx: BenchContext):
+    response = await ctx.request(
+        "GET /operations/tickets/inbox", "GET", "/operations/tickets/inbox", headers=ctx.auth()
+    )
+    if response.status_code == 200:
+        ctx.own_tickets = [t["id_ticket"] for t in response.json()[:200]]
+    if not ctx.own_tickets:
+        return
+    ticket_id = ctx.rng.choice(ctx.own_tickets)
+
+    await ctx.request(
+        "PATCH /operations/tickets/{ticket_id}/assign", "PATCH", f"/operations/tickets/{ticket_id}/assign",
+        headers=ctx.auth(), json={"id_proyecto_ticket": ctx.demo["id_proyecto"], "prioridad_ticket": "ALTA"}
+    )
+
+    if ctx.rng.random() < 0.3:
+        # Ida y vuelta para que la bandeja demo no se vacíe
+        label = "PATCH /operations/tickets/{ticket_id}/transfer"
+        path = f"/operations/tickets/{ticket_id}/transfer"
+        await ctx.request(label, "PATCH", path, headers=ctx.auth(),
+                          json={"nuevo_id_organizacion": ctx.demo["id_organizacion_aliada"]})
+        await ctx.request(label, "PATCH", path, headers=ctx.auth("aliada"),
+                          json={"nuevo_id_organizacion": ctx.demo["id_organizacion"]})
+
+async def scenario_dashboard(ctx: BenchContext):
+    await ctx.request("GET /dashboard/home", "GET", "/dashboard/home", headers=ctx.auth())
+    await ctx.request("GET /dashboard/finanzas/resumen", "GET", "/dashboard/finanzas/resumen", headers=ctx.auth())
+    await ctx.request("GET /dashboard/proyectos/burndown", "GET", "/dashboard/proyectos/burndown", headers=ctx.auth())
+    await ctx.request("GET /dashboard/impacto/metricas", "GET", "/dashboard/impacto/metricas", headers=ctx.auth())
+
+SCENARIOS = {
+    "ciudadano": scenario_ciudadano,
+    "operador": scenario_operador,
+    "dashboard": scenario_dashboard,
+}
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Escenario desconocido: {name!r} (válidos: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+# ==========================================
+# EJECUCIÓN
+# ==========================================
+
+def _create_aliada_user(demo: dict) -> dict:
+    from .. import auth, database, models
+
+    db = database.SessionLocal()
+    try:
+        db.add(models.Usuario(
+            id_organizacion_usuario=demo["id_organizacion_aliada"],
+            nombre_completo_usuario="Operador Aliado",
+            correo_usuario="aliada@comecyt.mx",
+            contraseña_usuario=auth.get_password_hash(demo["password"]),
+            rol_usuario=models.RolUsuario.OPERADOR
+        ))
+        db.commit()
+    finally:
+        db.close()
+    return {"correo": "aliada@comecyt.mx", "password": demo["password"]}
+
+async def run_benchmark(args) -> dict:
+    import httpx
+
+    # Todos los usuarios virtuales comparten IP: el límite de /public se
+    # mide por dispositivo (X-Device-Id), no por IP
+    os.environ.setdefault("RATE_LIMIT_IP_MULTIPLIER", "1000000")
+    app, demo = create_local_app()
+    aliada = _create_aliada_user(demo)
+    if args.scale:
+        # Volumen sintético adicional (otras organizaciones) sobre los datos demo
+        from ..config import get_settings
+        from .seed import run_seed
+        run_seed(get_settings().DATABASE_URL, scale=args.scale, seed=args.seed, batch_size=10000, days=730)
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+
+    # ASGITransport no corre el lifespan: se corre aquí para medir la app como
+    # en producción (pool pre-calentado, cola de tareas y escritor de la bitácora)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            tokens = {}
+            for key, creds in (("demo", demo), ("aliada", aliada)):
+                response = await client.post("/auth/login", data={"username": creds["correo"], "password": creds["password"]})
+                tokens[key] = response.json()["access_token"]
+
+            master_rng = random.Random(args.seed)
+            contexts = [
+                BenchContext(client, demo, tokens, random.Random(master_rng.random()))
+                for _ in range(args.concurrency)
+            ]
+
+            async def worker(ctx: BenchContext, deadline: float, iterations: int):
+                done = 0
+                while time.perf_counter() < deadline and (not iterations or done < iterations):
+                    scenario = ctx.rng.choices(names, weights)[0]
+                    await SCENARIOS[scenario](ctx)
+                    done += 1
+
+            # Calentamiento (no se registra): caché, pool y catálogos
+            for ctx in contexts:
+                ctx.record = False
+            await asyncio.gather(*(worker(ctx, float("inf"), args.warmup) for ctx in contexts))
+            for ctx in contexts:
+                ctx.record = True
+
+            start = time.perf_counter()
+            deadline = start + args.duration if args.duration else float("inf")
+            await asyncio.gather(*(worker(ctx, deadline, args.iterations) for ctx in contexts))
+            wall = time.perf_counter() - start
+
+    samples, errors = defaultdict(list), defaultdict(int)
+    for ctx in contexts:
+        for label, values in ctx.samples.items():
+            samples[label].extend(values)
+        for label, count in ctx.errors.items():
+            errors[label] += count
+
+    endpoints = {}
+    all_values = []
+    for label in sorted(samples):
+        values = sorted(samples[label])
+        all_values.extend(values)
+        endpoints[label] = summarize(values, errors[label], wall)
+    all_values.sort()
+
+    return {
+        "meta": {
+            "fecha": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "mix": mix,
+            "concurrency": args.concurrency,
+            "duration_s": round(wall, 3),
+            "seed": args.seed,
+            "scale": args.scale,
+        },
+        "total": summarize(all_values, sum(errors.values()), wall),
+        "endpoints": endpoints,
+    }
+
+def summarize(sorted_values: list, errors: int, wall: float) -> dict:
+    count = len(sorted_values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / wall, 2) if wall else 0.0,
+        "mean_ms": round(sum(sorted_values) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(sorted_values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(sorted_values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(sorted_values, 0.99) * 1000, 3),
+    }
+
+# ==========================================
+# REPORTE
+# ==========================================
+
+def print_report(result: dict, baseline: dict = None):
+    header = f"{'endpoint':52} {'req':>7} {'err':>5} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["total"])]
+    for label, stats in rows:
+        print(f"{label:52} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>9.1f} "
+              f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+        if baseline is not None:
+            old = baseline["total"] if label == "TOTAL" else baseline["endpoints"].get(label)
+            if old:
+                print(f"{'  vs. base':52} {'':>7} {'':>5} {_delta(old['rps'], stats['rps']):>9} "
+                      f"{_delta(old['p50_ms'], stats['p50_ms']):>9} {_delta(old['p95_ms'], stats['p95_ms']):>9} "
+                      f"{_delta(old['p99_ms'], stats['p99_ms']):>9}")
+    print("(latencias en ms)")
+
+def _delta(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga en proceso de la API.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Pesos por escenario (default: {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=8, help="Usuarios virtuales simultáneos")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de medición (0 = sin límite)")
+    parser.add_argument("--iterations", type=int, default=0, help="Escenarios por usuario virtual (0 = sin límite)")
+    parser.add_argument("--warmup", type=int, default=3, help="Escenarios de calentamiento por usuario virtual")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=float, default=0.0,
+                        help="Agrega datos sintéticos de src.tools.seed con este factor (0 = solo demo)")
+    parser.add_argument("--output", help="Guarda el resultado en este JSON")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para mostrar diferencias")
+    args = parser.parse_args(argv)
+
+    if not args.duration and not args.iterations:
+        parser.error("Indica --duration o --iterations")
+
+    result = asyncio.run(run_benchmark(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Resultado guardado en {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Mide bytes en la red y CPU de serialización: JSON actual vs formato
+columnar, sin comprimir / gzip / br (ver services/encoding.py).
+
+Siembra los datos demo más `--tickets` tickets en la organización demo y:
+1. Bytes: pide cada listado con cada combinación formato x compresión y
+   reporta el Content-Length recibido.
+2. CPU: serializa en proceso los mismos objetos ORM `--repeat` veces.
+   "json" reproduce lo que hace FastAPI con el response_model (validar,
+   volcar en modo JSON y json.dumps); "columnar" es encode_columnar +
+   json.dumps. La compresión se mide aparte sobre cada cuerpo.
+
+Uso:
+    python -m src.tools.encoding_bench --tickets 500 --repeat 50
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import List
+
+from .fixtures import create_local_app
+
+def _add_tickets(demo: dict, count: int, seed: int) -> None:
+    from .. import database, models
+
+    rng = random.Random(seed)
+    tipos, estados, prioridades = list(models.TipoIncidente), list(models.EstadoTicket), list(models.Prioridad)
+    lugares = ("la calle principal", "el canal", "la escuela primaria", "el mercado", "la presa")
+    db = database.SessionLocal()
+    try:
+        db.add_all([
+            models.Ticket(
+                id_organizacion_ticket=demo["id_organizacion"],
+                id_zona_ticket=demo["id_zona"],
+                id_usuario_reporte_ticket=f"device-{i % 5}",
+                descripcion_ticket=f"{rng.choice(tipos).value.title()} reportado cerca de {rng.choice(lugares)}",
+                tipo_incidente_ticket=rng.choice(tipos),
+                estado_ticket=rng.choice(estados),
+                prioridad_ticket=rng.choice(prioridades),
+            )
+            for i in range(count)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def _timed(fn, repeat: int) -> float:
+    """Microsegundos de CPU por llamada."""
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat * 1_000_000
+
+def measure_bytes(client, headers: dict, paths: List[str]) -> list:
+    from ..services.encoding import COLUMNAR_MEDIA_TYPE, brotli
+
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    rows = []
+    for path in paths:
+        for formato, accept in (("json", "application/json"), ("columnar", COLUMNAR_MEDIA_TYPE)):
+            for encoding in encodings:
+                response = client.get(path, headers={**headers, "Accept": accept, "Accept-Encoding": encoding})
+                response.raise_for_status()
+                rows.append((path, formato, encoding, int(response.headers["content-length"])))
+    return rows
+
+def measure_cpu(tickets: list, repeat: int, settings) -> list:
+    from pydantic import TypeAdapter
+
+    from .. import schemas
+    from ..services.encoding import brotli, compress, render_columnar
+
+    adapter = TypeAdapter(List[schemas.TicketResponse])
+
+    def render_json() -> bytes:
+        content = adapter.dump_python(adapter.validate_python(tickets, from_attributes=True), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def render_col() -> bytes:
+        return render_columnar(tickets, schemas.TicketResponse)
+
+    rows = []
+    for formato, render in (("json", render_json), ("columnar", render_col)):
+        body = render()
+        rows.append((formato, "serializar", _timed(render, repeat), len(body)))
+        encoders = [("gzip", settings.COMPRESSION_GZIP_LEVEL)]
+        if brotli is not None:
+            encoders.append(("br", settings.COMPRESSION_BROTLI_QUALITY))
+        for encoding, level in encoders:
+            compressed = compress(body, encoding, level, level)
+            rows.append((formato, encoding, _timed(lambda: compress(body, encoding, level, level), repeat), len(compressed)))
+    return rows
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bytes y CPU: JSON vs columnar, con y sin compresión.")
+    parser.add_argument("--tickets", type=int, default=500, help="Tickets extra en la bandeja demo")
+    parser.add_argument("--repeat", type=int, default=50, help="Repeticiones por medición de CPU")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    app, demo = create_local_app()
+    _add_tickets(demo, args.tickets, args.seed)
+
+    from fastapi.testclient import TestClient
+
+    from .. import database, models
+    from ..config import get_settings
+
+    client = TestClient(app)
+    token = client.post(
+        "/auth/login", data={"username": demo["correo"], "password": demo["password"]}
+    ).json()["access_token"]
+    paths = ["/operations/tickets/inbox", f"/public/tickets/status/{demo['device_uuid']}", "/public/zonas"]
+
+    print(f"{'Endpoint':44} {'formato':9} {'codif.':9} {'bytes':>9} {'vs json':>8}")
+    baseline = {}
+    for path, formato, encoding, size in measure_bytes(client, {"Authorization": f"Bearer {token}"}, paths):
+        if formato == "json" and encoding == "identity":
+            baseline[path] = size
+        print(f"{path:44} {formato:9} {encoding:9} {size:9d} {size / baseline[path]:8.1%}")
+
+    db = database.SessionLocal()
+    try:
+        tickets = db.query(models.Ticket).filter(
+            models.Ticket.id_organizacion_ticket == demo["id_organizacion"]
+        ).all()
+        print(f"\nCPU por respuesta ({len(tickets)} tickets, {args.repeat} repeticiones):")
+        print(f"{'formato':9} {'paso':11} {'µs':>10} {'bytes':>9}")
+        for formato, step, micros, size in measure_cpu(tickets, args.repeat, get_settings()):
+            print(f"{formato:9} {step:11} {micros:10.0f} {size:9d}")
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
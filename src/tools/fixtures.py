@@ -0,0 +1,156 @@
+"""
+Datos mínimos y entorno local (SQLite) para las herramientas de desarrollo
+(src.tools.bench, src.tools.encoding_bench) y las pruebas (tests/). No usar
+contra una base de datos real.
+"""
+import os
+import tempfile
+from datetime import date
+
+def configure_local_env(database_url: str = None) -> str:
+    """
+    Apunta la configuración a una BD SQLite temporal (o a `database_url`).
+    Debe llamarse ANTES de importar la app: las variables de entorno tienen
+    prioridad sobre src/.env.
+    """
+    workdir = tempfile.mkdtemp(prefix="erp-comecyt-")
+    if database_url is None:
+        database_url = "sqlite:///" + os.path.join(workdir, "local.db")
+    os.environ["DATABASE_URL"] = database_url
+    # Evidencias en disco: las subidas directas no salen a Azure
+    os.environ.setdefault("STORAGE_BACKEND", "local")
+    os.environ.setdefault("LOCAL_STORAGE_DIR", os.path.join(workdir, "uploads"))
+    os.environ.setdefault("SECRET_KEY", "clave-local-solo-desarrollo")
+    os.environ.setdefault("AZURE_CONNECTION_STRING", "UseDevelopmentStorage=true")
+    os.environ.setdefault("AZURE_CONTAINER_NAME", "evidencias-local")
+    return database_url
+
+DEMO_PASSWORD = "demo1234"
+
+def seed_demo(db, tickets_por_org: int = 20) -> dict:
+    """
+    Crea dos organizaciones con cobertura compartida, un usuario GOBERNANZA,
+    objetivos, proyectos, gastos, transacciones, mediciones y tickets.
+    Devuelve los IDs/credenciales que usan las herramientas.
+    """
+    from .. import auth, models
+
+    zonas = [
+        models.Zona(nombre_zona=nombre, estado_zona="MEXICO")
+        for nombre in ("Lerma", "Toluca", "Metepec", "Ocoyoacac")
+    ]
+    org = models.Organizacion(nombre_organizacion="Ventanilla Única", tipo_organizacion=models.TipoOrganizacion.GOBIERNO)
+    org_aliada = models.Organizacion(nombre_organizacion="ONG Cuenca Limpia", tipo_organizacion=models.TipoOrganizacion.ONG)
+    org.zonas_cobertura.extend(zonas)
+    org_aliada.zonas_cobertura.extend(zonas[:2])
+    db.add_all([*zonas, org, org_aliada])
+    db.flush()
+
+    usuario = models.Usuario(
+        id_organizacion_usuario=org.id_organizacion,
+        nombre_completo_usuario="Usuario Demo",
+        correo_usuario="demo@comecyt.mx",
+        contraseña_usuario=auth.get_password_hash(DEMO_PASSWORD),
+        rol_usuario=models.RolUsuario.GOBERNANZA
+    )
+    objetivo = models.Objetivo(
+        id_organizacion_objetivo=org.id_organizacion,
+        titulo_objetivo="Saneamiento Río Lerma",
+        perspectiva_objetivo=models.PerspectivaBSC.PROCESOS,
+        meta_valor_objetivo=100,
+        avance_actual_objetivo=45
+    )
+    db.add_all([usuario, objetivo])
+    db.flush()
+
+    proyectos = [
+        models.Proyecto(
+            id_objetivo_proyecto=objetivo.id_objetivo,
+            id_organizacion_proyecto=org.id_organizacion,
+            id_zona_proyecto=zona.id_zona,
+            nombre_proyecto=f"Brigada {zona.nombre_zona}",
+            presupuesto_proyecto=250000,
+            estado_proyecto=models.EstadoProyecto.ACTIVO,
+            fecha_inicio_proyecto=date(2025, 1, 1),
+            fecha_fin_proyecto=date(2025, 12, 31)
+        )
+        for zona in zonas[:2]
+    ]
+    db.add_all(proyectos)
+    db.flush()
+
+    categorias = list(models.CategoriaGasto)
+    for i in range(24):
+        db.add(models.Gasto(
+            id_proyecto_gasto=proyectos[i % 2].id_proyecto,
+            monto_gasto=1500 + i * 10,
+            concepto_gasto=f"Gasto {i}",
+            categoria_gasto=categorias[i % len(categorias)],
+            fecha_gasto=date(2025, 1 + i // 2, 1 + (i * 3) % 28)
+        ))
+    db.add(models.Transaccion(
+        id_organizacion_transaccion=org.id_organizacion,
+        fuente_transaccion="Fondo estatal",
+        monto_transaccion=1000000,
+        tipo_transaccion=models.TipoTransaccion.PUBLICO
+    ))
+    db.add(models.Medicion(
+        id_organizacion_medicion=org.id_organizacion,
+        tipo_metrica_medicion="SATISFACCION",
+        valor_medicion=8.5
+    ))
+
+    tipos = list(models.TipoIncidente)
+    estados = list(models.EstadoTicket)
+    for owner in (org, org_aliada):
+        for i in range(tickets_por_org):
+            db.add(models.Ticket(
+                id_organizacion_ticket=owner.id_organizacion,
+                id_zona_ticket=zonas[i % len(zonas)].id_zona,
+                id_usuario_reporte_ticket=f"device-{i % 5}",
+                descripcion_ticket=f"Reporte {i}: fuga de agua en la calle principal",
+                tipo_incidente_ticket=tipos[i % len(tipos)],
+                estado_ticket=estados[i % len(estados)],
+                ubicacion_lat_ticket=19.28 + i * 0.001,
+                ubicacion_lon_ticket=-99.5 - i * 0.001
+            ))
+    db.commit()
+
+    primer_ticket = db.query(models.Ticket.id_ticket).filter(
+        models.Ticket.id_organizacion_ticket == org.id_organizacion
+    ).order_by(models.Ticket.id_ticket).first()[0]
+
+    return {
+        "correo": usuario.correo_usuario,
+        "password": DEMO_PASSWORD,
+        "id_organizacion": org.id_organizacion,
+        "id_organizacion_aliada": org_aliada.id_organizacion,
+        "id_zona": zonas[0].id_zona,
+        "id_objetivo": objetivo.id_objetivo,
+        "id_proyecto": proyectos[0].id_proyecto,
+        "id_ticket": primer_ticket,
+        "device_uuid": "device-0",
+    }
+
+def create_demo_db() -> dict:
+    """Aplica el esquema a la BD configurada y siembra los datos demo."""
+    from .. import database
+    from ..migrate import run_migrations
+
+    run_migrations()
+    db = database.SessionLocal(bind=database.get_engine())
+    try:
+        return seed_demo(db)
+    finally:
+        db.close()
+
+def create_local_app(database_url: str = None):
+    """
+    Configura el entorno, aplica el esquema, siembra los datos demo y
+    devuelve (app, datos_demo).
+    """
+    configure_local_env(database_url)
+    demo = create_demo_db()
+
+    from ..main import create_app
+    return create_app(), demo
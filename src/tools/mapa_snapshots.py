@@ -0,0 +1,47 @@
+"""
+Publica los snapshots del mapa público (/public/mapa) desde
+CONTEOS_INCIDENTES_DIA: uno por ventana de HEATMAP_WINDOWS_DAYS, solo si
+cambió desde el último, y depura los que pasan de HEATMAP_SNAPSHOTS_KEEP.
+Correr periódicamente (p. ej. cada 15 min con cron), fuera de la API.
+
+Los conteos se mantienen solos al crear y cerrar tickets; --rebuild los
+recalcula antes desde los tickets (carga inicial, importaciones).
+
+Uso:
+    python -m src.tools.mapa_snapshots
+    python -m src.tools.mapa_snapshots --rebuild
+"""
+import argparse
+import logging
+import sys
+
+from .. import database
+from ..config import get_settings
+from ..services.mapa import publish_snapshots, rebuild_counters
+
+logger = logging.getLogger(__name__)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Genera los snapshots del mapa público de incidentes.")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcula antes los conteos diarios desde los tickets")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    settings = get_settings()
+    engine = database.get_engine()
+    if args.rebuild:
+        with engine.begin() as conn:
+            total = rebuild_counters(conn)
+        logger.info("Conteos diarios reconstruidos: %d tickets", total)
+
+    db = database.SessionLocal(bind=engine)
+    try:
+        results = publish_snapshots(db, settings.heatmap_windows, settings.HEATMAP_SNAPSHOTS_KEEP)
+    finally:
+        db.close()
+    for ventana, id_snapshot, nuevo in results:
+        logger.info("Ventana %4d días: snapshot %d (%s)", ventana, id_snapshot, "nuevo" if nuevo else "sin cambios")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
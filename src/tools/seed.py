@@ -0,0 +1,444 @@
+"""
+Generador de datos sintéticos para benchmarks y revisión de planes de consulta.
+
+Genera todas las tablas con volúmenes controlables y semilla fija:
+zonas, organizaciones con cobertura traslapada, usuarios, objetivos,
+proyectos, tickets (lat/lon alrededor de cada zona, estados según su
+antigüedad), evidencias, gastos, transacciones y mediciones.
+
+Escribe con INSERT masivos de Core (executemany por bloques), con IDs
+explícitos para resolver llaves foráneas sin RETURNING.
+
+Uso:
+    python -m src.tools.seed --scale 0.01                       # BD de DATABASE_URL
+    python -m src.tools.seed --scale 5 --database-url mysql+pymysql://...
+    python -m src.tools.seed --scale 1 --tickets 3000000 --migrate
+
+Con --scale 1 se generan ~2.1 millones de filas; --scale 5 ronda los 10 millones.
+"""
+import argparse
+import logging
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import Connection
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+# Volúmenes con --scale 1.0
+BASE_COUNTS = {
+    "organizaciones": 200,
+    "tickets": 1_000_000,
+    "evidencias": 300_000,
+    "gastos": 500_000,
+    "transacciones": 100_000,
+    "mediciones": 200_000,
+}
+ZONAS = 125                      # Municipios del Estado de México
+USUARIOS_POR_ORG = 5
+PROYECTOS_POR_ORG = 5
+ZONAS_POR_ORG = (3, 20)          # Rango de cobertura por organización
+
+# Caja aproximada del Estado de México
+LAT_RANGE = (18.40, 20.30)
+LON_RANGE = (-100.60, -98.60)
+
+ESTADOS_TICKET = [
+    (models.EstadoTicket.RECIBIDO, 0.15),
+    (models.EstadoTicket.ASIGNADO, 0.15),
+    (models.EstadoTicket.EN_PROCESO, 0.15),
+    (models.EstadoTicket.RESUELTO, 0.25),
+    (models.EstadoTicket.CERRADO, 0.30),
+]
+TIPOS_INCIDENTE = [
+    (models.TipoIncidente.BASURA, 0.30),
+    (models.TipoIncidente.FUGA, 0.20),
+    (models.TipoIncidente.OLOR, 0.10),
+    (models.TipoIncidente.QUIMICO, 0.05),
+    (models.TipoIncidente.DESECHOS_RESIDUALES, 0.12),
+    (models.TipoIncidente.TALA_IRREGULAR, 0.10),
+    (models.TipoIncidente.INCENDIOS_FORESTALES, 0.08),
+    (models.TipoIncidente.OTRO, 0.05),
+]
+DESCRIPCIONES = {
+    models.TipoIncidente.BASURA: "Acumulación de basura en {lugar}",
+    models.TipoIncidente.FUGA: "Fuga de agua en {lugar}",
+    models.TipoIncidente.OLOR: "Olor fuerte proveniente de {lugar}",
+    models.TipoIncidente.QUIMICO: "Posible derrame químico cerca de {lugar}",
+    models.TipoIncidente.DESECHOS_RESIDUALES: "Descarga de aguas residuales en {lugar}",
+    models.TipoIncidente.TALA_IRREGULAR: "Tala de árboles sin permiso en {lugar}",
+    models.TipoIncidente.INCENDIOS_FORESTALES: "Humo e incendio en {lugar}",
+    models.TipoIncidente.OTRO: "Situación irregular en {lugar}",
+}
+LUGARES = ["la calle principal", "el canal", "el río Lerma", "la escuela", "el mercado", "la carretera", "el parque"]
+
+class SeedContext:
+    """IDs generados y parámetros compartidos por los generadores."""
+
+    def __init__(self, rng: random.Random, counts: dict, days: int, next_ids: dict):
+        self.rng = rng
+        self.counts = counts
+        self.days = days
+        self.next_ids = next_ids
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.zonas = []             # [(id_zona, lat, lon)]
+        self.orgs = []              # [id_organizacion]
+        self.orgs_por_zona = {}     # id_zona -> [id_organizacion]
+        self.objetivos_por_org = {}
+        self.proyectos = []         # [(id_proyecto, id_org, inicio, fin, presupuesto)]
+        self.proyectos_por_org = {}
+        self.first_ticket_id = None
+
+    def take_ids(self, table: str, n: int) -> range:
+        start = self.next_ids[table]
+        self.next_ids[table] = start + n
+        return range(start, start + n)
+
+def _weighted(rng: random.Random, options: list, k: int) -> list:
+    values, weights = zip(*options)
+    return rng.choices(values, weights, k=k)
+
+# ==========================================
+# GENERADORES (producen filas como dicts)
+# ==========================================
+
+def gen_zonas(ctx: SeedContext):
+    for id_zona in ctx.take_ids("ZONAS", ZONAS):
+        lat = ctx.rng.uniform(*LAT_RANGE)
+        lon = ctx.rng.uniform(*LON_RANGE)
+        ctx.zonas.append((id_zona, lat, lon))
+        yield {"id_zona": id_zona, "nombre_zona": f"Municipio {id_zona}", "estado_zona": "MEXICO"}
+
+def gen_organizaciones(ctx: SeedContext):
+    tipos = list(models.TipoOrganizacion)
+    for id_org in ctx.take_ids("ORGANIZACIONES", ctx.counts["organizaciones"]):
+        ctx.orgs.append(id_org)
+        yield {
+            "id_organizacion": id_org,
+            "nombre_organizacion": f"Organización {id_org}",
+            "tipo_organizacion": ctx.rng.choice(tipos),
+        }
+
+def gen_cobertura(ctx: SeedContext):
+    # Distribución sesgada: las zonas con ID bajo (centrales) las cubren
+    # muchas organizaciones, así hay traslapes realistas.
+    zona_ids = [z[0] for z in ctx.zonas]
+    weights = [1 / (i + 1) ** 0.7 for i in range(len(zona_ids))]
+    for id_org in ctx.orgs:
+        k = ctx.rng.randint(*ZONAS_POR_ORG)
+        elegidas = set(ctx.rng.choices(zona_ids, weights, k=k))
+        for id_zona in elegidas:
+            ctx.orgs_por_zona.setdefault(id_zona, []).append(id_org)
+            yield {"ID_ORGANIZACION": id_org, "ID_ZONA": id_zona}
+    # Toda zona necesita al menos una organización que atienda sus tickets
+    for id_zona in zona_ids:
+        if id_zona not in ctx.orgs_por_zona:
+            id_org = ctx.rng.choice(ctx.orgs)
+            ctx.orgs_por_zona[id_zona] = [id_org]
+            yield {"ID_ORGANIZACION": id_org, "ID_ZONA": id_zona}
+
+def gen_usuarios(ctx: SeedContext, password_hash: str):
+    roles = list(models.RolUsuario)
+    ids = iter(ctx.take_ids("USUARIOS", len(ctx.orgs) * USUARIOS_POR_ORG))
+    for id_org in ctx.orgs:
+        for n in range(USUARIOS_POR_ORG):
+            id_usuario = next(ids)
+            yield {
+                "id_usuario": id_usuario,
+                "id_organizacion_usuario": id_org,
+                "nombre_completo_usuario": f"Usuario {id_usuario}",
+                "correo_usuario": f"usuario{id_usuario}@org{id_org}.comecyt.mx",
+                "contraseña_usuario": password_hash,
+                "rol_usuario": roles[n % len(roles)],
+            }
+
+def gen_objetivos(ctx: SeedContext):
+    perspectivas = list(models.PerspectivaBSC)
+    ids = iter(ctx.take_ids("OBJETIVOS", len(ctx.orgs) * len(perspectivas)))
+    for id_org in ctx.orgs:
+        for perspectiva in perspectivas:
+            id_objetivo = next(ids)
+            ctx.objetivos_por_org.setdefault(id_org, []).append(id_objetivo)
+            meta = ctx.rng.choice([50, 100, 1000])
+            yield {
+                "id_objetivo": id_objetivo,
+                "id_organizacion_objetivo": id_org,
+                "titulo_objetivo": f"Objetivo {perspectiva.value.title()} {id_org}",
+                "perspectiva_objetivo": perspectiva,
+                "meta_valor_objetivo": meta,
+                "avance_actual_objetivo": round(meta * ctx.rng.random(), 2),
+                "color_semaforo_objetivo": ctx.rng.choice(list(models.ColorSemaforo)),
+            }
+
+def gen_proyectos(ctx: SeedContext):
+    ids = iter(ctx.take_ids("PROYECTOS", len(ctx.orgs) * PROYECTOS_POR_ORG))
+    zona_ids = [z[0] for z in ctx.zonas]
+    for id_org in ctx.orgs:
+        for _ in range(PROYECTOS_POR_ORG):
+            id_proyecto = next(ids)
+            inicio = (ctx.now - timedelta(days=ctx.rng.randint(30, ctx.days))).date()
+            fin = inicio + timedelta(days=ctx.rng.randint(90, 540))
+            presupuesto = ctx.rng.randint(50, 5000) * 1000
+            ctx.proyectos.append((id_proyecto, id_org, inicio, fin, presupuesto))
+            ctx.proyectos_por_org.setdefault(id_org, []).append(id_proyecto)
+            yield {
+                "id_proyecto": id_proyecto,
+                "id_objetivo_proyecto": ctx.rng.choice(ctx.objetivos_por_org[id_org]),
+                "id_organizacion_proyecto": id_org,
+                "id_zona_proyecto": ctx.rng.choice(zona_ids),
+                "nombre_proyecto": f"Proyecto {id_proyecto}",
+                "presupuesto_proyecto": presupuesto,
+                "estado_proyecto": ctx.rng.choice(list(models.EstadoProyecto)),
+                "prioridad_proyecto": ctx.rng.choice(list(models.Prioridad)),
+                "fecha_inicio_proyecto": inicio,
+                "fecha_fin_proyecto": fin,
+            }
+
+def gen_tickets(ctx: SeedContext):
+    rng = ctx.rng
+    n = ctx.counts["tickets"]
+    ids = ctx.take_ids("TICKETS", n)
+    ctx.first_ticket_id = ids.start
+    prioridades = list(models.Prioridad)
+    # Más tickets en zonas centrales (mismo sesgo que la cobertura)
+    zona_weights = [1 / (i + 1) ** 0.5 for i in range(len(ctx.zonas))]
+    zonas = rng.choices(ctx.zonas, zona_weights, k=n)
+    tipos = _weighted(rng, TIPOS_INCIDENTE, n)
+    # Estados precalculados: los tickets de más de 30 días suelen estar cerrados
+    estados_recientes = _weighted(rng, ESTADOS_TICKET, n)
+    estados_viejos = _weighted(rng, [(models.EstadoTicket.RESUELTO, 0.30), (models.EstadoTicket.CERRADO, 0.65),
+                                     (models.EstadoTicket.EN_PROCESO, 0.05)], n)
+    cerrados = (models.EstadoTicket.RESUELTO, models.EstadoTicket.CERRADO)
+    dispositivos = max(n // 4, 1)
+    total_seconds = ctx.days * 86400
+
+    for i, id_ticket in enumerate(ids):
+        id_zona, lat, lon = zonas[i]
+        tipo = tipos[i]
+        # Antigüedad sesgada a lo reciente
+        age = total_seconds * (rng.random() ** 1.5)
+        creado = ctx.now - timedelta(seconds=age)
+        estado = estados_viejos[i] if age > 30 * 86400 else estados_recientes[i]
+        cierre = None
+        if estado in cerrados:
+            cierre = min(creado + timedelta(hours=rng.expovariate(1 / 120)), ctx.now)
+        id_org = rng.choice(ctx.orgs_por_zona[id_zona])
+        proyectos = ctx.proyectos_por_org.get(id_org)
+        yield {
+            "id_ticket": id_ticket,
+            "id_organizacion_ticket": id_org,
+            "id_proyecto_ticket": rng.choice(proyectos) if proyectos and estado != models.EstadoTicket.RECIBIDO and rng.random() < 0.6 else None,
+            "id_zona_ticket": id_zona,
+            "id_usuario_reporte_ticket": f"device-{rng.randrange(dispositivos)}",
+            "descripcion_ticket": DESCRIPCIONES[tipo].format(lugar=rng.choice(LUGARES)),
+            "des_hechos_lugar_ticket": None,
+            "tipo_incidente_ticket": tipo,
+            "estado_ticket": estado,
+            "prioridad_ticket": rng.choice(prioridades),
+            "ubicacion_lat_ticket": round(rng.gauss(lat, 0.02), 6),
+            "ubicacion_lon_ticket": round(rng.gauss(lon, 0.02), 6),
+            "fecha_creacion_ticket": creado,
+            "fecha_cierre_ticket": cierre,
+        }
+
+def gen_evidencias(ctx: SeedContext):
+    rng = ctx.rng
+    n_tickets = ctx.counts["tickets"]
+    tipos = [(models.TipoArchivo.IMAGEN, 0.85), (models.TipoArchivo.VIDEO, 0.12), (models.TipoArchivo.DOCUMENTO, 0.03)]
+    for id_evidencia in ctx.take_ids("EVIDENCIAS", ctx.counts["evidencias"]):
+        tipo = _weighted(rng, tipos, 1)[0]
+        ext = {"IMAGEN": "jpg", "VIDEO": "mp4", "DOCUMENTO": "pdf"}[tipo.value]
+        yield {
+            "id_evidencia": id_evidencia,
+            "id_ticket_evidencia": ctx.first_ticket_id + rng.randrange(n_tickets),
+            "url_evidencia": f"https://storage.local/evidencias/{id_evidencia}.{ext}",
+            "tipo_archivo_evidencia": tipo,
+        }
+
+def gen_gastos(ctx: SeedContext):
+    rng = ctx.rng
+    categorias = list(models.CategoriaGasto)
+    pesos = [3, 2, 1, 1, 1, 3, 1, 1]
+    for id_gasto in ctx.take_ids("GASTOS", ctx.counts["gastos"]):
+        id_proyecto, _, inicio, fin, presupuesto = rng.choice(ctx.proyectos)
+        fin_real = min(fin, ctx.now.date())
+        span = max((fin_real - inicio).days, 1)
+        yield {
+            "id_gasto": id_gasto,
+            "id_proyecto_gasto": id_proyecto,
+            "monto_gasto": round(rng.lognormvariate(math.log(presupuesto / 400), 0.8), 2),
+            "concepto_gasto": f"Comprobante {id_gasto}",
+            "categoria_gasto": rng.choices(categorias, pesos)[0],
+            "fecha_gasto": inicio + timedelta(days=rng.randrange(span)),
+        }
+
+def gen_transacciones(ctx: SeedContext):
+    rng = ctx.rng
+    tipos = list(models.TipoTransaccion)
+    for id_transaccion in ctx.take_ids("TRANSACCIONES", ctx.counts["transacciones"]):
+        yield {
+            "id_transaccion": id_transaccion,
+            "id_organizacion_transaccion": rng.choice(ctx.orgs),
+            "fuente_transaccion": rng.choice(["Fondo estatal", "Donación", "Convenio", "Recursos propios"]),
+            "monto_transaccion": round(rng.lognormvariate(math.log(200000), 1.0), 2),
+            "tipo_transaccion": rng.choice(tipos),
+            "fecha_transaccion": (ctx.now - timedelta(days=rng.randrange(ctx.days))).date(),
+        }
+
+def gen_mediciones(ctx: SeedContext):
+    rng = ctx.rng
+    metricas = [("SATISFACCION", 0, 10), ("CALIDAD_AGUA", 0, 100), ("ARBOLES_PLANTADOS", 0, 500), ("BASURA_KG", 0, 2000)]
+    fuentes = list(models.FuenteDato)
+    for id_medicion in ctx.take_ids("MEDICIONES", ctx.counts["mediciones"]):
+        nombre, low, high = rng.choice(metricas)
+        yield {
+            "id_medicion": id_medicion,
+            "id_organizacion_medicion": rng.choice(ctx.orgs),
+            "tipo_metrica_medicion": nombre,
+            "valor_medicion": round(rng.uniform(low, high), 2),
+            "fuente_dato_medicion": rng.choice(fuentes),
+            "fecha_registro_medicion": (ctx.now - timedelta(days=rng.randrange(ctx.days))).date(),
+        }
+
+# ==========================================
+# ESCRITURA MASIVA
+# ==========================================
+
+def _column_keys(table) -> dict:
+    """atributo ORM (id_zona) -> llave de la columna Core (ID_ZONA)."""
+    mapper = next((m for m in models.Base.registry.mappers if m.local_table is table), None)
+    if mapper is None:
+        return {}
+    return {prop.key: prop.columns[0].key for prop in mapper.column_attrs}
+
+def bulk_insert(conn: Connection, table, rows, batch_size: int) -> int:
+    """Inserta `rows` en bloques; cada bloque es una transacción."""
+    keys = _column_keys(table)
+    if keys:
+        rows = ({keys[k]: v for k, v in row.items()} for row in rows)
+    start = time.perf_counter()
+    total = 0
+    batch = []
+
+    def flush():
+        nonlocal total
+        with conn.begin():
+            conn.execute(table.insert(), batch)
+        total += len(batch)
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    elapsed = time.perf_counter() - start
+    logger.info("%-26s %10d filas en %7.1fs (%.0f filas/s)",
+                table.name, total, elapsed, total / elapsed if elapsed else 0)
+    return total
+
+def _next_ids(conn: Connection) -> dict:
+    """Siguiente ID libre por tabla, para agregar datos sobre una BD existente."""
+    next_ids = {}
+    for model in (models.Zona, models.Organizacion, models.Usuario, models.Objetivo, models.Proyecto,
+                  models.Ticket, models.Evidencia, models.Gasto, models.Transaccion, models.Medicion):
+        pk = model.__table__.primary_key.columns.values()[0]
+        next_ids[model.__tablename__] = (conn.execute(select(func.max(pk))).scalar() or 0) + 1
+    return next_ids
+
+def run_seed(database_url: str, scale: float, seed: int, batch_size: int, days: int,
+             overrides: dict = None, migrate: bool = False) -> dict:
+    from ..auth import get_password_hash
+
+    counts = {name: max(int(base * scale), 1) for name, base in BASE_COUNTS.items()}
+    counts.update({k: v for k, v in (overrides or {}).items() if v is not None})
+
+    engine = create_engine(database_url)
+    if migrate:
+        from ..migrate import run_migrations
+        run_migrations(engine)
+
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            # Solo para esta conexión de carga: sin fsync por transacción
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            conn.commit()
+
+        ctx = SeedContext(random.Random(seed), counts, days, _next_ids(conn))
+        conn.commit()
+        # Un solo hash bcrypt para todos los usuarios sintéticos
+        password_hash = get_password_hash("sintetico1234")
+
+        tables = models.Base.metadata.tables
+        written = {}
+        for table_name, rows in (
+            ("ZONAS", gen_zonas(ctx)),
+            ("ORGANIZACIONES", gen_organizaciones(ctx)),
+            ("COBERTURA_ORGANIZACIONES", gen_cobertura(ctx)),
+            ("USUARIOS", gen_usuarios(ctx, password_hash)),
+            ("OBJETIVOS", gen_objetivos(ctx)),
+            ("PROYECTOS", gen_proyectos(ctx)),
+            ("TICKETS", gen_tickets(ctx)),
+            ("EVIDENCIAS", gen_evidencias(ctx)),
+            ("GASTOS", gen_gastos(ctx)),
+            ("TRANSACCIONES", gen_transacciones(ctx)),
+            ("MEDICIONES", gen_mediciones(ctx)),
+        ):
+            written[table_name] = bulk_insert(conn, tables[table_name], rows, batch_size)
+
+        # Los tickets cerrados se insertan directo: el histograma de SLA se recalcula
+        from ..services.sla import rebuild_histograms
+        cerrados = rebuild_histograms(conn, batch_size)
+        # Igual los conteos diarios del mapa público
+        from ..services.mapa import rebuild_counters
+        contados = rebuild_counters(conn, batch_size)
+        conn.commit()
+        logger.info("%-26s %10d tickets cerrados", "HISTOGRAMAS_RESOLUCION", cerrados)
+        logger.info("%-26s %10d tickets", "CONTEOS_INCIDENTES_DIA", contados)
+
+    elapsed = time.perf_counter() - start
+    total = sum(written.values())
+    logger.info("Total: %d filas en %.1fs (%.0f filas/s)", total, elapsed, total / elapsed if elapsed else 0)
+    return written
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos para todas las tablas.")
+    parser.add_argument("--database-url", help="Destino (default: DATABASE_URL de la configuración)")
+    parser.add_argument("--scale", type=float, default=0.01, help="Factor sobre los volúmenes base (1.0 ≈ 2.1M filas)")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla aleatoria (misma semilla = mismos datos)")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=730, help="Ventana de historia en días")
+    parser.add_argument("--migrate", action="store_true", help="Crea las tablas antes de sembrar")
+    for name in BASE_COUNTS:
+        parser.add_argument(f"--{name}", type=int, help=f"Fija el número de {name} (ignora --scale)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    database_url = args.database_url
+    if database_url is None:
+        from ..config import get_settings
+        database_url = get_settings().DATABASE_URL
+
+    run_seed(
+        database_url,
+        scale=args.scale,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        days=args.days,
+        overrides={name: getattr(args, name) for name in BASE_COUNTS},
+        migrate=args.migrate,
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+Reconstruye HISTOGRAMAS_RESOLUCION desde los tickets cerrados.
+
+Los histogramas se mantienen solos al cerrar/reabrir tickets; esto solo hace
+falta después de cargar datos por fuera de la API (seed, importaciones) o
+de cambiar las cubetas en services/sla.py.
+
+Uso:
+    python -m src.tools.sla_rebuild
+    python -m src.tools.sla_rebuild --database-url mysql+pymysql://...
+"""
+import argparse
+import logging
+import sys
+import time
+
+from sqlalchemy import create_engine
+
+from ..services.sla import rebuild_histograms
+
+logger = logging.getLogger(__name__)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Reconstruye los histogramas de tiempos de resolución.")
+    parser.add_argument("--database-url", help="BD a reconstruir (default: DATABASE_URL de la configuración)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    database_url = args.database_url
+    if database_url is None:
+        from ..config import get_settings
+        database_url = get_settings().DATABASE_URL
+
+    start = time.perf_counter()
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        total = rebuild_histograms(conn)
+    logger.info("Histogramas reconstruidos: %d tickets cerrados en %.1fs", total, time.perf_counter() - start)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
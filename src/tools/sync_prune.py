@@ -0,0 +1,36 @@
+"""
+Borra de CAMBIOS_SYNC los cambios más viejos que SYNC_LOG_RETENTION_DAYS
+(los tokens de esa edad ya reciben la lista completa). Correr
+periódicamente, fuera de la API.
+
+Uso:
+    python -m src.tools.sync_prune
+    python -m src.tools.sync_prune --days 60
+"""
+import argparse
+import logging
+import sys
+
+from .. import database
+from ..config import get_settings
+from ..services.sync import prune_changes
+
+logger = logging.getLogger(__name__)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Depura la secuencia de cambios de /public/sync.")
+    parser.add_argument("--days", type=int, help="Retención en días (default: SYNC_LOG_RETENTION_DAYS)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    days = args.days if args.days is not None else get_settings().SYNC_LOG_RETENTION_DAYS
+    db = database.SessionLocal(bind=database.get_engine())
+    try:
+        borrados = prune_changes(db, days)
+    finally:
+        db.close()
+    logger.info("Cambios depurados: %d (retención %d días)", borrados, days)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
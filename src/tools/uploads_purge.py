@@ -0,0 +1,30 @@
+"""
+Borra las subidas reanudables vencidas sin completar (SUBIDAS_EVIDENCIA) y
+sus partes guardadas, y los objetos de URLs firmadas que nunca se
+completaron (sin Evidencia). Correr periódicamente, fuera de la API.
+
+Uso:
+    python -m src.tools.uploads_purge
+"""
+import logging
+import sys
+
+from .. import database
+from ..services.storage import purge_expired_uploads, purge_orphan_blobs
+
+logger = logging.getLogger(__name__)
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    db = database.SessionLocal(bind=database.get_engine())
+    try:
+        borradas = purge_expired_uploads(db)
+        huerfanos = purge_orphan_blobs(db)
+    finally:
+        db.close()
+    logger.info("Subidas vencidas borradas: %d", borradas)
+    logger.info("Archivos sin completar borrados: %d", huerfanos)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Verificación del presupuesto de consultas SQL por endpoint (regresiones N+1).
+
+Cada módulo tests/test_query_budget_<router>.py declara CASES: una llamada
+por endpoint de su router, como (método, plantilla de ruta, build), donde
+build(ctx) devuelve (ruta concreta, kwargs de la petición). La prueba falla,
+mostrando las sentencias responsables, si:
+- el endpoint ejecuta más sentencias que su @query_budget,
+- el endpoint no declara @query_budget o no tiene caso,
+- la llamada responde 5xx.
+
+Solo se cuentan las sentencias de la petición (las de la cola de tareas y
+del escritor de la bitácora corren fuera de ella) y las cachés se vacían
+antes de cada llamada para medir el peor caso.
+"""
+from typing import Callable, Iterable, List, Tuple
+
+import pytest
+from sqlalchemy import event
+
+def params(cases: Iterable[Tuple[str, str, Callable]]) -> list:
+    """Casos como parámetros de pytest, con id '<método> <plantilla>'."""
+    seen = {}
+    result = []
+    for method, template, build in cases:
+        key = f"{method} {template}"
+        seen[key] = seen.get(key, 0) + 1
+        result.append(pytest.param(method, template, build, id=key if seen[key] == 1 else f"{key} #{seen[key]}"))
+    return result
+
+def routes_with_prefix(app, prefix: str) -> set:
+    from fastapi.routing import APIRoute
+
+    return {
+        (method, route.path)
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.path.startswith(prefix)
+        for method in route.methods
+    }
+
+def assert_routes_covered(app, prefix: str, cases) -> None:
+    missing = routes_with_prefix(app, prefix) - {(method, template) for method, template, _ in cases}
+    assert not missing, f"Endpoints sin caso: {sorted(missing)}"
+
+class QueryBudgetChecker:
+    def __init__(self, app, client):
+        from fastapi.routing import APIRoute
+
+        from src.database import get_engine
+
+        self.app = app
+        self.client = client
+        self.engine = get_engine()
+        self.statements: List[str] = []
+        self._routes = {
+            (method, route.path): route
+            for route in app.routes
+            if isinstance(route, APIRoute)
+            for method in route.methods
+        }
+        event.listen(self.engine, "before_cursor_execute", self._capture)
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        from src.services.instrumentation import current_request
+
+        if current_request() is not None:
+            self.statements.append(statement)
+
+    def close(self) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._capture)
+
+    @staticmethod
+    def _reset_caches() -> None:
+        from src.services.cache import get_query_cache
+        from src.services.catalogos import get_zona_catalogo
+        from src.services.mapa import get_mapa_cache
+
+        get_query_cache().clear()
+        get_zona_catalogo().invalidate()
+        get_mapa_cache().clear()
+
+    def check(self, method: str, template: str, path: str, kwargs: dict):
+        from src.services.instrumentation import get_query_budget
+
+        route = self._routes.get((method, template))
+        assert route is not None, f"{method} {template}: el caso no corresponde a ninguna ruta"
+        limit = get_query_budget(route.endpoint)
+        assert limit is not None, f"{method} {template}: no declara @query_budget"
+
+        self._reset_caches()
+        self.statements.clear()
+        # Los headers del caso se suman a los del cliente (Authorization del usuario demo)
+        response = self.client.request(method, path, **kwargs)
+        executed = list(self.statements)
+
+        assert response.status_code < 500, f"{method} {template}: HTTP {response.status_code}"
+        detail = "\n".join(f"    [{i}] {s}" for i, s in enumerate(executed, 1))
+        assert len(executed) <= limit, (
+            f"{method} {template}: {len(executed)} sentencias, presupuesto {limit}\n{detail}"
+        )
+        return response
@@ -0,0 +1,45 @@
+"""
+Entorno de las pruebas: BD SQLite temporal con los datos demo
+(src/tools/fixtures.py) y la app completa corriendo su lifespan (pool
+pre-calentado, cola de tareas y escritor de la bitácora), como en producción.
+"""
+import os
+
+import pytest
+
+from src.tools.fixtures import configure_local_env, create_demo_db
+
+# Antes de importar la app: las variables de entorno tienen prioridad sobre src/.env
+configure_local_env()
+# Los cambios recién sembrados deben ser entregables en /public/sync
+os.environ.setdefault("SYNC_GRACE_SECONDS", "0")
+# Apagado por defecto (guarda el texto de cada sentencia); aquí se registran los excesos
+os.environ.setdefault("QUERY_BUDGET_CHECK", "true")
+
+@pytest.fixture(scope="session")
+def demo() -> dict:
+    return create_demo_db()
+
+@pytest.fixture(scope="session")
+def app(demo):
+    from src.main import create_app
+
+    return create_app()
+
+@pytest.fixture(scope="session")
+def client(app, demo):
+    """Cliente autenticado como el usuario demo (GOBERNANZA)."""
+    from fastapi.testclient import TestClient
+
+    with TestClient(app, raise_server_exceptions=False) as client:
+        response = client.post("/auth/login", data={"username": demo["correo"], "password": demo["password"]})
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        yield client
+
+@pytest.fixture(scope="session")
+def budget(app, client):
+    from .budget import QueryBudgetChecker
+
+    checker = QueryBudgetChecker(app, client)
+    yield checker
+    checker.close()
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+def _ticket(db, id_organizacion: int, id_zona: int):
+    from src import models
+
+    ticket = models.Ticket(
+        id_organizacion_ticket=id_organizacion,
+        id_zona_ticket=id_zona,
+        id_usuario_reporte_ticket="device-dup",
+        tipo_incidente_ticket=models.TipoIncidente.FUGA,
+        descripcion_ticket="Fuga de agua potable frente al mercado municipal",
+        ubicacion_lat_ticket=19.2826,
+        ubicacion_lon_ticket=-99.6557,
+        fecha_creacion_ticket=datetime(2026, 3, 1, 12, 0),
+    )
+    db.add(ticket)
+    db.flush()
+    return ticket
+
+def test_duplicates_stay_within_the_organization(demo):
+    from src import database
+    from src.services.duplicados import detect_duplicate
+
+    db = database.SessionLocal()
+    try:
+        original = _ticket(db, demo["id_organizacion_aliada"], demo["id_zona"])
+        assert detect_duplicate(db, original) is None
+        # Mismo incidente reportado en otra organización: no se liga
+        otro = _ticket(db, demo["id_organizacion"], demo["id_zona"])
+        assert detect_duplicate(db, otro) is None
+        assert otro.id_ticket_padre is None
+        # En la misma organización sí
+        repetido = _ticket(db, demo["id_organizacion"], demo["id_zona"])
+        assert detect_duplicate(db, repetido)[0] == otro.id_ticket
+    finally:
+        db.rollback()
+        db.close()
+
+def test_transfer_detaches_the_group(client, demo):
+    from src import database
+
+    db = database.SessionLocal()
+    try:
+        padre, *hijos = (_ticket(db, demo["id_organizacion"], demo["id_zona"]) for _ in range(3))
+        for hijo in hijos:
+            hijo.id_ticket_padre = padre.id_ticket
+        db.commit()
+        ids = [padre.id_ticket] + [hijo.id_ticket for hijo in hijos]
+    finally:
+        db.close()
+
+    response = client.patch(f"/operations/tickets/{ids[0]}/transfer", json={
+        "nuevo_id_organizacion": demo["id_organizacion_aliada"]})
+    assert response.status_code == 200
+    # El más antiguo de los duplicados queda como original en la organización de origen
+    duplicados = client.get(f"/operations/tickets/{ids[1]}/duplicados").json()
+    assert [t["id_ticket"] for t in duplicados] == ids[2:]
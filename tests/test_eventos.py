@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import event
+
+def _pending_events(demo: dict) -> list:
+    """Eventos con distintas columnas en None, tomados de la sesión sin confirmar."""
+    from src import database, models
+    from src.services.eventos import _PENDIENTES_KEY, record_ticket_event
+
+    db = database.SessionLocal()
+    try:
+        ticket = db.get(models.Ticket, demo["id_ticket"])
+        record_ticket_event(db, ticket, models.TipoEventoTicket.CREADO, demo["id_organizacion"])
+        record_ticket_event(
+            db, ticket, models.TipoEventoTicket.ASIGNADO, demo["id_organizacion"], id_usuario=1,
+            estado_anterior=models.EstadoTicket.RECIBIDO, detalle={"id_proyecto": demo["id_proyecto"]}
+        )
+        record_ticket_event(
+            db, ticket, models.TipoEventoTicket.CAMBIO_ESTADO, demo["id_organizacion"],
+            estado_anterior=models.EstadoTicket.RECIBIDO
+        )
+        return db.info.pop(_PENDIENTES_KEY)
+    finally:
+        db.rollback()
+        db.close()
+
+@pytest.fixture
+def writer():
+    from src.services.eventos import EventLogWriter
+
+    return EventLogWriter(batch_size=50, flush_seconds=60, buffer_max=100)
+
+def test_mixed_batch_is_one_insert(demo, writer):
+    from src.database import get_engine
+
+    inserts = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT") and "EVENTOS_TICKETS" in statement:
+            inserts.append(statement)
+
+    engine = get_engine()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        writer.add(_pending_events(demo) * 4)
+        assert writer.flush() == 12
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert len(inserts) == 1, "\n".join(inserts)
+
+def test_add_never_flushes_inline(demo, writer):
+    eventos = _pending_events(demo)
+    # Sin el ciclo del lifespan: un lote completo no se escribe en add()
+    for _ in range(20):
+        writer.add(eventos)
+    stats = writer.stats()
+    assert stats["written_total"] == 0
+    assert stats["buffered"] == 60
+
+    # Al llegar a buffer_max se descartan los más viejos
+    for _ in range(20):
+        writer.add(eventos)
+    stats = writer.stats()
+    assert stats["buffered"] == 100
+    assert stats["dropped_total"] == 20
+
+def test_full_batch_wakes_the_loop(demo, writer):
+    import asyncio
+
+    eventos = _pending_events(demo)
+
+    async def run():
+        await writer.start()
+        try:
+            # Desde otro hilo, como el after_commit de un endpoint síncrono
+            await asyncio.to_thread(lambda: [writer.add(eventos) for _ in range(17)])
+            for _ in range(100):
+                if writer.written:
+                    break
+                await asyncio.sleep(0.05)
+            return writer.written
+        finally:
+            await writer.stop()
+
+    # flush_seconds=60: solo el aviso de add() explica el vaciado
+    assert asyncio.run(run()) >= writer.batch_size
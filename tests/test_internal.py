@@ -0,0 +1,17 @@
+import pytest
+
+@pytest.fixture
+def settings():
+    from src.config import get_settings
+
+    return get_settings()
+
+def test_internal_hidden_without_token(client, settings, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert client.get("/internal/metrics").status_code == 404
+
+def test_internal_requires_token(client, settings, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secreto")
+    assert client.get("/internal/metrics").status_code == 403
+    assert client.get("/internal/metrics", headers={"X-Metrics-Token": "otro"}).status_code == 403
+    assert client.get("/internal/metrics", headers={"X-Metrics-Token": "secreto"}).status_code == 200
@@ -0,0 +1,59 @@
+import pytest
+
+from .budget import assert_routes_covered, params
+
+def _refresh_tokens(demo: dict, count: int) -> list:
+    """Refresh tokens del usuario demo (uno por caso que lo consume)."""
+    from src import auth, database, models
+
+    db = database.SessionLocal()
+    try:
+        user = db.query(models.Usuario).filter(models.Usuario.correo_usuario == demo["correo"]).one()
+        tokens = [auth.issue_refresh_token(db, user.id_usuario) for _ in range(count)]
+        db.commit()
+        return tokens
+    finally:
+        db.close()
+
+def _other_user_token(client, demo: dict) -> str:
+    """Access token de un usuario aparte: logout-all revoca todas sus sesiones."""
+    from src import auth, database, models
+
+    db = database.SessionLocal()
+    try:
+        db.add(models.Usuario(
+            id_organizacion_usuario=demo["id_organizacion"],
+            nombre_completo_usuario="Sesiones Demo",
+            correo_usuario="sesiones@comecyt.mx",
+            contraseña_usuario=auth.get_password_hash(demo["password"]),
+            rol_usuario=models.RolUsuario.OPERADOR
+        ))
+        db.commit()
+    finally:
+        db.close()
+    response = client.post("/auth/login", data={"username": "sesiones@comecyt.mx", "password": demo["password"]})
+    return response.json()["access_token"]
+
+@pytest.fixture(scope="module")
+def ctx(client, demo):
+    refresh, logout = _refresh_tokens(demo, 2)
+    return {**demo, "refresh": refresh, "logout": logout, "otro_token": _other_user_token(client, demo)}
+
+CASES = [
+    ("POST", "/auth/login", lambda c: ("/auth/login", {"data": {"username": c["correo"], "password": c["password"]}})),
+    ("POST", "/auth/register/admin", lambda c: ("/auth/register/admin", {"json": {
+        "nombre_completo_usuario": "Auditor Demo", "correo_usuario": "auditor@comecyt.mx",
+        "rol_usuario": "AUDITOR", "id_organizacion_usuario": c["id_organizacion"],
+        "contraseña_usuario": "auditor1234"}})),
+    ("POST", "/auth/refresh", lambda c: ("/auth/refresh", {"json": {"refresh_token": c["refresh"]}})),
+    ("POST", "/auth/logout", lambda c: ("/auth/logout", {"json": {"refresh_token": c["logout"]}})),
+    ("POST", "/auth/logout-all", lambda c: (
+        "/auth/logout-all", {"headers": {"Authorization": f"Bearer {c['otro_token']}"}})),
+]
+
+@pytest.mark.parametrize("method,template,build", params(CASES))
+def test_query_budget(budget, ctx, method, template, build):
+    budget.check(method, template, *build(ctx))
+
+def test_every_route_has_case(app):
+    assert_routes_covered(app, "/auth", CASES)
@@ -0,0 +1,31 @@
+import pytest
+
+from .budget import assert_routes_covered, params
+
+CASES = [
+    ("GET", "/dashboard/bsc/objetivos", lambda c: ("/dashboard/bsc/objetivos", {})),
+    ("POST", "/dashboard/bsc/objetivos", lambda c: ("/dashboard/bsc/objetivos", {"json": {
+        "titulo_objetivo": "Reforestación", "perspectiva_objetivo": "CLIENTES",
+        "meta_valor_objetivo": 10, "avance_actual_objetivo": 2}})),
+    ("PATCH", "/dashboard/bsc/objetivos/{id_objetivo}", lambda c: (
+        f"/dashboard/bsc/objetivos/{c['id_objetivo']}", {"json": {"avance_actual_objetivo": 90}})),
+    ("GET", "/dashboard/finanzas/resumen", lambda c: ("/dashboard/finanzas/resumen", {})),
+    ("POST", "/dashboard/finanzas/transacciones", lambda c: ("/dashboard/finanzas/transacciones", {"json": {
+        "id_organizacion_transaccion": c["id_organizacion"], "monto_transaccion": 5000,
+        "tipo_transaccion": "PRIVADO"}})),
+    ("GET", "/dashboard/proyectos", lambda c: ("/dashboard/proyectos", {})),
+    ("POST", "/dashboard/proyectos", lambda c: ("/dashboard/proyectos", {"json": {
+        "nombre_proyecto": "Brigada Nueva", "id_objetivo_proyecto": c["id_objetivo"],
+        "id_organizacion_proyecto": c["id_organizacion"], "id_zona_proyecto": c["id_zona"]}})),
+    ("GET", "/dashboard/proyectos/burndown", lambda c: ("/dashboard/proyectos/burndown?periodo=SEMANA", {})),
+    ("GET", "/dashboard/impacto/metricas", lambda c: ("/dashboard/impacto/metricas", {})),
+    ("GET", "/dashboard/sla", lambda c: ("/dashboard/sla", {})),
+    ("GET", "/dashboard/home", lambda c: ("/dashboard/home", {})),
+]
+
+@pytest.mark.parametrize("method,template,build", params(CASES))
+def test_query_budget(budget, demo, method, template, build):
+    budget.check(method, template, *build(demo))
+
+def test_every_route_has_case(app):
+    assert_routes_covered(app, "/dashboard", CASES)
@@ -0,0 +1,45 @@
+import pytest
+
+from .budget import assert_routes_covered, params
+
+def _csv_gastos(demo: dict) -> bytes:
+    return (
+        "id_proyecto_gasto,monto_gasto,concepto_gasto,categoria_gasto\n"
+        + "".join(f"{demo['id_proyecto']},{100 + i},Recibo {i},MATERIALES\n" for i in range(50))
+        + "999999,10,Proyecto ajeno,OTROS\n"
+    ).encode()
+
+# En orden: la asignación cierra el ticket demo y la transferencia (al final)
+# lo reabre y lo saca de la organización demo
+CASES = [
+    ("GET", "/operations/tickets/inbox", lambda c: ("/operations/tickets/inbox", {})),
+    ("GET", "/operations/tickets/search", lambda c: ("/operations/tickets/search?q=fuga%20agua&limite=5", {})),
+    ("GET", "/operations/tickets/{ticket_id}", lambda c: (f"/operations/tickets/{c['id_ticket']}", {})),
+    # Ticket inexistente con historial: consulta también el archivo
+    ("GET", "/operations/tickets/{ticket_id}", lambda c: ("/operations/tickets/999999?historial=true", {})),
+    ("PATCH", "/operations/tickets/{ticket_id}/assign", lambda c: (f"/operations/tickets/{c['id_ticket']}/assign", {
+        "json": {"id_proyecto_ticket": c["id_proyecto"], "prioridad_ticket": "ALTA", "estado_ticket": "RESUELTO"}})),
+    ("GET", "/operations/tickets/lote", lambda c: ("/operations/tickets/lote", {
+        "params": [("ids", ticket_id) for ticket_id in range(c["id_ticket"], c["id_ticket"] + 50)]})),
+    ("GET", "/operations/tickets/{ticket_id}/detalle", lambda c: (f"/operations/tickets/{c['id_ticket']}/detalle", {})),
+    ("GET", "/operations/tickets/{ticket_id}/duplicados", lambda c: (
+        f"/operations/tickets/{c['id_ticket']}/duplicados", {})),
+    ("GET", "/operations/tickets/{ticket_id}/eventos", lambda c: (f"/operations/tickets/{c['id_ticket']}/eventos", {})),
+    ("GET", "/operations/eventos", lambda c: ("/operations/eventos?limite=5", {})),
+    ("POST", "/operations/gastos", lambda c: ("/operations/gastos", {"json": {
+        "id_proyecto_gasto": c["id_proyecto"], "monto_gasto": 320.5,
+        "concepto_gasto": "Herramienta", "categoria_gasto": "MATERIALES"}})),
+    ("POST", "/operations/gastos/importar", lambda c: ("/operations/gastos/importar", {
+        "files": {"file": ("gastos.csv", _csv_gastos(c), "text/csv")}})),
+    ("GET", "/operations/cobertura/sugerencias/{zona_id}", lambda c: (
+        f"/operations/cobertura/sugerencias/{c['id_zona']}", {})),
+    ("PATCH", "/operations/tickets/{ticket_id}/transfer", lambda c: (f"/operations/tickets/{c['id_ticket']}/transfer", {
+        "json": {"nuevo_id_organizacion": c["id_organizacion_aliada"], "notas": "Fuera de cobertura"}})),
+]
+
+@pytest.mark.parametrize("method,template,build", params(CASES))
+def test_query_budget(budget, demo, method, template, build):
+    budget.check(method, template, *build(demo))
+
+def test_every_route_has_case(app):
+    assert_routes_covered(app, "/operations", CASES)
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from .budget import assert_routes_covered, params
+
+def _signed_upload(demo: dict) -> dict:
+    """URL firmada y token para subir una evidencia del ticket demo (almacenamiento local)."""
+    from src.services import storage
+
+    blob_name = storage.new_blob_name(demo["id_ticket"], "image/png")
+    expires = storage.upload_expiry()
+    url, headers = storage.get_storage_backend().presign_put(blob_name, "image/png", 64, expires)
+    token = storage.create_upload_token(blob_name, demo["id_ticket"], demo["device_uuid"], "image/png", 64, expires)
+    return {"blob": blob_name, "url": url, "headers": headers, "token": token}
+
+def _resumable_upload(demo: dict) -> str:
+    """Sesión de subida por partes del ticket demo (para HEAD y PATCH)."""
+    from src import database, models
+    from src.services import storage
+
+    db = database.SessionLocal()
+    try:
+        subida = models.SubidaEvidencia(
+            id_subida=storage.new_upload_id(),
+            id_ticket_subida=demo["id_ticket"],
+            dispositivo_subida=demo["device_uuid"],
+            blob_subida=storage.new_blob_name(demo["id_ticket"], "video/mp4"),
+            content_type_subida="video/mp4",
+            tamano_subida=64,
+            offset_subida=0,
+            fecha_expira_subida=storage.resumable_expiry(),
+        )
+        db.add(subida)
+        db.commit()
+        return subida.id_subida
+    finally:
+        db.close()
+
+def _mapa_snapshot() -> int:
+    """Conteos del mapa recalculados desde los tickets demo y un snapshot publicado."""
+    from src import database
+    from src.config import get_settings
+    from src.services import mapa
+
+    with database.get_engine().begin() as conn:
+        mapa.rebuild_counters(conn)
+    db = database.SessionLocal()
+    try:
+        settings = get_settings()
+        return mapa.publish_snapshots(db, settings.heatmap_windows, settings.HEATMAP_SNAPSHOTS_KEEP)[0][1]
+    finally:
+        db.close()
+
+@pytest.fixture(scope="module")
+def ctx(demo):
+    return {
+        **demo,
+        "subida": _signed_upload(demo),
+        "id_subida": _resumable_upload(demo),
+        "id_snapshot": _mapa_snapshot(),
+    }
+
+def _ticket(c: dict, content_type: str) -> dict:
+    return {"id_ticket": c["id_ticket"], "id_usuario_reporte_ticket": c["device_uuid"],
+            "content_type": content_type, "tamano_bytes": 64}
+
+CASES = [
+    ("GET", "/public/zonas", lambda c: ("/public/zonas", {})),
+    # Tipo no permitido: se valida sin tocar Azure ni la BD
+    ("POST", "/public/evidence/upload", lambda c: ("/public/evidence/upload", {
+        "files": {"file": ("nota.txt", b"texto", "text/plain")}})),
+    ("POST", "/public/evidence/upload-url", lambda c: ("/public/evidence/upload-url", {"json": _ticket(c, "image/png")})),
+    # Subida directa completa: PUT firmado, aviso de término y lectura del archivo
+    ("PUT", "/public/evidence/local/{blob_name:path}", lambda c: (c["subida"]["url"], {
+        "content": b"\x89PNG" + b"\x00" * 60, "headers": c["subida"]["headers"]})),
+    ("POST", "/public/evidence/complete", lambda c: ("/public/evidence/complete", {
+        "json": {"token_subida": c["subida"]["token"]}})),
+    ("GET", "/public/evidence/local/{blob_name:path}", lambda c: (f"/public/evidence/local/{c['subida']['blob']}", {})),
+    ("POST", "/public/evidence/uploads", lambda c: ("/public/evidence/uploads", {"json": _ticket(c, "video/mp4")})),
+    ("HEAD", "/public/evidence/uploads/{id_subida}", lambda c: (f"/public/evidence/uploads/{c['id_subida']}", {})),
+    # Parte única: la más cara (confirma el archivo y registra la evidencia)
+    ("PATCH", "/public/evidence/uploads/{id_subida}", lambda c: (f"/public/evidence/uploads/{c['id_subida']}", {
+        "content": b"\x00" * 64,
+        "headers": {"Content-Type": "application/offset+octet-stream", "Upload-Offset": "0"}})),
+    ("POST", "/public/tickets", lambda c: ("/public/tickets", {"json": {
+        "id_usuario_reporte_ticket": c["device_uuid"], "tipo_incidente_ticket": "FUGA",
+        "id_zona_ticket": c["id_zona"], "descripcion_ticket": "Fuga en avenida"}})),
+    ("GET", "/public/tickets/status/{user_uuid}", lambda c: (
+        f"/public/tickets/status/{c['device_uuid']}?historial=true", {})),
+    ("GET", "/public/sync/{user_uuid}", lambda c: (f"/public/sync/{c['device_uuid']}", {})),
+    # Token de hace un minuto: recibe los tickets demo como cambios
+    ("GET", "/public/sync/{user_uuid}", lambda c: (
+        f"/public/sync/{c['device_uuid']}?token=0-{int(time.time()) - 60}", {})),
+    ("POST", "/public/chatbot/ask", lambda c: ("/public/chatbot/ask", {"json": {"message": "¿Cómo reportar?"}})),
+    ("GET", "/public/mapa", lambda c: ("/public/mapa", {})),
+    ("GET", "/public/mapa/{id_snapshot}", lambda c: (f"/public/mapa/{c['id_snapshot']}", {})),
+]
+
+@pytest.mark.parametrize("method,template,build", params(CASES))
+def test_query_budget(budget, ctx, method, template, build):
+    budget.check(method, template, *build(ctx))
+
+def test_every_route_has_case(app):
+    assert_routes_covered(app, "/public", CASES)